@@ -0,0 +1,339 @@
+"""
+Local stand-ins for the upstream services, for benchmarks.
+
+Each fake has a configurable latency, error rate and response size, and is
+installed in place of the real client so the application code above it
+(retries, rate limiting, caching, parsing) runs unchanged:
+
+- Hugging Face TrOCR: an httpx.MockTransport behind the shared OCR client,
+  or a real HTTP server on localhost for load tests of the client itself
+- Gemini: an object with the GenerativeModel async API, returned by get_model()
+- YouTube transcripts: a replacement for the blocking transcript fetch
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+WORDS = (
+    "cell membrane protein energy enzyme gene theorem integral vector matrix market supply demand "
+    "revolution empire treaty atom bond reaction orbit planet gravity force velocity language syntax"
+).split()
+
+
+@dataclass
+class FakeSettings:
+    """Behaviour of one fake upstream."""
+
+    latency: float = 0.05
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    size: int = 10
+
+    async def delay(self, rng: random.Random) -> None:
+        """Sleep for the latency, varied by up to +/- jitter (as a fraction)."""
+        await asyncio.sleep(self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    def sleep(self, rng: random.Random) -> None:
+        """Blocking variant of delay, for fakes called from worker threads."""
+        time.sleep(self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class FakeHuggingFace:
+    """TrOCR inference endpoint answering with a line of text per image."""
+
+    def __init__(self, settings: FakeSettings, seed: int = 0):
+        """
+        Args:
+            settings: Latency, 503 rate and words per recognized line
+            seed: Seed of the generated text and errors
+        """
+        self.settings = settings
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await self.settings.delay(self.rng)
+        if self.rng.random() < self.settings.error_rate:
+            self.errors += 1
+            return httpx.Response(503, json={"error": "Model is loading", "estimated_time": 0.01})
+        return httpx.Response(200, json=[{"generated_text": _phrase(self.rng, self.settings.size)}])
+
+    def install(self) -> None:
+        """Route the shared OCR client to this fake."""
+        from lahacks_24.config import Config
+        from lahacks_24.utils import ocr
+
+        ocr._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(self.handle),
+            headers=Config.get_headers(),
+        )
+
+
+class StubOCRServer:
+    """
+    TrOCR inference endpoint served over HTTP on localhost.
+
+    Unlike FakeHuggingFace, requests go through the real connection pool,
+    timeouts and retries of the OCR client. Every request is answered from
+    its own thread after the configured latency, so the server never limits
+    concurrency itself; the peak number of requests in flight shows how many
+    the client actually sent at once.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.1,
+        fail_first: int = 0,
+        bytes_per_second: Optional[float] = None,
+        fail_status: int = 503,
+    ):
+        """
+        Args:
+            latency: Seconds each request takes to answer
+            fail_first: Number of initial requests answered with fail_status
+            bytes_per_second: Bandwidth of a simulated upload link shared by
+                all requests; bodies are sent over it one after another
+            fail_status: 503 "model is loading" or 429 "rate limit reached"
+        """
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.bytes_per_second = bytes_per_second
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._link_free = 0.0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/models/trocr"
+
+    def reset(self) -> None:
+        """Clear the request counters between runs."""
+        with self._lock:
+            self.requests = self.errors = self.connections = self.bytes_received = 0
+            self.peak_in_flight = 0
+
+    def _handle(self, body: bytes) -> tuple:
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            failing = self.requests <= self.fail_first
+            uploaded = time.monotonic()
+            if self.bytes_per_second:
+                # The body finishes arriving once the link has sent everything queued before it
+                self._link_free = max(self._link_free, uploaded) + len(body) / self.bytes_per_second
+                uploaded = self._link_free
+        try:
+            time.sleep(max(0.0, uploaded - time.monotonic()) + self.latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if failing:
+            with self._lock:
+                self.errors += 1
+            if self.fail_status == 429:
+                return 429, {"error": "Rate limit reached. You reached free usage limit (reset hourly)."}
+            return self.fail_status, {"error": "Model is loading", "estimated_time": 0.01}
+        return 200, [{"generated_text": f"page of {len(body)} bytes"}]
+
+    def start(self) -> "StubOCRServer":
+        """Start serving on a free port in a background thread."""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = stub._handle(body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # The default listen backlog of 5 drops connections opened at
+            # once, and the kernel retries them only a second later
+            request_queue_size = 128
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Stream:
+    def __init__(self, chunks: List[str], settings: FakeSettings, rng: random.Random):
+        self._chunks = chunks
+        self._settings = settings
+        self._rng = rng
+
+    async def __aiter__(self) -> AsyncIterator[_Chunk]:
+        # Time to first token is the configured latency; the rest trickles in
+        for index, chunk in enumerate(self._chunks):
+            if index:
+                await asyncio.sleep(self._settings.latency / 10 / len(self._chunks))
+            yield _Chunk(chunk)
+
+
+class FakeGemini:
+    """GenerativeModel stand-in producing well-formed Front/Back cards."""
+
+    def __init__(self, settings: FakeSettings, seed: int = 0, seconds_per_1k_tokens: float = 0.0):
+        """
+        Args:
+            settings: Latency, error rate and cards per response
+            seed: Seed of the generated cards and errors
+            seconds_per_1k_tokens: Extra time to first token per thousand prompt tokens
+        """
+        self.settings = settings
+        self.rng = random.Random(seed)
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.requests = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+
+    def _cards(self, sections: int = 0) -> str:
+        """Cards of one response; with sections, each card is tagged with a random one."""
+        return "\n".join(
+            f"Front: What links {_phrase(self.rng, 4)}?\nBack: {_phrase(self.rng, 8)}"
+            + (f"\nSection: {self.rng.randint(1, sections)}" if sections else "")
+            for _ in range(self.settings.size)
+        )
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        from lahacks_24.utils.chunking import estimate_tokens
+
+        tokens = estimate_tokens(prompt)
+        self.requests += 1
+        self.prompt_tokens += tokens
+        # Longer prompts take longer to process before the first token
+        await asyncio.sleep(tokens / 1000 * self.seconds_per_1k_tokens)
+        await self.settings.delay(self.rng)
+        if self.rng.random() < self.settings.error_rate:
+            self.errors += 1
+            raise RuntimeError("Fake Gemini failure")
+
+        text = self._cards(len(re.findall(r"\[Section \d+\]\n", prompt)))
+        if not stream:
+            return _Chunk(text)
+        lines = text.split("\n")
+        return _Stream(["\n".join(lines[i:i + 4]) + "\n" for i in range(0, len(lines), 4)], self.settings, self.rng)
+
+    def install(self) -> None:
+        """Make get_model() return this fake."""
+        from lahacks_24.utils import ai
+
+        ai._model = self
+
+
+class FakeYouTube:
+    """Transcript source returning caption segments of a given total length."""
+
+    def __init__(self, settings: FakeSettings, seed: int = 0, segment_seconds: float = 4.0,
+                 auto_captions: bool = True):
+        """
+        Args:
+            settings: Latency, error rate and words per caption segment
+            seed: Seed of the generated captions
+            segment_seconds: Duration of each caption segment
+            auto_captions: Produce captions like YouTube's automatic ones: each
+                segment repeats the end of the previous one, with [Music] tags and filler words
+        """
+        self.settings = settings
+        self.rng = random.Random(seed)
+        self.segment_seconds = segment_seconds
+        self.auto_captions = auto_captions
+        self.durations = {}
+        self.requests = 0
+        self.errors = 0
+
+    def set_duration(self, video_id: str, seconds: float) -> None:
+        """Length of the video a transcript is generated for."""
+        self.durations[video_id] = seconds
+
+    def fetch(self, video_id: str, languages: list) -> List[dict]:
+        self.requests += 1
+        self.settings.sleep(self.rng)
+        if self.rng.random() < self.settings.error_rate:
+            self.errors += 1
+            raise RuntimeError("Fake transcript failure")
+
+        count = max(1, int(self.durations.get(video_id, 600) / self.segment_seconds))
+        segments = []
+        previous = ""
+        for i in range(count):
+            text = _phrase(self.rng, self.settings.size)
+            if self.auto_captions:
+                roll = self.rng.random()
+                if roll < 0.05:
+                    text = "[Music]"
+                elif roll < 0.15:
+                    text = "um, " + text
+                # Rolling captions: the second half of the last line is shown again
+                tail = previous.split()[len(previous.split()) // 2:]
+                text = " ".join(tail + [text]) if tail else text
+            segments.append({"text": text, "start": i * self.segment_seconds, "duration": self.segment_seconds})
+            previous = text
+        return segments
+
+    def install(self) -> None:
+        """Replace the transcript fetch with this fake."""
+        from lahacks_24.utils import youtube
+
+        youtube._fetch_transcript = self.fetch
+
+
+def stats(*fakes) -> dict:
+    """Request and error counts of each fake, and prompt tokens sent to Gemini."""
+    result = {}
+    for fake in fakes:
+        result[type(fake).__name__] = {"requests": fake.requests, "errors": fake.errors}
+        if isinstance(fake, FakeGemini):
+            result[type(fake).__name__]["prompt_tokens"] = fake.prompt_tokens
+    return result
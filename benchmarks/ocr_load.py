@@ -0,0 +1,280 @@
+"""
+OCR client load test against a stub TrOCR server on localhost.
+
+Many sessions recognize their pages at the same time through the real OCR
+client (pooled connections, concurrency gate, rate limiter and retries),
+while the stub server answers every request after a fixed latency. The same
+requests are then sent one at a time, which is what every session saw
+while each OCR request blocked the event loop. The report shows wall time,
+per-session latency, the peak number of requests the server had in flight,
+how many connections were opened, and the longest stall of the event loop.
+
+With a non-blocking client, concurrent sessions finish in about
+ceil(requests / OCR_MAX_CONCURRENCY) x latency instead of the sum of all
+request latencies, and the event loop keeps running between requests.
+
+With --compare-normalize, every session instead uploads synthetic phone
+photos and runs recognize_pages, the pipeline's OCR stage, once with
+OCR_NORMALIZE on and once off. Request bodies reach the stub over one
+shared upload link of --bandwidth bytes/sec. The report shows the stored
+and sent bytes, the bytes saved, the time spent normalizing and the
+end-to-end time of each run.
+
+Usage:
+    python benchmarks/ocr_load.py
+    python benchmarks/ocr_load.py --sessions 50 --pages 4 --latency 0.5 --output ocr_load.json
+    python benchmarks/ocr_load.py --compare-normalize --sessions 5 --bandwidth 2e6
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fakes import StubOCRServer  # noqa: E402
+
+# Whole pages go to the stub, nothing is cached and the client-side quota is
+# lifted, so the results reflect the client rather than the request budget
+LOAD_TEST_ENV = {
+    "CACHE_DIR": "",
+    "DATABASE_URL": "sqlite:///",
+    "METRICS_TRACE": "False",
+    "OCR_BACKEND": "remote",
+    "OCR_SEGMENT_LINES": "False",
+    "OCR_RATE_LIMIT": "100000",
+    "OCR_RATE_BURST": "100000",
+    "OCR_RETRY_BACKOFF": "0.01",
+    "GOOGLE_API_KEY": "benchmark",
+    "HUGGINGFACE_API_KEY": "benchmark",
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": ordered[-1], "mean": statistics.fmean(ordered)}
+
+
+def make_sessions(sessions: int, pages: int, page_bytes: int, seed: int) -> List[List[bytes]]:
+    """Distinct page payloads for every session, so no page is served from the OCR cache."""
+    return [
+        [f"{seed}:{session}:{page}:".encode().ljust(page_bytes, b"x") for page in range(pages)]
+        for session in range(sessions)
+    ]
+
+
+async def watch_loop(interval: float, lags: List[float], stop: asyncio.Event) -> None:
+    """Record how late the event loop wakes up a task sleeping for interval."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_sessions(stub: StubOCRServer, sessions: List[List[bytes]], concurrent: bool) -> Dict:
+    """
+    Recognize every session's pages and measure the run.
+
+    Args:
+        stub: Running stub server the OCR client is pointed at
+        sessions: Page payloads of each session
+        concurrent: Run all sessions at once; otherwise every request is sent
+            only after the previous one finished
+
+    Returns:
+        Wall time, session latencies, server counters and event loop lag
+    """
+    from lahacks_24.utils import ocr
+
+    # Create the client up front, so loading its TLS settings is not counted as loop lag
+    ocr.get_client()
+    stub.reset()
+    lags: List[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(0.005, lags, stop))
+
+    async def session(pages: List[bytes]) -> float:
+        started = time.perf_counter()
+        results = await ocr.extract_text_from_images(pages, concurrency=None if concurrent else 1)
+        if any(result.text is None for result in results):
+            raise RuntimeError("OCR request failed during the load test")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrent:
+        latencies = list(await asyncio.gather(*(session(pages) for pages in sessions)))
+    else:
+        latencies = [await session(pages) for pages in sessions]
+    wall = time.perf_counter() - started
+
+    stop.set()
+    await watcher
+    await ocr.close_client()
+    return {
+        "wall_seconds": wall,
+        "session_seconds": percentiles(latencies),
+        "requests": stub.requests,
+        "retried_503s": stub.errors,
+        "connections": stub.connections,
+        "peak_in_flight": stub.peak_in_flight,
+        "max_loop_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+async def load_test(args, stub: StubOCRServer) -> Dict:
+    from lahacks_24.config import Config
+
+    sessions = make_sessions(args.sessions, args.pages, args.page_bytes, seed=0)
+    requests = args.sessions * args.pages
+    concurrent = await run_sessions(stub, sessions, concurrent=True)
+    # New payloads, so the second run does not hit the OCR cache
+    serialized = await run_sessions(stub, make_sessions(args.sessions, args.pages, args.page_bytes, seed=1),
+                                    concurrent=False)
+    return {
+        "settings": {
+            "sessions": args.sessions,
+            "pages_per_session": args.pages,
+            "latency": args.latency,
+            "ocr_max_concurrency": Config.OCR_MAX_CONCURRENCY,
+            "ocr_batch_concurrency": Config.OCR_BATCH_CONCURRENCY,
+            "ocr_max_connections": Config.OCR_MAX_CONNECTIONS,
+        },
+        "concurrent": concurrent,
+        "serialized": serialized,
+        "expected_concurrent_seconds": math.ceil(requests / Config.OCR_MAX_CONCURRENCY) * args.latency,
+        "speedup": serialized["wall_seconds"] / concurrent["wall_seconds"],
+    }
+
+
+async def run_pipeline_sessions(stub: StubOCRServer, sessions: List[List], normalize: bool) -> Dict:
+    """
+    Run the pipeline's OCR stage for every session at once.
+
+    Args:
+        stub: Running stub server the OCR client is pointed at
+        sessions: Stored page photos of each session
+        normalize: Value of OCR_NORMALIZE for this run
+
+    Returns:
+        Wall time, session latencies, bytes stored and sent, and normalize time
+    """
+    from run import stage_breakdown
+
+    from lahacks_24.config import Config
+    from lahacks_24.pipeline import recognize_pages
+    from lahacks_24.utils import ocr
+
+    Config.OCR_NORMALIZE = normalize
+    ocr.get_client()
+    stub.reset()
+    before = stage_breakdown().get("normalize", {}).get("seconds", 0.0)
+
+    async def session(pages: List) -> float:
+        started = time.perf_counter()
+        results = await recognize_pages(pages)
+        if any(result.text is None for result in results):
+            raise RuntimeError("OCR request failed during the load test")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = list(await asyncio.gather(*(session(pages) for pages in sessions)))
+    wall = time.perf_counter() - started
+    await ocr.close_client()
+
+    after = stage_breakdown().get("normalize", {}).get("seconds", 0.0)
+    return {
+        "wall_seconds": wall,
+        "session_seconds": percentiles(latencies),
+        "stored_bytes": sum(page.size for pages in sessions for page in pages),
+        "sent_bytes": stub.bytes_received,
+        "requests": stub.requests,
+        "normalize_seconds": after - before,
+    }
+
+
+async def normalize_comparison(args, stub: StubOCRServer, workdir: Path) -> Dict:
+    from run import make_pages
+
+    from lahacks_24.config import Config
+    from lahacks_24.utils.imaging import normalize_images
+
+    def photos(seed: int) -> List[List]:
+        # Different photos per run, so the second run does not hit the OCR cache
+        return [make_pages(workdir, args.pages, seed=seed * 1000 + session, size=tuple(args.photo_size))
+                for session in range(args.sessions)]
+
+    # Start the image workers before timing, as a running server has them already
+    warmup = make_pages(workdir, 1, seed=999_999, size=(64, 64))
+    await normalize_images([page.path for page in warmup], Config.OCR_MODEL_INPUT_SIDE, workers=Config.IMAGE_WORKERS)
+
+    normalized = await run_pipeline_sessions(stub, photos(1), normalize=True)
+    raw = await run_pipeline_sessions(stub, photos(2), normalize=False)
+    return {
+        "settings": {
+            "sessions": args.sessions,
+            "pages_per_session": args.pages,
+            "photo_size": args.photo_size,
+            "latency": args.latency,
+            "bandwidth_bytes_per_second": args.bandwidth,
+            "ocr_model_input_side": Config.OCR_MODEL_INPUT_SIDE,
+            "ocr_jpeg_quality": Config.OCR_JPEG_QUALITY,
+        },
+        "normalized": normalized,
+        "raw": raw,
+        "bytes_saved": raw["sent_bytes"] - normalized["sent_bytes"],
+        "bytes_saved_fraction": 1 - normalized["sent_bytes"] / raw["sent_bytes"],
+        "speedup": raw["wall_seconds"] / normalized["wall_seconds"],
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions recognizing pages at once")
+    parser.add_argument("--pages", type=int, default=3, help="Pages per session")
+    parser.add_argument("--page-bytes", type=int, default=200_000, help="Size of each page sent")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub server seconds per request")
+    parser.add_argument("--fail-first", type=int, default=0, help="Initial requests answered 503")
+    parser.add_argument("--compare-normalize", action="store_true",
+                        help="Compare the OCR stage with OCR_NORMALIZE on and off")
+    parser.add_argument("--photo-size", type=int, nargs=2, default=[4032, 3024], metavar=("WIDTH", "HEIGHT"),
+                        help="Size of the photos in --compare-normalize")
+    parser.add_argument("--bandwidth", type=float, default=5e6,
+                        help="Stub upload bytes/sec in --compare-normalize")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    args = parse_args()
+    stub = StubOCRServer(args.latency, fail_first=args.fail_first,
+                         bytes_per_second=args.bandwidth if args.compare_normalize else None).start()
+    # Config is read at import, so the stub must be running before the package is imported
+    os.environ.update(LOAD_TEST_ENV, HUGGINGFACE_API_URL=stub.url)
+    try:
+        if args.compare_normalize:
+            with tempfile.TemporaryDirectory() as workdir:
+                results = asyncio.run(normalize_comparison(args, stub, Path(workdir)))
+        else:
+            results = asyncio.run(load_test(args, stub))
+    finally:
+        stub.stop()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
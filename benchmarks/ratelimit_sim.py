@@ -0,0 +1,161 @@
+"""
+Rate limiter simulation against a fake upstream with a fixed quota.
+
+The fake upstream enforces its own token bucket and answers 429 with a
+Retry-After header once the quota is used up, like Gemini or the Hugging
+Face inference API. A flood of prefetch requests and a steady trickle of
+interactive requests go through AdaptiveRateLimiter with the same
+retry loop the OCR client uses. The report shows throughput relative to
+the quota, how many 429s were seen, how many requests failed after their
+retries, and the latency of each priority.
+
+Usage:
+    python benchmarks/ratelimit_sim.py
+    python benchmarks/ratelimit_sim.py --quota 20 --limit 30 --prefetch 400
+    python benchmarks/ratelimit_sim.py --no-limiter
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lahacks_24.utils.ratelimit import (  # noqa: E402
+    INTERACTIVE,
+    PREFETCH,
+    AdaptiveRateLimiter,
+    RateLimitError,
+)
+
+
+class FakeUpstream:
+    """Upstream API with a token-bucket quota and a fixed service latency."""
+
+    def __init__(self, quota: float, burst: float, latency: float):
+        self.quota = quota
+        self.burst = burst
+        self.latency = latency
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.accepted = 0
+        self.rejected = 0
+
+    async def call(self) -> Optional[float]:
+        """
+        Handle one request.
+
+        Returns:
+            None on success, or the Retry-After in seconds on a 429
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.quota)
+        self.updated = now
+        if self.tokens < 1:
+            self.rejected += 1
+            return (1 - self.tokens) / self.quota
+        self.tokens -= 1
+        self.accepted += 1
+        await asyncio.sleep(self.latency)
+        return None
+
+
+async def request(
+    upstream: FakeUpstream, limiter: Optional[AdaptiveRateLimiter], level: int, retries: int, backoff: float
+) -> float:
+    """
+    Make one request with the production retry policy.
+
+    Returns:
+        Seconds until the request succeeded
+
+    Raises:
+        RateLimitError: If every attempt was rejected
+    """
+    started = time.perf_counter()
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            await limiter.acquire(level)
+        retry_after = await upstream.call()
+        if retry_after is None:
+            if limiter is not None:
+                limiter.reward()
+            return time.perf_counter() - started
+        if limiter is not None:
+            limiter.penalize(retry_after)
+        if attempt < retries:
+            await asyncio.sleep(backoff * (2 ** attempt))
+    raise RateLimitError("fake", retry_after)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 of latencies in seconds."""
+    if not samples:
+        return {}
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+async def simulate(args) -> dict:
+    upstream = FakeUpstream(args.quota, args.burst, args.latency)
+    limiter = None if args.no_limiter else AdaptiveRateLimiter("fake", args.limit, args.burst)
+    latencies: Dict[str, List[float]] = {"interactive": [], "prefetch": []}
+    failures = {"interactive": 0, "prefetch": 0}
+
+    async def run(kind: str, level: int) -> None:
+        try:
+            latencies[kind].append(await request(upstream, limiter, level, args.retries, args.backoff))
+        except RateLimitError:
+            failures[kind] += 1
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(run("prefetch", PREFETCH)) for _ in range(args.prefetch)]
+    # Interactive requests keep arriving while the prefetch backlog drains
+    for _ in range(args.interactive):
+        await asyncio.sleep(args.interactive_interval)
+        tasks.append(asyncio.create_task(run("interactive", INTERACTIVE)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    completed = sum(len(samples) for samples in latencies.values())
+    return {
+        "limiter": None if limiter is None else {"max_rate": args.limit, "final": limiter.stats()},
+        "quota_per_second": args.quota,
+        "seconds": elapsed,
+        "completed": completed,
+        "throughput_per_second": completed / elapsed if elapsed else 0.0,
+        "quota_utilization": completed / elapsed / args.quota if elapsed else 0.0,
+        "upstream_429s": upstream.rejected,
+        "failed": failures,
+        "latency": {kind: percentiles(samples) for kind, samples in latencies.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quota", type=float, default=10.0, help="Upstream quota in requests per second")
+    parser.add_argument("--burst", type=float, default=5.0, help="Upstream and limiter burst size")
+    parser.add_argument("--limit", type=float, default=12.0,
+                        help="Limiter's configured rate; above the quota to show adaptation")
+    parser.add_argument("--latency", type=float, default=0.02, help="Upstream service time in seconds")
+    parser.add_argument("--prefetch", type=int, default=150, help="Prefetch requests submitted at once")
+    parser.add_argument("--interactive", type=int, default=30, help="Interactive requests")
+    parser.add_argument("--interactive-interval", type=float, default=0.3,
+                        help="Seconds between interactive requests")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per request")
+    parser.add_argument("--backoff", type=float, default=0.5, help="Base retry backoff in seconds")
+    parser.add_argument("--no-limiter", action="store_true", help="Send requests without the limiter")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(simulate(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""
+End-to-end benchmark suite with local stand-ins for Gemini, TrOCR and YouTube.
+
+Every scenario runs in a fresh interpreter with the fakes from fakes.py
+installed, caches on disk disabled and an in-memory deck database. Jobs go
+through the same job queue and pipelines as the web UI's upload and YouTube
+handlers. Per scenario the suite reports p50/p95/p99 job latency,
+throughput, peak RSS and the time spent in each pipeline stage, and writes
+everything as JSON that can be compared between commits.
+
+Scenarios:
+    single_user         one notes upload, then one 10-minute video
+    concurrent_uploads  --users users uploading --pages pages each at once
+    long_transcript     one --transcript-hours long video (chunked generation)
+    reupload            a 30-page notebook, then with 3 pages added, then with 1 page changed
+    micro               parser, dedup, swap_card deltas and photo normalization
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --scenario concurrent_uploads --users 100 --llm-latency 1.0
+    python benchmarks/run.py --output new.json --compare results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SCENARIOS = ("single_user", "concurrent_uploads", "long_transcript", "reupload", "micro")
+
+# Settings of the scenario interpreters: no disk caches, a throwaway database
+BENCHMARK_ENV = {
+    "CACHE_DIR": "",
+    "DATABASE_URL": "sqlite:///",
+    "METRICS_TRACE": "False",
+    "OCR_BACKEND": "remote",
+    "GOOGLE_API_KEY": "benchmark",
+    "HUGGINGFACE_API_KEY": "benchmark",
+}
+
+# Client-side quotas are lifted unless --real-rate-limits is given, so the
+# results reflect the code rather than the configured request budget
+UNLIMITED_RATES = {
+    "OCR_RATE_LIMIT": "100000", "OCR_RATE_BURST": "100000",
+    "LLM_RATE_LIMIT": "100000", "LLM_RATE_BURST": "100000",
+    "TRANSCRIPT_RATE_LIMIT": "100000", "TRANSCRIPT_RATE_BURST": "100000",
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 of latencies in seconds."""
+    if not samples:
+        return {}
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident memory of this process and of its finished children."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 / (1024 * 1024) if platform.system() == "Darwin" else 1 / 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+def make_pages(directory: Path, count: int, seed: int, size: Tuple[int, int] = (1600, 1200)) -> List:
+    """
+    Write synthetic photos of handwritten pages: dark text-like bands on paper.
+
+    Every page differs, so OCR results are never served from the cache.
+    """
+    import numpy as np
+    from PIL import Image
+
+    from lahacks_24.utils.uploads import StoredUpload
+
+    rng = np.random.default_rng(seed)
+    width, height = size
+    pages = []
+    for index in range(count):
+        page = np.full((height, width, 3), 235, dtype=np.uint8)
+        page += rng.integers(0, 15, page.shape, dtype=np.uint8)
+        for top in range(80, height - 80, 90):
+            ink = rng.random((40, width - 200)) < 0.35
+            page[top:top + 40, 100:width - 100][ink] = 30
+        path = directory / f"page_{seed}_{index}.jpg"
+        Image.fromarray(page).save(path, quality=90)
+        pages.append(StoredUpload.from_path(path))
+    return pages
+
+
+async def run_jobs(submissions: List[Tuple[str, str, Callable]]) -> Dict:
+    """
+    Submit jobs to the job queue at once and wait for all of them.
+
+    Args:
+        submissions: (user_id, kind, runner) for every job
+
+    Returns:
+        Latency percentiles, throughput, failures and card counts
+    """
+    from lahacks_24.utils.jobs import DONE, get_job_queue
+
+    queue = get_job_queue()
+    started = time.perf_counter()
+    jobs = [await queue.submit(user, kind, runner) for user, kind, runner in submissions]
+
+    async def finished(job) -> float:
+        version = -1
+        while not job.finished:
+            version = await job.wait_for_change(version, timeout=1)
+        return time.perf_counter() - started
+
+    latencies = await asyncio.gather(*(finished(job) for job in jobs))
+    elapsed = time.perf_counter() - started
+    failed = [job.error for job in jobs if job.status != DONE]
+    return {
+        "jobs": len(jobs),
+        "failed": len(failed),
+        "errors": sorted(set(filter(None, failed)))[:5],
+        "cards": sum(len(job.cards) for job in jobs),
+        "wall_seconds": elapsed,
+        "latency": percentiles(list(latencies)),
+        "throughput_per_second": len(jobs) / elapsed if elapsed else 0.0,
+    }
+
+
+def stage_breakdown() -> Dict[str, Dict[str, float]]:
+    """Total seconds and count of every instrumented stage."""
+    from lahacks_24.utils.metrics import stage_seconds
+
+    stages: Dict[str, Dict[str, float]] = {}
+    for labels, total, count in stage_seconds.series():
+        entry = stages.setdefault(labels["stage"], {"seconds": 0.0, "count": 0})
+        entry["seconds"] += total
+        entry["count"] += count
+    return stages
+
+
+async def scenario_single_user(args, workdir: Path, fakes) -> Dict:
+    from lahacks_24.pipeline import run_notes_job, run_video_job
+
+    pages = make_pages(workdir, args.pages, seed=1)
+    notes = await run_jobs([("user-0", "notes", lambda job: run_notes_job(job, pages, "notes", force=True))])
+    fakes["youtube"].set_duration("AAAAAAAAAAA", 600)
+    video_url = "https://youtu.be/AAAAAAAAAAA"
+    video = await run_jobs([("user-0", "video", lambda job: run_video_job(job, video_url, force=True))])
+    return {"notes": notes, "video": video}
+
+
+async def scenario_concurrent_uploads(args, workdir: Path, fakes) -> Dict:
+    from lahacks_24.pipeline import run_notes_job
+
+    def notes_job(pages):
+        return lambda job: run_notes_job(job, pages, "notes", force=True)
+
+    uploads = [make_pages(workdir, args.pages, seed=100 + user) for user in range(args.users)]
+    result = await run_jobs([(f"user-{user}", "notes", notes_job(pages)) for user, pages in enumerate(uploads)])
+    result["pages_per_second"] = args.users * args.pages / result["wall_seconds"]
+    return result
+
+
+async def scenario_long_transcript(args, workdir: Path, fakes) -> Dict:
+    from lahacks_24.pipeline import run_video_job
+
+    fakes["youtube"].set_duration("BBBBBBBBBBB", args.transcript_hours * 3600)
+    video_url = "https://youtu.be/BBBBBBBBBBB"
+    return await run_jobs([("user-0", "video", lambda job: run_video_job(job, video_url, force=True))])
+
+
+async def scenario_reupload(args, workdir: Path, fakes) -> Dict:
+    from lahacks_24.pipeline import run_notes_job
+
+    notebook = make_pages(workdir, 30, seed=200)
+    added = make_pages(workdir, 3, seed=201)
+    changed = notebook[:5] + make_pages(workdir, 1, seed=202) + notebook[6:] + added
+    result = {}
+    for name, pages in (
+        ("first_upload", notebook), ("with_3_new_pages", notebook + added), ("with_1_changed_page", changed)
+    ):
+        before = fakes["huggingface"].requests, fakes["gemini"].requests
+        result[name] = await run_jobs([("user-0", "notes", lambda job: run_notes_job(job, pages, "notebook"))])
+        result[name]["ocr_requests"] = fakes["huggingface"].requests - before[0]
+        result[name]["llm_requests"] = fakes["gemini"].requests - before[1]
+    return result
+
+
+def _changed_vars(before: Dict[str, Dict], after: Dict[str, Dict]) -> Dict[str, Dict]:
+    """State vars whose value differs between two State.dict() snapshots, i.e. what is sent to the browser."""
+    return {
+        name: changed for name, values in after.items()
+        if (changed := {key: value for key, value in values.items() if before.get(name, {}).get(key) != value})
+    }
+
+
+async def measure_card_flips(deck: List[Tuple[str, str]], page_size: int, flips: int = 50) -> Dict[str, float]:
+    """
+    Flip cards through the State.swap_card event handler and measure the delta sent to the browser.
+
+    Args:
+        deck: (front, back) pairs to load into a fresh session
+        page_size: CARDS_PAGE_SIZE for this run; restored afterwards
+        flips: Number of flips to time
+
+    Returns:
+        Handler latency percentiles and the sizes of the deck load and flip deltas in bytes
+    """
+    import reflex as rx
+    from reflex.state import StateManagerMemory
+
+    from lahacks_24.config import Config
+    from lahacks_24.lahacks_24 import State
+
+    saved_page_size = Config.CARDS_PAGE_SIZE
+    Config.CARDS_PAGE_SIZE = page_size
+    try:
+        root = await StateManagerMemory(state=rx.State).get_state(uuid.uuid4().hex)
+        state = await root.get_state(State)
+        empty = root.dict()
+        state._add_cards(deck)
+        loaded = root.dict()
+        load_delta = len(json.dumps(_changed_vars(empty, loaded), default=str))
+
+        swap_card = State.event_handlers["swap_card"].fn
+        latencies, sizes = [], []
+        for flip in range(flips):
+            before = root.dict()
+            started = time.perf_counter()
+            await swap_card(state, flip % len(state.cards_list))
+            latencies.append(time.perf_counter() - started)
+            sizes.append(len(json.dumps(_changed_vars(before, root.dict()), default=str)))
+    finally:
+        Config.CARDS_PAGE_SIZE = saved_page_size
+    return {
+        "cards": len(deck),
+        "load_delta_bytes": load_delta,
+        "flip_delta_bytes": max(sizes),
+        "handler_ms": {key: value * 1000 for key, value in percentiles(latencies).items()},
+    }
+
+
+async def scenario_micro(args, workdir: Path, fakes) -> Dict:
+    from lahacks_24.utils.dedup import dedup_cards
+    from lahacks_24.utils.imaging import normalize_image
+    from lahacks_24.utils.parsing import parse_flashcards
+
+    results: Dict[str, Dict] = {}
+    card_text = fakes["gemini"]._cards
+    fakes["gemini"].settings.size = 1000
+    text = card_text()
+
+    started = time.perf_counter()
+    for _ in range(10):
+        cards = parse_flashcards(text)
+    results["parser"] = {"cards_per_second": 10 * len(cards) / (time.perf_counter() - started)}
+
+    results["dedup"] = {}
+    for count in (1000, 5000):
+        deck = [(f"{front} {i % (count // 2)}", back) for i, (front, back) in
+                enumerate(parse_flashcards("\n".join(card_text() for _ in range(count // 1000))))]
+        started = time.perf_counter()
+        kept, removed = dedup_cards(deck)
+        results["dedup"][str(count)] = {"seconds": time.perf_counter() - started, "removed": removed}
+
+    # A flip through the real swap_card handler, with the default page size
+    # and with the whole deck on one page, against deck size
+    results["card_flip"] = {}
+    try:
+        import reflex  # noqa: F401
+    except ImportError:
+        results["card_flip"]["skipped"] = "reflex is not installed"
+    else:
+        deck = parse_flashcards(card_text())
+        for size in (50, 200, 1000):
+            cards = (deck * (size // len(deck) + 1))[:size]
+            results["card_flip"][str(size)] = {
+                "paged": await measure_card_flips(cards, page_size=20),
+                "one_page": await measure_card_flips(cards, page_size=size),
+            }
+
+    page = make_pages(workdir, 1, seed=7, size=(4000, 3000))[0]
+    started = time.perf_counter()
+    normalized = normalize_image(str(page.path), 2000, 85)
+    results["normalize"] = {
+        "seconds": time.perf_counter() - started,
+        "bytes_in": page.size,
+        "bytes_out": len(normalized),
+    }
+    return results
+
+
+async def run_scenario(name: str, args) -> Dict:
+    """Install the fakes and run one scenario in this interpreter."""
+    from fakes import FakeGemini, FakeHuggingFace, FakeSettings, FakeYouTube, stats
+
+    from lahacks_24.utils import imaging
+
+    fakes = {
+        "huggingface": FakeHuggingFace(FakeSettings(args.ocr_latency, error_rate=args.ocr_error_rate,
+                                                    size=args.ocr_words)),
+        "gemini": FakeGemini(FakeSettings(args.llm_latency, error_rate=args.llm_error_rate, size=args.llm_cards),
+                             seconds_per_1k_tokens=args.llm_token_latency),
+        "youtube": FakeYouTube(FakeSettings(args.transcript_latency, error_rate=args.transcript_error_rate,
+                                            size=args.transcript_words)),
+    }
+    for fake in fakes.values():
+        fake.install()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        result = await globals()[f"scenario_{name}"](args, Path(workdir), fakes)
+        wall = time.perf_counter() - started
+
+    # Let the image workers exit so their memory shows up in RUSAGE_CHILDREN
+    if imaging._pool is not None:
+        imaging._pool.shutdown()
+    return {
+        "result": result,
+        "wall_seconds": wall,
+        "stages": stage_breakdown(),
+        "upstream_requests": stats(*fakes.values()),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def spawn(name: str, argv: List[str], args) -> Dict:
+    """Run a scenario in a fresh interpreter and read back its result."""
+    env = {**os.environ, **BENCHMARK_ENV}
+    if not args.real_rate_limits:
+        env.update(UNLIMITED_RATES)
+    if args.no_compaction:
+        env["PROMPT_COMPACTION"] = "False"
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+        completed = subprocess.run(
+            [sys.executable, __file__, *argv, "--worker", name, "--result-file", result_file.name],
+            env=env, cwd=ROOT,
+            stdout=None if args.verbose else subprocess.DEVNULL,
+            stderr=None if args.verbose else subprocess.PIPE, text=True,
+        )
+        if completed.returncode != 0:
+            return {"error": (completed.stderr or "").strip().splitlines()[-1:] or ["failed"]}
+        return json.loads(Path(result_file.name).read_text())
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(value, prefix: str = "") -> Dict[str, float]:
+    if isinstance(value, dict):
+        flat: Dict[str, float] = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+
+def compare(baseline: Dict, current: Dict) -> List[str]:
+    """
+    Describe how the headline numbers changed between two result files.
+
+    Returns:
+        One line per latency, throughput and memory figure present in both
+    """
+    watched = ("latency", "throughput", "per_second", "peak_rss", "wall_seconds")
+    before = _flatten(baseline.get("scenarios", {}))
+    after = _flatten(current.get("scenarios", {}))
+    lines = []
+    for key in sorted(before.keys() & after.keys()):
+        if not any(word in key for word in watched) or ".stages." in key:
+            continue
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        lines.append(f"{key}: {old:.4g} -> {new:.4g} ({change})")
+    return lines
+
+
+def parse_args(argv: Optional[List[str]] = None) -> Tuple[argparse.Namespace, List[str]]:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (default: all)")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to compare against")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent uploads in concurrent_uploads")
+    parser.add_argument("--pages", type=int, default=3, help="Pages per notes upload")
+    parser.add_argument("--transcript-hours", type=float, default=3.0, help="Video length in long_transcript")
+    parser.add_argument("--ocr-latency", type=float, default=0.05, help="Fake TrOCR seconds per request")
+    parser.add_argument("--ocr-error-rate", type=float, default=0.0, help="Fraction of fake TrOCR 503s")
+    parser.add_argument("--ocr-words", type=int, default=8, help="Words per recognized line")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake Gemini seconds to first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.1,
+                        help="Extra Gemini seconds to first token per 1000 prompt tokens")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of failed Gemini calls")
+    parser.add_argument("--llm-cards", type=int, default=10, help="Cards per Gemini response")
+    parser.add_argument("--transcript-latency", type=float, default=0.2, help="Fake transcript fetch seconds")
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0, help="Fraction of failed fetches")
+    parser.add_argument("--transcript-words", type=int, default=12, help="Words per caption segment")
+    parser.add_argument("--no-compaction", action="store_true", help="Run with PROMPT_COMPACTION=False")
+    parser.add_argument("--real-rate-limits", action="store_true", help="Keep the configured client rate limits")
+    parser.add_argument("--verbose", action="store_true", help="Show the application's log output")
+    parser.add_argument("--worker", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", type=Path, help=argparse.SUPPRESS)
+    argv = sys.argv[1:] if argv is None else argv
+    return parser.parse_args(argv), argv
+
+
+def main() -> int:
+    args, argv = parse_args()
+
+    if args.worker:
+        result = asyncio.run(run_scenario(args.worker, args))
+        args.result_file.write_text(json.dumps(result))
+        return 0
+
+    # Scenario interpreters get the same options, minus the driver-only ones
+    passthrough = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg in ("--scenario", "--output", "--compare"):
+            skip = True
+            continue
+        if arg.split("=")[0] in ("--scenario", "--output", "--compare"):
+            continue
+        passthrough.append(arg)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "options": {key: value for key, value in vars(args).items()
+                    if key not in ("scenario", "output", "compare", "worker", "result_file", "verbose")},
+        "scenarios": {},
+    }
+    for name in args.scenario or SCENARIOS:
+        print(f"⏱️  Running {name}...", file=sys.stderr)
+        results["scenarios"][name] = spawn(name, passthrough, args)
+
+    text = json.dumps(results, indent=2, default=str)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+
+    if args.compare:
+        print("\n".join(compare(json.loads(args.compare.read_text()), results)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
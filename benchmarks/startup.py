@@ -0,0 +1,157 @@
+"""
+Startup benchmark: import time and time-to-first-request.
+
+Each measurement runs in a fresh interpreter, so module caches from earlier
+runs do not hide import cost. Results are printed as JSON so they can be
+collected and compared between commits.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --module lahacks_24.lahacks_24 --runs 10
+    python benchmarks/startup.py --serve "reflex run --env prod --backend-only" \\
+        --url http://localhost:8000/ping
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _python_env() -> Dict[str, str]:
+    """Environment for child interpreters, with the repository importable."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def measure_import(module: str) -> float:
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module: Dotted module name
+
+    Returns:
+        Seconds spent importing the module, excluding interpreter startup
+    """
+    code = (
+        "import time, importlib; started = time.perf_counter(); "
+        f"importlib.import_module({module!r}); print(time.perf_counter() - started)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=_python_env(),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def heaviest_imports(module: str, top: int) -> List[dict]:
+    """
+    List the slowest imports triggered by a module using ``-X importtime``.
+
+    Args:
+        module: Dotted module name
+        top: Number of entries to return
+
+    Returns:
+        Module names with their cumulative import time in milliseconds;
+        nested imports are counted in their parent's time as well
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=_python_env(),
+        check=True, capture_output=True, text=True,
+    ).stderr
+
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        # Skip the interpreter's own startup and the module itself
+        if not cumulative.strip().isdigit() or name in ("site", "encodings", module):
+            continue
+        entries.append({"module": name, "ms": int(cumulative) / 1000})
+    return sorted(entries, key=lambda entry: entry["ms"], reverse=True)[:top]
+
+
+def measure_first_request(command: str, url: str, timeout: float) -> float:
+    """
+    Start a server and wait until it answers its first request.
+
+    Args:
+        command: Shell command starting the server
+        url: URL polled until it returns a successful response
+        timeout: Seconds to wait before giving up
+
+    Returns:
+        Seconds from launch until the first successful response
+
+    Raises:
+        TimeoutError: If the server did not answer in time
+    """
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        shlex.split(command), cwd=ROOT, env=_python_env(),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status < 400:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"{url} did not respond within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(samples: List[float]) -> dict:
+    """Median, minimum and maximum of a list of timings, in seconds."""
+    return {
+        "runs": len(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", action="append",
+                        help="Module to import (repeatable; default: lahacks_24.config and lahacks_24.pipeline)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list per module")
+    parser.add_argument("--serve", help="Command starting the app, for time-to-first-request")
+    parser.add_argument("--url", default="http://localhost:8000/ping", help="URL polled after --serve")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the first response")
+    args = parser.parse_args()
+
+    modules = args.module or ["lahacks_24.config", "lahacks_24.pipeline"]
+    report = {"python": sys.version.split()[0], "imports": {}}
+    for module in modules:
+        samples = [measure_import(module) for _ in range(args.runs)]
+        report["imports"][module] = {**summarize(samples), "heaviest": heaviest_imports(module, args.top)}
+
+    if args.serve:
+        samples = [measure_first_request(args.serve, args.url, args.timeout) for _ in range(args.runs)]
+        report["first_request"] = summarize(samples)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local TrOCR throughput at different batch sizes.
+
+Synthetic text-line crops, like the ones line segmentation produces, are
+recognized by LocalOCRBackend on the CPU. For every batch size the same
+images are run two ways:
+
+    forward   fixed batches through _run_batch, one forward pass each
+    batched   concurrent recognize() calls grouped by the micro-batcher
+              of a backend created with that OCR_BATCH_SIZE
+
+and the report gives images/sec, seconds per forward pass and the speedup
+over batch size 1. The model is loaded and warmed up before timing starts.
+Needs torch and transformers (requirements.txt) and the model weights,
+which are downloaded on first use.
+
+Usage:
+    python benchmarks/trocr_batch.py
+    python benchmarks/trocr_batch.py --batch-sizes 1 4 8 16 32 --images 128 --threads 4 --output trocr.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("CACHE_DIR", "")
+os.environ.setdefault("METRICS_TRACE", "False")
+
+
+def make_lines(count: int, seed: int, size=(384, 48)) -> List[bytes]:
+    """PNG crops of dark, text-like strokes on paper, one text line each."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    width, height = size
+    lines = []
+    for _ in range(count):
+        line = np.full((height, width), 235, dtype=np.uint8)
+        line += rng.integers(0, 15, line.shape, dtype=np.uint8)
+        ink = rng.random((height - 16, width - 16)) < 0.3
+        line[8:height - 8, 8:width - 8][ink] = 30
+        buffer = io.BytesIO()
+        Image.fromarray(line).save(buffer, format="PNG")
+        lines.append(buffer.getvalue())
+    return lines
+
+
+def measure_forward(backend, images: List[bytes], batch_size: int, repeats: int) -> Dict[str, float]:
+    """
+    Recognize the images in fixed batches, one forward pass per batch.
+
+    Args:
+        backend: Loaded LocalOCRBackend
+        images: Encoded line crops
+        batch_size: Images per forward pass
+        repeats: Number of timed runs over all images
+
+    Returns:
+        Median images/sec over the runs and seconds per forward pass
+    """
+    rates, passes = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for start in range(0, len(images), batch_size):
+            batch_started = time.perf_counter()
+            backend._run_batch(images[start:start + batch_size])
+            passes.append(time.perf_counter() - batch_started)
+        rates.append(len(images) / (time.perf_counter() - started))
+    return {"images_per_sec": statistics.median(rates), "seconds_per_pass": statistics.median(passes)}
+
+
+async def measure_batched(backend, images: List[bytes], repeats: int) -> Dict[str, float]:
+    """
+    Recognize the images with concurrent recognize() calls through the micro-batcher.
+
+    Args:
+        backend: LocalOCRBackend configured with the batch size under test
+        images: Encoded line crops
+        repeats: Number of timed runs over all images
+
+    Returns:
+        Median images/sec over the runs
+    """
+    rates = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await asyncio.gather(*(backend.recognize(image) for image in images))
+        rates.append(len(images) / (time.perf_counter() - started))
+    return {"images_per_sec": statistics.median(rates)}
+
+
+def run(args) -> Dict:
+    import torch
+
+    from lahacks_24.config import Config
+    from lahacks_24.utils.ocr import LocalOCRBackend
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model = args.model or Config.OCR_LOCAL_MODEL
+    images = make_lines(args.images, seed=0)
+
+    # Every backend below shares the one loaded model
+    reference = LocalOCRBackend(model)
+    started = time.perf_counter()
+    reference._load()
+    load_seconds = time.perf_counter() - started
+    reference._run_batch(images[:max(args.batch_sizes)])
+
+    results = {}
+    for batch_size in args.batch_sizes:
+        backend = LocalOCRBackend(model, batch_size=batch_size, batch_wait=Config.OCR_BATCH_WAIT_MS / 1000)
+        backend._processor, backend._model = reference._processor, reference._model
+        results[str(batch_size)] = {
+            "forward": measure_forward(backend, images, batch_size, args.repeats),
+            "batched": asyncio.run(measure_batched(backend, images, args.repeats)),
+        }
+        print(f"⏱️  batch {batch_size}: {results[str(batch_size)]['forward']['images_per_sec']:.2f} images/s",
+              file=sys.stderr)
+
+    baseline = results[str(args.batch_sizes[0])]
+    for result in results.values():
+        for mode in ("forward", "batched"):
+            result[mode]["speedup"] = result[mode]["images_per_sec"] / baseline[mode]["images_per_sec"]
+
+    return {
+        "model": model,
+        "images": args.images,
+        "repeats": args.repeats,
+        "torch_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "cpu": platform.processor() or platform.machine(),
+        "load_seconds": load_seconds,
+        "batch_sizes": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16], help="Batch sizes to compare")
+    parser.add_argument("--images", type=int, default=64, help="Line crops recognized per run")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per batch size")
+    parser.add_argument("--model", help="TrOCR checkpoint (default: OCR_LOCAL_MODEL)")
+    parser.add_argument("--threads", type=int, help="torch CPU threads (default: torch's choice)")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+    except ImportError as e:
+        print(f"❌ The local OCR benchmark needs torch and transformers: {e}", file=sys.stderr)
+        return 1
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""
+Headless batch generation of flashcard decks.
+
+Builds decks for whole folders of note photos and lists of lecture videos
+without the web UI. Items flow through two stages, text extraction (OCR or
+transcript) and generation, each with its own concurrency limit. Finished
+decks are appended to a JSONL file and their IDs to a checkpoint file, so an
+interrupted run picks up where it stopped.
+
+Usage:
+    python -m lahacks_24.cli --notes notes/week1 --notes notes/week2 \\
+        --videos lectures.txt --output decks.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .config import Config
+from .pipeline import notes_source_hash, page_sections, recognize_pages, video_source_hash
+from .utils.ai import (
+    create_flashcard_prompt,
+    create_youtube_flashcard_prompt,
+    generate_flashcards_cached,
+    generate_flashcards_chunked
+)
+from .utils.chunking import Section, join_sections, pack_sections, section_source
+from .utils.compaction import CompactionStats, compact_segments
+from .utils.dedup import CardDeduplicator
+from .utils.ocr import close_client
+from .utils.parsing import parse_tagged_flashcards
+from .utils.ratelimit import BATCH, priority
+from .utils.storage import get_deck_store
+from .utils.transcript import Span, Transcript
+from .utils.uploads import StoredUpload
+from .utils.youtube import get_transcript_segments, normalize_video_id
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff", ".heic", ".heif"}
+
+
+@dataclass
+class BatchItem:
+    """One deck to generate: a set of note pages or a video."""
+
+    id: str
+    kind: str
+    title: str
+    pages: List[StoredUpload] = field(default_factory=list)
+    video_id: Optional[str] = None
+    sections: List[Section] = field(default_factory=list)
+    cards: List[Tuple[str, str]] = field(default_factory=list)
+    # Source span of each card, aligned with cards: video seconds, or page positions (first, last + 1)
+    spans: List[Optional[Span]] = field(default_factory=list)
+    duplicates: int = 0
+    compaction: Optional[CompactionStats] = None
+    started: float = 0.0
+
+
+def discover_notes(paths: Iterable[str], page_per_deck: bool = False) -> List[BatchItem]:
+    """
+    Turn note folders and images into batch items.
+
+    A folder becomes one deck with its images as pages in file name order,
+    or one deck per image with page_per_deck. A single image is a one-page deck.
+
+    Args:
+        paths: Folders or image files
+        page_per_deck: Make a separate deck of every image in a folder
+
+    Returns:
+        Items identified by the hash of their pages
+    """
+    items = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            images = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+            groups = [[image] for image in images] if page_per_deck else [images]
+        else:
+            groups = [[path]]
+
+        for group in groups:
+            if not group:
+                print(f"⚠️  No images found in {path}")
+                continue
+            pages = [StoredUpload.from_path(image) for image in group]
+            title = group[0].name if len(group) == 1 else path.name
+            items.append(BatchItem(notes_source_hash(pages), "notes", title, pages=pages))
+    return items
+
+
+def discover_videos(videos: Iterable[str]) -> List[BatchItem]:
+    """
+    Turn video URLs or IDs into batch items, skipping duplicates.
+
+    Args:
+        videos: Video URLs or IDs, e.g. a playlist exported one per line
+
+    Returns:
+        Items identified by the hash of their video ID
+    """
+    items = {}
+    for video in videos:
+        video_id = normalize_video_id(video)
+        if video_id is None:
+            print(f"⚠️  Not a YouTube video: {video}")
+            continue
+        source_hash = video_source_hash(video_id)
+        items.setdefault(source_hash, BatchItem(source_hash, "video", video.strip(), video_id=video_id))
+    return list(items.values())
+
+
+def read_lines(path: Path) -> List[str]:
+    """Non-empty lines of a text file, ignoring # comments."""
+    lines = (line.strip() for line in path.read_text().splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def load_checkpoint(path: Path) -> Set[str]:
+    """IDs of the items finished by earlier runs."""
+    return set(read_lines(path)) if path.exists() else set()
+
+
+class BatchRunner:
+    """Runs batch items through the extraction and generation stages."""
+
+    def __init__(
+        self,
+        output: Path,
+        checkpoint: Path,
+        extract_concurrency: int,
+        generate_concurrency: int,
+        force: bool = False,
+        save_user: Optional[str] = None,
+    ):
+        """
+        Args:
+            output: JSONL file finished decks are appended to
+            checkpoint: File the IDs of finished items are appended to
+            extract_concurrency: Items in the OCR/transcript stage at once
+            generate_concurrency: Items in the generation stage at once
+            force: Ignore cached generations
+            save_user: Also store decks in the deck store under this user ID
+        """
+        self.output = output
+        self.checkpoint = checkpoint
+        self.extract_concurrency = max(1, extract_concurrency)
+        self.generate_concurrency = max(1, generate_concurrency)
+        self.force = force
+        self.save_user = save_user
+        self.done = 0
+        self.failed = 0
+        self.total = 0
+        self._started = 0.0
+
+    async def _extract(self, item: BatchItem) -> None:
+        """Fill item.sections with the text the cards are generated from."""
+        if item.kind == "notes":
+            item.sections, stats = page_sections(await recognize_pages(item.pages), list(range(len(item.pages))))
+            if Config.PROMPT_COMPACTION:
+                item.compaction = stats
+            if not item.sections:
+                raise ValueError("No text recognized in the images")
+        else:
+            segments = await get_transcript_segments(item.video_id)
+            if not segments:
+                raise ValueError("Could not fetch transcript")
+            if Config.PROMPT_COMPACTION:
+                segments, item.compaction = compact_segments(segments)
+            chunks = Transcript.from_segments(segments).chunks(
+                Config.LLM_CHUNK_TOKENS, Config.TRANSCRIPT_WINDOW_SECONDS
+            )
+            item.sections = [Section(chunk.text, (chunk.start, chunk.end)) for chunk in chunks]
+
+    async def _generate(self, item: BatchItem) -> None:
+        """Generate, parse and de-duplicate the item's cards."""
+        build_prompt = create_flashcard_prompt if item.kind == "notes" else create_youtube_flashcard_prompt
+        groups = pack_sections(item.sections, Config.LLM_CHUNK_TOKENS)
+        deduplicator = CardDeduplicator()
+        if len(groups) == 1:
+            text = await generate_flashcards_cached(join_sections(groups[0]), build_prompt, force=self.force)
+            for front, back, tag in parse_tagged_flashcards(text):
+                if deduplicator.add(front, back):
+                    item.cards.append((front, back))
+                    item.spans.append(section_source(groups[0], tag))
+        else:
+            failed = 0
+            async for result in generate_flashcards_chunked(
+                [join_sections(group) for group in groups], build_prompt, force=self.force,
+                deduplicator=deduplicator,
+            ):
+                failed += result.error is not None
+                item.cards.extend(result.cards)
+                item.spans.extend(section_source(groups[result.index], tag) for tag in result.sections)
+            # An incomplete deck is not written or checkpointed; a rerun only regenerates the failed chunks
+            if failed:
+                raise ValueError(f"{failed} of {len(groups)} chunk(s) failed to generate")
+        item.duplicates = deduplicator.removed
+        if not item.cards:
+            raise ValueError("No flashcards generated")
+
+    async def _finish(self, item: BatchItem) -> None:
+        """Write a finished deck and record it in the checkpoint."""
+        if self.save_user is not None:
+            await asyncio.to_thread(
+                get_deck_store().save_deck, self.save_user, item.id, item.title, item.cards, item.spans,
+                [page.sha256 for page in item.pages],
+            )
+
+        record = {
+            "id": item.id,
+            "kind": item.kind,
+            "title": item.title,
+            "video_id": item.video_id,
+            "pages": [page.path.name for page in item.pages],
+            "cards": [
+                {"front": front, "back": back, "span": card_span}
+                for (front, back), card_span in zip(item.cards, item.spans)
+            ],
+            "duplicates_removed": item.duplicates,
+            "prompt_tokens": None if item.compaction is None else {
+                "before": item.compaction.tokens_before, "after": item.compaction.tokens_after
+            },
+            "seconds": round(time.perf_counter() - item.started, 3),
+        }
+        with self.output.open("a", encoding="utf-8") as out:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # The checkpoint is written after the deck, so a crash in between repeats the item
+        with self.checkpoint.open("a", encoding="utf-8") as out:
+            out.write(item.id + "\n")
+
+        self.done += 1
+        compaction = f", prompt text {item.compaction}" if item.compaction else ""
+        print(f"📚 [{self.done + self.failed}/{self.total}] {item.title}: {len(item.cards)} cards{compaction} "
+              f"({self.items_per_minute():.1f} items/min)")
+
+    def _fail(self, item: BatchItem, error: Exception) -> None:
+        self.failed += 1
+        print(f"❌ [{self.done + self.failed}/{self.total}] {item.title}: {error}")
+
+    def items_per_minute(self) -> float:
+        """Finished items per minute since the run started."""
+        elapsed = time.perf_counter() - self._started
+        return self.done / elapsed * 60 if elapsed else 0.0
+
+    async def run(self, items: List[BatchItem]) -> None:
+        """
+        Process items with bounded concurrency in each stage.
+
+        Failed items are reported and left out of the checkpoint, so the
+        next run retries them.
+
+        Args:
+            items: Items not finished by an earlier run
+        """
+        self.total = len(items)
+        self._started = time.perf_counter()
+
+        pending: "asyncio.Queue[Optional[BatchItem]]" = asyncio.Queue()
+        # Bounded so extraction cannot run far ahead of generation
+        extracted: "asyncio.Queue[Optional[BatchItem]]" = asyncio.Queue(maxsize=self.generate_concurrency * 2)
+        for item in items:
+            pending.put_nowait(item)
+
+        async def extract_worker() -> None:
+            while not pending.empty():
+                item = pending.get_nowait()
+                item.started = time.perf_counter()
+                try:
+                    await self._extract(item)
+                except Exception as e:
+                    self._fail(item, e)
+                    continue
+                await extracted.put(item)
+
+        async def generate_worker() -> None:
+            while (item := await extracted.get()) is not None:
+                try:
+                    await self._generate(item)
+                    await self._finish(item)
+                except Exception as e:
+                    self._fail(item, e)
+
+        generators = [asyncio.create_task(generate_worker()) for _ in range(self.generate_concurrency)]
+        await asyncio.gather(*(extract_worker() for _ in range(self.extract_concurrency)))
+        for _ in generators:
+            await extracted.put(None)
+        await asyncio.gather(*generators)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m lahacks_24.cli", description="Generate flashcard decks in bulk, without the web UI."
+    )
+    parser.add_argument("--notes", action="append", default=[], metavar="PATH",
+                        help="Folder of page images (one deck) or a single image; repeatable")
+    parser.add_argument("--page-per-deck", action="store_true",
+                        help="Make a separate deck of every image in a --notes folder")
+    parser.add_argument("--video", action="append", default=[], metavar="URL",
+                        help="YouTube video URL or ID; repeatable")
+    parser.add_argument("--videos", type=Path, metavar="FILE",
+                        help="Text file with one video URL or ID per line, e.g. an exported playlist")
+    parser.add_argument("-o", "--output", type=Path, default=Path("decks.jsonl"), help="JSONL file decks are appended to")
+    parser.add_argument("--checkpoint", type=Path,
+                        help="File recording finished items (default: <output>.checkpoint)")
+    parser.add_argument("--extract-concurrency", type=int, default=Config.OCR_BATCH_CONCURRENCY,
+                        help="Items in the OCR/transcript stage at once")
+    parser.add_argument("--generate-concurrency", type=int, default=Config.LLM_MAX_CONCURRENCY,
+                        help="Items in the generation stage at once")
+    parser.add_argument("--force", action="store_true", help="Ignore cached generations")
+    parser.add_argument("--save", metavar="USER_ID", help="Also store decks in the deck database under this user")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    videos = list(args.video) + (read_lines(args.videos) if args.videos else [])
+    items = discover_notes(args.notes, args.page_per_deck) + discover_videos(videos)
+
+    checkpoint = args.checkpoint or args.output.with_name(args.output.name + ".checkpoint")
+    finished = load_checkpoint(checkpoint)
+    todo = [item for item in items if item.id not in finished]
+    print(f"📝 {len(items)} item(s), {len(items) - len(todo)} already done, {len(todo)} to generate")
+
+    runner = BatchRunner(
+        args.output, checkpoint, args.extract_concurrency, args.generate_concurrency,
+        force=args.force, save_user=args.save,
+    )
+    started = time.perf_counter()
+    try:
+        # Interactive users of the same quotas go first
+        with priority(BATCH):
+            await runner.run(todo)
+    finally:
+        await close_client()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {runner.done} deck(s) written to {args.output}, {runner.failed} failed, "
+          f"in {elapsed:.1f}s ({runner.items_per_minute():.1f} items/min)")
+    return 1 if runner.failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not args.notes and not args.video and not args.videos:
+        print("❌ Nothing to do: pass --notes, --video or --videos")
+        return 2
+    Config.validate()
+    return asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
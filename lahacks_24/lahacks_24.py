@@ -4,147 +4,249 @@ Main application module using Reflex framework.
 """
 
 from rxconfig import config
-import re
 import reflex as rx
+from fastapi.responses import PlainTextResponse
 
 # Import configuration and utilities
 from .config import Config
-from .utils.ocr import extract_text_from_image
-from .utils.ai import (
-    create_flashcard_prompt,
-    create_youtube_flashcard_prompt,
-    generate_flashcards
-)
-from .utils.youtube import extract_video_id, get_video_transcript
+from .pipeline import run_notes_job, run_span_job, run_video_job
+from .utils.imaging import create_thumbnails
+from .utils.dedup import dedup_cards
+from .utils.parsing import parse_flashcards
+from .utils.jobs import CANCELLED, DONE, FAILED, Job, JobLimitError, get_job_queue
+from .utils.metrics import render_prometheus
+from .utils.uploads import StoredUpload, UploadTooLargeError, save_upload
 
 class State(rx.State):
-    img: list = []  # If this holds multiple image filenames
-    cards_list: list[tuple[str, str]] = []  # Actual cards, with back and front, in one tuple
-    visual_cards_list: list[str] = [] # List of cards (front or back side) that are visible to the user
+    img: list = []  # If this holds multiple image filenames, as the user uploaded them
+    _stored: list[str] = []  # Content-addressed names of the same images in the upload directory
+    thumbnails: list[str] = []  # Small previews of the uploaded images, shown instead of the originals
+    _cards: list[tuple[str, str]] = []  # The whole deck; stays on the backend
+    cards_list: list[tuple[str, str]] = []  # Cards on the current page, with back and front, in one tuple
+    card_count: int = 0
+    page: int = 0
+    page_count: int = 1
+    flipped: str = "" # One character per card, "1" if its back side is showing
     flash_text: str = "" # Used for storing the text generated by the model
     processing: bool = False 
     complete: bool = False
     yt_link: str = ""
     yt_transcript: str = ""
+    span_from: str = "" # Time range of the video, in minutes, to extend or regenerate
+    span_to: str = ""
+    job_id: str = "" # Background job generating the current deck
+    job_stage: str = ""
+    job_done: int = 0
+    job_total: int = 0
+    status_message: str = "" # Shown to the user when generation fails, is cancelled or finishes with a notice
 
     # test_card: list[tuple[str, str]] = [("Front: What is the capital of France?", "Back: Paris")] # Use for testinf
 
     async def split_flashcards_list(self, data: list[str]):
-        # Remove any empty entries and extra whitespace
-        pattern = r"^\**\s*(Front|Back)\**\s*:\s*"  # Pattern to remove any leading asterisks, spaces, and "Front:" or "Back:"
-        cleaned_data = [re.sub(pattern, '', line.strip()) for line in data if line.strip()]
-        fronts = []
-        
+        """Parse lines of generated text into the deck, skipping malformed pairs and near-duplicates."""
+        self._cards, removed = dedup_cards(parse_flashcards("\n".join(data)))
+        if removed:
+            print(f"✅ Removed {removed} duplicate card(s)")
+        self.card_count = len(self._cards)
+        self._show_page(0)
+
+    def _show_page(self, page: int):
+        """Send one page of the deck to the client, front sides up."""
+        size = Config.CARDS_PAGE_SIZE
+        self.page_count = max(1, -(-len(self._cards) // size))
+        self.page = min(max(page, 0), self.page_count - 1)
+        start = self.page * size
+        self.cards_list = self._cards[start:start + size]
+        self.flipped = "0" * len(self.cards_list)
+
+    def _add_cards(self, cards: list[tuple[str, str]]):
+        """Append (front, back) pairs to the deck, showing their front side."""
+        if not cards:
+            return
+        size = Config.CARDS_PAGE_SIZE
+        self._cards = self._cards + list(cards)
+        self.card_count = len(self._cards)
+        self.page_count = max(1, -(-len(self._cards) // size))
+
+        # Only the current page is sent to the client; refresh it while it has room
+        if len(self.cards_list) < size:
+            start = self.page * size
+            visible = self._cards[start:start + size]
+            self.flipped += "0" * (len(visible) - len(self.cards_list))
+            self.cards_list = visible
+
+    async def next_page(self):
+        """Show the next page of the deck."""
+        self._show_page(self.page + 1)
+
+    async def prev_page(self):
+        """Show the previous page of the deck."""
+        self._show_page(self.page - 1)
+
+    def _reset_cards(self):
+        """Clear the deck before a new generation starts."""
+        self._cards = []
+        self.card_count = 0
+        self._show_page(0)
+        self.processing = True
+        self.complete = False
+        self.status_message = ""
 
-        # Check if the number of elements in the list is even after cleaning
-        if len(cleaned_data) % 2 != 0:
-            raise ValueError("The number of flashcard elements must be even (each front should have a corresponding back).")
-
-        # Create pairs of (front, back)
-        flashcards = []
-        for i in range(0, len(cleaned_data), 2):
-            front = cleaned_data[i]
-            fronts.append(front)
-            back = cleaned_data[i+1]
-            flashcards.append((front, back))
-        
-        self.cards_list = flashcards
-        self.visual_cards_list = fronts
+    async def _start_job(self, kind: str, runner):
+        """Queue a generation job and return the event that follows its progress."""
+        self._reset_cards()
+        try:
+            job = await get_job_queue().submit(self.router.session.client_token, kind, runner)
+        except JobLimitError as e:
+            print(f"⚠️  {e}")
+            self.status_message = str(e)
+            self.processing = False
+            return None
+
+        self.job_id = job.id
+        return State.watch_job
 
+    def _sync_job(self, job: Job):
+        """Copy a job's progress and newly generated cards into the state."""
+        self._add_cards(job.cards[len(self._cards):])
+        self.job_stage = job.stage
+        self.job_done, self.job_total = job.progress.get(job.stage, (0, 0))
+
+        if job.finished:
+            self.processing = False
+            self.complete = job.status == DONE or bool(self._cards)
+            if job.status == FAILED:
+                self.status_message = f"Generation failed: {job.error}"
+            elif job.status == CANCELLED:
+                self.status_message = "Generation cancelled"
+            elif job.failed_chunks:
+                self.status_message = (
+                    f"{job.failed_chunks} part(s) of the source could not be turned into cards, so the deck "
+                    "is incomplete and was not saved. Generate it again to fill in the missing parts."
+                )
+            elif job.notice:
+                self.status_message = job.notice
+
+    @rx.background
+    async def watch_job(self):
+        """Follow the current job until it finishes, pushing progress and cards to the UI."""
+        async with self:
+            job = get_job_queue().get(self.job_id)
+
+        version = -1
+        while job is not None:
+            version = await job.wait_for_change(version, timeout=Config.JOB_POLL_INTERVAL)
+            async with self:
+                # A newer job replaced this one; its own watcher takes over
+                if self.job_id != job.id:
+                    return
+                self._sync_job(job)
+            if job.finished:
+                return
+
+    async def cancel_job(self):
+        """Cancel the job currently generating cards."""
+        if self.job_id:
+            get_job_queue().cancel(self.job_id)
 
     async def create_flashcard_prompt(self, files: list[rx.UploadFile]):
-        """Process uploaded images and generate flashcards using OCR and AI."""
-        self.processing = True
+        """Save uploaded images and queue a job that generates flashcards from them."""
+        self.img = []
+        self._stored = []
+        self.thumbnails = []
+        self.yt_link = ""
 
         try:
-            # Handle the upload of file(s)
+            # Stream each upload to disk, hashing it on the way
+            pages = []
             for file in files:
-                upload_data = await file.read()
-                outfile = rx.get_upload_dir() / file.filename
-
-                # Save the file
-                with outfile.open("wb") as file_object:
-                    file_object.write(upload_data)
+                page = await save_upload(file, rx.get_upload_dir())
 
                 # Update the img var
-                self.img.append(file.filename)
-
-            print("📸 Processing uploaded image...")
-            
-            # Text recognition from image using OCR
-            with open(file.filename, "rb") as f:
-                image_data = f.read()
-
-            generated_text = await extract_text_from_image(image_data)
-            print(f"📝 Extracted text: {generated_text}")
-
-            # Generate flashcards based on OCR result
-            prompt = create_flashcard_prompt(generated_text)
-            self.flash_text = await generate_flashcards(prompt)
-            
-            print(f"✅ Generated flashcards:\n{self.flash_text}")
-            
-            self.processing = False
-            self.complete = True
-            await self.split_flashcards_list(self.flash_text.split('\n'))
-            
+                self.img.append(page.name)
+                self._stored.append(page.path.name)
+                pages.append(page)
+
+        except UploadTooLargeError as e:
+            print(f"❌ {e}")
+            self.status_message = str(e)
+            return None
         except Exception as e:
-            print(f"❌ Error processing flashcards: {e}")
-            self.processing = False
-            self.complete = False
+            print(f"❌ Error saving uploaded files: {e}")
+            self.status_message = "Could not save the uploaded files"
+            return None
 
-    async def swap_card(self, idx):
-        if self.visual_cards_list[idx] == self.cards_list[idx][0]:
-            self.visual_cards_list[idx] = self.cards_list[idx][1]
-        else:
-            self.visual_cards_list[idx] = self.cards_list[idx][0]
+        # The deck page shows small previews instead of the full-resolution photos
+        try:
+            self.thumbnails = await create_thumbnails(
+                [page.path for page in pages],
+                Config.THUMBNAIL_MAX_SIDE,
+                Config.THUMBNAIL_QUALITY,
+                Config.IMAGE_WORKERS,
+            )
+        except Exception as e:
+            print(f"⚠️  Could not create thumbnails: {e}")
 
-    async def upload(self, files: list[rx.UploadFile]):
-        
-        await self.create_flashcard_prompt(files)
+        print(f"📸 Processing {len(pages)} uploaded image(s)...")
+        title = ", ".join(self.img)
+        return await self._start_job("notes", lambda job: run_notes_job(job, pages, title))
 
-        return rx.redirect("/quizlet")
+    async def regenerate(self):
+        """Generate fresh cards for the current source, bypassing the caches."""
+        if self.yt_link:
+            video_url = self.yt_link
+            return await self._start_job("video", lambda job: run_video_job(job, video_url, force=True))
 
-    async def create_youtube_prompt(self, link: str):
-        """Extract YouTube transcript and generate flashcards."""
-        self.processing = True
-        
+        if self._stored:
+            pages = [StoredUpload.from_path(rx.get_upload_dir() / filename) for filename in self._stored]
+            title = ", ".join(self.img)
+            return await self._start_job("notes", lambda job: run_notes_job(job, pages, title, force=True))
+
+    async def _start_span_job(self, replace: bool):
+        """Queue a job that generates cards for one time range of the current video only."""
         try:
-            # Extract video ID from URL
-            video_url = link["prompt_text"]
-            video_id = extract_video_id(video_url)
-            
-            if not video_id:
-                print("❌ Invalid YouTube URL")
-                self.processing = False
-                return
-            
-            print(f"🎥 Fetching transcript for video: {video_id}")
-            
-            # Get the transcript from the YouTube video
-            transcript = await get_video_transcript(video_id)
-            
-            if not transcript:
-                print("❌ Could not fetch transcript")
-                self.processing = False
-                return
-            
-            print(f"📝 Transcript length: {len(transcript)} characters")
-            
-            # Generate flashcards from transcript
-            prompt = create_youtube_flashcard_prompt(transcript)
-            self.flash_text = await generate_flashcards(prompt)
-            
-            print(f"✅ Generated flashcards:\n{self.flash_text}")
-            
-            self.processing = False
-            self.complete = True
-            await self.split_flashcards_list(self.flash_text.split('\n'))
-            
-        except Exception as e:
-            print(f"❌ Error processing YouTube video: {e}")
-            self.processing = False
-            self.complete = False
+            start, end = float(self.span_from) * 60, float(self.span_to) * 60
+        except ValueError:
+            self.status_message = "Enter the time range in minutes, e.g. 40 to 55"
+            return None
+        video_url = self.yt_link
+        return await self._start_job("video", lambda job: run_span_job(job, video_url, start, end, replace=replace))
+
+    async def extend_span(self):
+        """Add more cards about the chosen time range of the video."""
+        return await self._start_span_job(replace=False)
+
+    async def regenerate_span(self):
+        """Replace the cards generated from the chosen time range of the video."""
+        return await self._start_span_job(replace=True)
+
+    async def swap_card(self, idx: int):
+        """
+        Toggle which side of a card is showing.
+
+        Only the short ``flipped`` string changes, so a flip sends one
+        character per card to the client instead of re-sending every card's text.
+        """
+        if not 0 <= idx < len(self.flipped):
+            return
+        side = "0" if self.flipped[idx] == "1" else "1"
+        self.flipped = self.flipped[:idx] + side + self.flipped[idx + 1:]
+
+    async def upload(self, files: list[rx.UploadFile]):
+        # Generation runs in the background; show the deck page and follow the job there
+        watch = await self.create_flashcard_prompt(files)
+        if watch is None:
+            return rx.redirect("/quizlet")
+        return [rx.redirect("/quizlet"), watch]
+
+    async def create_youtube_prompt(self, link: str):
+        """Queue a job that extracts a YouTube transcript and generates flashcards."""
+        self.img = []
+        self._stored = []
+        self.thumbnails = []
+        self.yt_link = link["prompt_text"]
+        video_url = self.yt_link
+        return await self._start_job("video", lambda job: run_video_job(job, video_url))
 
         
 
@@ -364,27 +466,73 @@ def fb(card, index):
         'width': '100%',  # Full width of the container
     }
     return rx.box(
-        rx.text(card, style={'font_size': '1rem', 'color': '#333'}),
+        rx.text(
+            rx.cond(State.flipped[index] == "1", card[1], card[0]),
+            style={'font_size': '1rem', 'color': '#333'},
+        ),
         on_click=lambda: State.swap_card(index),
         style=card_style
     )
 
 def quizlet_page():
     flashcards_content = rx.box(
-        rx.foreach(State.img, lambda img: rx.image(src=rx.get_upload_url(State.img), 
-                                                   width="50vw",
-                                                   height="auto",
-                                                   border="5px solid #555")),
+        rx.hstack(
+            rx.foreach(State.thumbnails, lambda thumbnail: rx.image(src=rx.get_upload_url(thumbnail),
+                                                                    width="10rem",
+                                                                    height="auto",
+                                                                    loading="lazy",
+                                                                    border="3px solid #555")),
+            flex_wrap="wrap",
+        ),
         rx.foreach(
-        State.visual_cards_list,
-        lambda card, index: fb(card, index))
+        State.cards_list,
+        lambda card, index: fb(card, index)),
+        rx.cond(
+            State.page_count > 1,
+            rx.hstack(
+                rx.button("Previous", on_click=State.prev_page, disabled=State.page == 0, cursor="pointer"),
+                rx.text("Page ", State.page + 1, " of ", State.page_count, " (", State.card_count, " cards)"),
+                rx.button("Next", on_click=State.next_page,
+                          disabled=State.page + 1 >= State.page_count, cursor="pointer"),
+            ),
+        ),
+        rx.cond(
+            State.complete,
+            rx.button(
+                "Regenerate cards",
+                on_click=State.regenerate,
+                color=color,
+                bg="white",
+                border=f"2px solid {color}",
+                border_radius="10px",
+                cursor="pointer",
+            ),
+        ),
+        rx.cond(
+            State.complete & (State.yt_link != ""),
+            rx.hstack(
+                rx.text("Minutes"),
+                rx.input(placeholder="from", value=State.span_from, on_change=State.set_span_from, width="5em"),
+                rx.input(placeholder="to", value=State.span_to, on_change=State.set_span_to, width="5em"),
+                rx.button("More cards", on_click=State.extend_span, cursor="pointer"),
+                rx.button("Regenerate range", on_click=State.regenerate_span, cursor="pointer"),
+            ),
+        ),
     )
 
-    content = rx.cond(
-        State.processing,
-        rx.chakra.circular_progress(is_indeterminate=True),
+    # Cards are shown while they stream in, below the progress indicator
+    content = rx.vstack(
         rx.cond(
-            State.complete,
+            State.processing,
+            rx.hstack(
+                rx.chakra.circular_progress(is_indeterminate=True),
+                rx.text(State.job_stage, ": ", State.job_done, "/", State.job_total),
+                rx.button("Cancel", on_click=State.cancel_job, cursor="pointer"),
+            ),
+        ),
+        rx.cond(State.status_message != "", rx.text(State.status_message, color="red")),
+        rx.cond(
+            State.processing | State.complete,
             flashcards_content,
             rx.text("Waiting to process flashcards...")
         )
@@ -402,7 +550,21 @@ def quizlet_page():
 
 
 
+# Validate configuration when the app starts rather than whenever config is imported,
+# so workers and command-line tools that never call the APIs start quietly
+if not Config.validate():
+    print("\n📝 To fix this:")
+    print("1. Copy .env.example to .env")
+    print("2. Add your API keys to the .env file")
+    print("3. Restart the application\n")
+
+async def metrics():
+    """Serve pipeline latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 app = rx.App()
+app.api.add_api_route("/metrics", metrics, methods=["GET"])
 app.add_page(index)
 app.add_page(quizlet_page, route="/quizlet")
 
@@ -0,0 +1,497 @@
+"""
+Flashcard generation pipelines.
+
+Each pipeline runs as a background job: it reports per-stage progress and
+publishes cards on the Job as they are generated, without touching UI state.
+"""
+
+import asyncio
+import time
+from contextlib import ExitStack
+from typing import Callable, List, Optional, Tuple
+
+from .config import Config
+from .utils.ai import (
+    create_flashcard_prompt,
+    create_youtube_flashcard_prompt,
+    generate_flashcards_chunked,
+    generation_stats,
+    stream_flashcards_cached
+)
+from .utils.cache import content_hash
+from .utils.chunking import Section, chunk_text, join_sections, pack_sections, section_source
+from .utils.compaction import CompactionStats, compact_ocr_text, compact_segments
+from .utils.dedup import CardDeduplicator
+from .utils.imaging import normalize_images
+from .utils.jobs import Job
+from .utils.metrics import span, stage_seconds
+from .utils.ocr import PageResult, extract_text_from_images, join_pages
+from .utils.parsing import FlashcardParser, TaggedCard
+from .utils.storage import Deck, get_deck_store
+from .utils.uploads import StoredUpload
+from .utils.transcript import Span, Transcript, overlaps
+from .utils.youtube import extract_video_id, get_transcript_segments
+
+
+# Share of both the upload's and a saved deck's pages they must have in common
+# for the upload to update that deck instead of starting a new one
+MIN_SHARED_PAGES = 0.5
+
+
+def notes_source_hash(pages: List[StoredUpload]) -> str:
+    """Hash identifying a deck generated from these pages, in this order."""
+    return content_hash("pages", *(page.sha256 for page in pages))
+
+
+def video_source_hash(video_id: str) -> str:
+    """Hash identifying a deck generated from a YouTube video."""
+    return content_hash("youtube", video_id)
+
+
+async def _open_saved_deck(job: Job, source_hash: str) -> bool:
+    """Publish a previously generated deck for this source instead of regenerating it."""
+    try:
+        with span("deck_lookup"):
+            deck = await asyncio.to_thread(get_deck_store().load_deck, source_hash)
+    except Exception as e:
+        print(f"⚠️  Could not look up saved deck: {e}")
+        return False
+
+    if deck is None or not deck.cards:
+        return False
+
+    print(f"📚 Reopened saved deck {deck.id} with {len(deck.cards)} cards")
+    job.add_cards(deck.cards, deck.spans)
+    return True
+
+
+async def _find_previous_deck(pages: List[StoredUpload], user_id: str) -> Optional[Deck]:
+    """
+    Find the user's deck of an earlier version of these pages, e.g. the notebook before pages were added.
+
+    Only the user's own decks are considered: another user's deck of shared
+    class notes may hold cards from pages this user never uploaded.
+    """
+    hashes = {page.sha256 for page in pages}
+    try:
+        with span("deck_lookup"):
+            deck = await asyncio.to_thread(get_deck_store().find_deck_by_pages, list(hashes), user_id)
+    except Exception as e:
+        print(f"⚠️  Could not look up previous deck: {e}")
+        return None
+
+    if deck is None or not deck.cards:
+        return None
+    # Without the pages each card came from, stale cards could not be told apart
+    if any(card_span is None for card_span in deck.spans):
+        print(f"⚠️  Deck {deck.id} has no page provenance; generating a new deck")
+        return None
+    # A shared cover page does not make two uploads the same notebook, and
+    # a few pages of a notebook are not a new version of it
+    shared = len(hashes & set(deck.pages))
+    if shared < len(hashes) * MIN_SHARED_PAGES or shared < len(set(deck.pages)) * MIN_SHARED_PAGES:
+        return None
+    return deck
+
+
+async def _save_deck(job: Job, source_hash: str, title: str, pages: Optional[List[StoredUpload]] = None) -> None:
+    """Persist the generated deck so it can be reopened without regeneration."""
+    if not job.cards:
+        return
+    if job.failed_chunks:
+        # Saving would serve the missing chunks' gap on every reopen; the next
+        # run regenerates only those chunks, the others come from the cache
+        print(f"⚠️  Not saving deck: {job.failed_chunks} chunk(s) failed to generate")
+        return
+    page_hashes = [page.sha256 for page in pages] if pages else None
+    try:
+        with span("deck_save"):
+            deck_id = await asyncio.to_thread(
+                get_deck_store().save_deck, job.user_id, source_hash, title, list(job.cards), list(job.spans),
+                page_hashes,
+            )
+        print(f"💾 Saved deck {deck_id}")
+    except Exception as e:
+        print(f"⚠️  Could not save deck: {e}")
+
+
+async def _stream_cards(
+    job: Job,
+    sections: List[Section],
+    build_prompt: Callable[[str], str],
+    force: bool = False,
+    deduplicator: Optional[CardDeduplicator] = None,
+) -> None:
+    """Stream flashcards from the model, publishing each card as soon as it is complete."""
+    parser = FlashcardParser()
+    deduplicator = deduplicator or CardDeduplicator()
+    started = time.perf_counter()
+    parse_seconds = 0.0
+    job.set_stage("generate", 0, 1)
+
+    def publish(tagged: List[TaggedCard]) -> None:
+        kept = [(front, back, tag) for front, back, tag in tagged if deduplicator.add(front, back)]
+        job.add_cards([(front, back) for front, back, _ in kept],
+                      [section_source(sections, tag) for *_, tag in kept])
+
+    with span("generate"):
+        async for text in stream_flashcards_cached(join_sections(sections), build_prompt, force=force):
+            parse_started = time.perf_counter()
+            tagged = parser.feed_tagged(text)
+            parse_seconds += time.perf_counter() - parse_started
+            if tagged and not job.cards:
+                print(f"⏱️  First card after {time.perf_counter() - started:.2f}s")
+            publish(tagged)
+
+        publish(parser.close_tagged())
+    # Parsing is interleaved with the stream, so its share is measured separately
+    stage_seconds.observe(parse_seconds, stage="parse")
+    job.advance("generate")
+    print(f"✅ Generated {len(job.cards)} flashcards in {time.perf_counter() - started:.2f}s"
+          f" ({parser.skipped} malformed skipped, {deduplicator.removed} duplicates removed)")
+
+
+async def _generate_cards(
+    job: Job,
+    sections: List[Section],
+    build_prompt: Callable[[str], str],
+    force: bool = False,
+    deduplicator: Optional[CardDeduplicator] = None,
+) -> None:
+    """
+    Generate cards from source sections packed into token-budgeted prompts:
+    streamed for one prompt, map-reduce for several.
+
+    Each card records the source of the section the model tagged it with,
+    or of its whole prompt if it has no valid tag.
+    """
+    deduplicator = deduplicator or CardDeduplicator()
+    groups = pack_sections(sections, Config.LLM_CHUNK_TOKENS)
+    if len(groups) == 1:
+        await _stream_cards(job, groups[0], build_prompt, force=force, deduplicator=deduplicator)
+        return
+
+    started = time.perf_counter()
+    job.set_stage("generate", 0, len(groups))
+    with span("generate"):
+        async for result in generate_flashcards_chunked(
+            [join_sections(group) for group in groups], build_prompt, force=force, deduplicator=deduplicator
+        ):
+            if result.error is not None:
+                job.failed_chunks += 1
+            group = groups[result.index]
+            job.add_cards(result.cards, [section_source(group, tag) for tag in result.sections])
+            job.advance("generate")
+    print(f"✅ Generated {len(job.cards)} flashcards in {time.perf_counter() - started:.2f}s"
+          f" ({deduplicator.removed} duplicates removed, {job.failed_chunks} chunk(s) failed)")
+
+
+async def recognize_pages(
+    pages: List[StoredUpload], on_page: Optional[Callable[[PageResult], None]] = None
+) -> List[PageResult]:
+    """
+    Recognize the text of stored page images, normalizing them first if enabled.
+
+    Args:
+        pages: Stored uploads of each page, in page order
+        on_page: Called with each PageResult as soon as that page is done
+
+    Returns:
+        One PageResult per page, in page order
+    """
+    hashes = [page.sha256 for page in pages]
+    started = time.perf_counter()
+    if Config.OCR_NORMALIZE:
+        # Decode, orient, grayscale and shrink every photo in worker processes
+        # so only compact images travel to the OCR backend
+        max_side = Config.OCR_PAGE_MAX_SIDE if Config.OCR_SEGMENT_LINES else Config.OCR_MODEL_INPUT_SIDE
+        with span("normalize"):
+            normalized = await normalize_images(
+                [page.path for page in pages], max_side, Config.OCR_JPEG_QUALITY, Config.IMAGE_WORKERS
+            )
+        original_size = sum(page.size for page in pages)
+        normalized_size = sum(len(image) for image in normalized if image is not None)
+        print(f"🗜️  Normalized {len(pages)} page(s) in {time.perf_counter() - started:.2f}s: "
+              f"{original_size} -> {normalized_size} bytes "
+              f"({original_size - normalized_size} saved)")
+
+        content_ids = [content_hash(digest, "normalized", str(max_side), str(Config.OCR_JPEG_QUALITY))
+                       for digest in hashes]
+        # Pages that could not be decoded are skipped and reported without text
+        with span("ocr"):
+            results = await extract_text_from_images(normalized, on_page=on_page, content_ids=content_ids)
+    else:
+        # Text recognition from every page using OCR, reading the stored files
+        # through memory maps instead of loading them into memory again
+        with ExitStack() as stack:
+            buffers = [stack.enter_context(page.open_buffer()) for page in pages]
+            with span("ocr"):
+                results = await extract_text_from_images(buffers, on_page=on_page, content_ids=hashes)
+    elapsed = time.perf_counter() - started
+    for result in results:
+        print(f"📄 Page {result.index + 1}: {result.seconds:.2f}s")
+    print(f"⏱️  OCR of {len(results)} page(s) took {elapsed:.2f}s "
+          f"({len(results) / elapsed if elapsed else 0:.2f} pages/s)")
+    return results
+
+
+async def run_notes_job(
+    job: Job, pages: List[StoredUpload], title: str, force: bool = False
+) -> None:
+    """
+    Recognize the text of every page and generate flashcards from it.
+
+    If the pages are a new version of notes the user already has a deck of,
+    for example a notebook uploaded again with pages added or changed, only
+    the new and changed pages are recognized and generated. Each card
+    records the pages it came from, so the previous deck's cards of pages
+    that changed or are gone are dropped and the rest are kept.
+
+    Args:
+        job: Job receiving progress and cards
+        pages: Stored uploads of each page, in page order
+        title: Deck title used when the deck is saved
+        force: Regenerate every page even if a deck or cached generation exists
+    """
+    source_hash = notes_source_hash(pages)
+    if not force and await _open_saved_deck(job, source_hash):
+        return
+
+    deduplicator = CardDeduplicator()
+    redo = list(range(len(pages)))
+    previous = None if force else await _find_previous_deck(pages, job.user_id)
+    if previous is not None:
+        kept, redo = _diff_pages(previous, pages)
+        print(f"📚 Updating deck {previous.id}: {len(redo)} of {len(pages)} page(s) to generate, "
+              f"{len(kept)} of {len(previous.cards)} cards kept")
+        # New cards must not repeat the kept ones, but may repeat the dropped ones they replace
+        for (front, back), _ in kept:
+            deduplicator.add(front, back)
+        job.add_cards([card for card, _ in kept], [card_span for _, card_span in kept])
+
+    if redo:
+        await _generate_from_pages(job, pages, redo, force, deduplicator)
+
+    await _save_deck(job, source_hash, title, pages)
+    print(f"📊 Generation cache: {generation_stats()}")
+
+
+def _diff_pages(previous: Deck, pages: List[StoredUpload]) -> Tuple[List[Tuple[Tuple[str, str], Span]], List[int]]:
+    """
+    Match the cards of a previous deck against a new upload of its pages.
+
+    A card's span is the range of page positions it was generated from. A
+    card is kept only if every one of its pages is still uploaded; its span
+    is moved to the pages' new positions. The pages of dropped cards that
+    are still uploaded are generated again along with the new pages, so
+    their content is not lost with the card.
+
+    Args:
+        previous: Previous deck with its cards' spans and its page hashes
+        pages: The new upload, in page order
+
+    Returns:
+        The kept cards with their new spans, and the positions of the pages to generate
+    """
+    positions = {page.sha256: index for index, page in enumerate(pages)}
+    kept = []
+    stale = set()
+    for card, (first, last) in zip(previous.cards, previous.spans):
+        sources = previous.pages[int(first):int(last)]
+        if sources and all(page_hash in positions for page_hash in sources):
+            moved = [positions[page_hash] for page_hash in sources]
+            kept.append((card, (min(moved), max(moved) + 1)))
+        else:
+            stale.update(sources)
+
+    known = set(previous.pages)
+    redo = [index for index, page in enumerate(pages) if page.sha256 not in known or page.sha256 in stale]
+    return kept, redo
+
+
+def page_sections(results: List[PageResult], positions: List[int]) -> Tuple[List[Section], CompactionStats]:
+    """
+    Turn recognized pages into generation sections whose source is the page.
+
+    Args:
+        results: OCR results of the pages, as returned by recognize_pages
+        positions: Position of each recognized page in the upload
+
+    Returns:
+        Sections of every page with text, each at most LLM_CHUNK_TOKENS and
+        with the span (position, position + 1), and the compaction totals
+    """
+    sections: List[Section] = []
+    totals = CompactionStats()
+    for result in sorted(results, key=lambda result: result.index):
+        text = result.text or ""
+        if Config.PROMPT_COMPACTION:
+            text, stats = compact_ocr_text(text)
+            totals.tokens_before += stats.tokens_before
+            totals.tokens_after += stats.tokens_after
+        position = positions[result.index]
+        sections.extend(
+            Section(chunk, (position, position + 1))
+            for chunk in chunk_text(text, Config.LLM_CHUNK_TOKENS) if chunk.strip()
+        )
+    return sections, totals
+
+
+async def _generate_from_pages(
+    job: Job, pages: List[StoredUpload], positions: List[int], force: bool, deduplicator: CardDeduplicator
+) -> None:
+    """Recognize the pages at the given positions and generate cards from their text."""
+    def on_page(result: PageResult) -> None:
+        job.advance("ocr")
+
+    job.set_stage("ocr", 0, len(positions))
+    results = await recognize_pages([pages[position] for position in positions], on_page)
+    print(f"📝 Extracted text: {join_pages(results)}")
+
+    sections, stats = page_sections(results, positions)
+    if Config.PROMPT_COMPACTION:
+        print(f"🗜️  Compacted OCR text: {stats}")
+
+    if not sections:
+        if job.cards:
+            print("⚠️  No text recognized in the new pages")
+            return
+        raise ValueError("No text recognized in the uploaded images")
+
+    # Generate flashcards based on OCR result
+    await _generate_cards(job, sections, create_flashcard_prompt, force=force, deduplicator=deduplicator)
+
+
+async def _load_transcript(job: Job, video_id: str) -> Transcript:
+    """Fetch and compact a video's transcript, reporting the transcript stage."""
+    job.set_stage("transcript", 0, 1)
+
+    # Get the timestamped transcript from the YouTube video
+    with span("transcript"):
+        segments = await get_transcript_segments(video_id)
+
+    if not segments:
+        raise ValueError("Could not fetch transcript")
+
+    job.advance("transcript")
+    if Config.PROMPT_COMPACTION:
+        segments, stats = compact_segments(segments)
+        print(f"🗜️  Compacted transcript: {stats}")
+    return Transcript.from_segments(segments)
+
+
+def _transcript_sections(transcript: Transcript) -> List[Section]:
+    """Split a transcript into TRANSCRIPT_WINDOW_SECONDS windows, each the source span of its cards."""
+    return [
+        Section(chunk.text, (chunk.start, chunk.end))
+        for chunk in transcript.chunks(Config.LLM_CHUNK_TOKENS, Config.TRANSCRIPT_WINDOW_SECONDS)
+    ]
+
+
+def _clock(seconds: float) -> str:
+    """Format a video position as m:ss or h:mm:ss."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+async def run_video_job(job: Job, video_url: str, force: bool = False) -> None:
+    """
+    Fetch a video's transcript and generate flashcards from it.
+
+    Args:
+        job: Job receiving progress and cards
+        video_url: YouTube video URL
+        force: Regenerate even if a deck or cached generation exists
+    """
+    # Extract video ID from URL
+    video_id = extract_video_id(video_url)
+
+    if not video_id:
+        raise ValueError("Invalid YouTube URL")
+
+    source_hash = video_source_hash(video_id)
+    if not force and await _open_saved_deck(job, source_hash):
+        return
+
+    print(f"🎥 Fetching transcript for video: {video_id}")
+    transcript = await _load_transcript(job, video_id)
+    sections = _transcript_sections(transcript)
+    print(f"📝 Transcript: {len(transcript)} segments in {len(sections)} window(s)")
+
+    # Short videos stream from a single prompt; long ones are generated chunk by chunk
+    await _generate_cards(job, sections, create_youtube_flashcard_prompt, force=force)
+
+    await _save_deck(job, source_hash, video_url)
+    print(f"📊 Generation cache: {generation_stats()}")
+
+
+async def run_span_job(
+    job: Job, video_url: str, start: float, end: float, replace: bool = False
+) -> None:
+    """
+    Generate cards for one time range of a video whose deck is already saved.
+
+    Only the transcript inside the range goes to the model, so the number of
+    LLM calls follows the length of the range rather than of the video. The
+    result is saved as the video's new deck.
+
+    Args:
+        job: Job receiving progress and the whole updated deck
+        video_url: YouTube video URL
+        start: Range start in seconds
+        end: Range end in seconds
+        replace: Drop the saved cards generated from the range first
+            (regenerate it) instead of adding to them (extend it)
+    """
+    video_id = extract_video_id(video_url)
+
+    if not video_id:
+        raise ValueError("Invalid YouTube URL")
+    if end <= start:
+        raise ValueError("The end of the time range must be after its start")
+
+    source_hash = video_source_hash(video_id)
+    with span("deck_lookup"):
+        deck = await asyncio.to_thread(get_deck_store().load_deck, source_hash)
+    if deck is None:
+        raise ValueError("Generate the deck for this video first")
+
+    kept = list(zip(deck.cards, deck.spans))
+    requested = start, end
+    if replace:
+        replaced = [card_span for card_span in deck.spans if overlaps(card_span, start, end)]
+        kept = [(card, card_span) for card, card_span in kept if not overlaps(card_span, start, end)]
+        # A card's span is the transcript window it came from; widen the range so replaced cards are fully covered
+        start = min([start] + [card_span[0] for card_span in replaced])
+        end = max([end] + [card_span[1] for card_span in replaced])
+        if start < requested[0] - 1 or end > requested[1] + 1:
+            job.notice = (
+                f"Some cards covered more than {_clock(requested[0])}–{_clock(requested[1])}, "
+                f"so {_clock(start)}–{_clock(end)} was regenerated"
+            )
+
+    transcript = await _load_transcript(job, video_id)
+    part = transcript.slice(start, end)
+    if not len(part):
+        raise ValueError(f"The transcript has nothing between {start:.0f}s and {end:.0f}s")
+
+    # Cards outside the range are kept as they are, and new cards must not repeat them
+    deduplicator = CardDeduplicator()
+    for (front, back), _ in kept:
+        deduplicator.add(front, back)
+    job.add_cards([card for card, _ in kept], [card_span for _, card_span in kept])
+
+    sections = _transcript_sections(part)
+    action = "Regenerating" if replace else "Extending"
+    print(f"🎥 {action} {start:.0f}-{end:.0f}s of {video_id}: {len(part)} of {len(transcript)} segments "
+          f"in {len(sections)} window(s), {len(deck.cards) - len(kept)} card(s) replaced")
+    if job.notice:
+        print(f"⚠️  {job.notice}")
+
+    # Cached generations of the range would only repeat cards the deck already has
+    await _generate_cards(
+        job, sections, create_youtube_flashcard_prompt, force=True, deduplicator=deduplicator
+    )
+
+    await _save_deck(job, source_hash, deck.title)
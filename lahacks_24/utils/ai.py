@@ -2,12 +2,73 @@
 AI utilities for generating flashcards using Google Gemini.
 """
 
-import google.generativeai as genai
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
 from ..config import Config
+from .cache import SingleFlight, build_cache, content_hash
+from .dedup import CardDeduplicator
+from .metrics import span, upstream_retries
+from .ratelimit import AdaptiveRateLimiter, RateLimitError, get_limiter
+from .parsing import parse_tagged_flashcards
+
+MODEL_NAME = 'gemini-pro'
+
+# Bump when the prompt templates change so cached generations are not reused
+PROMPT_VERSION = "2"
+
+# Gemini model, created on first use by get_model()
+_model = None
+_model_lock = threading.Lock()
+
+# Generated flashcard text keyed by model, prompt template and source text
+generation_cache = build_cache(
+    "llm",
+    max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=Config.LLM_CACHE_MAX_BYTES,
+    ttl=Config.LLM_CACHE_TTL,
+)
+_inflight = SingleFlight()
+
+# Asks the model to tag each card with the section of a sectioned source text (see chunking.join_sections)
+SECTION_INSTRUCTION = (
+    "If the text is split into parts headed [Section 1], [Section 2] and so on, write a line "
+    "\"Section: n\" after each Back, with the number of the part the flashcard is based on."
+)
 
-# Configure Google Gemini API
-genai.configure(api_key=Config.GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
+
+@dataclass
+class ChunkResult:
+    """Outcome of generating the cards of one chunk."""
+
+    index: int
+    cards: List[Tuple[str, str]] = field(default_factory=list)
+    # Section number the model tagged each card with (see chunking.join_sections), or None
+    sections: List[Optional[int]] = field(default_factory=list)
+    error: Optional[str] = None  # Set if generation failed and the chunk has no cards
+
+
+def get_model():
+    """
+    Get the shared Gemini model, configuring the API client on first use.
+    
+    The Google SDK is imported here rather than when this module loads, so
+    processes that never call Gemini do not pay for it at startup.
+    
+    Returns:
+        Shared GenerativeModel instance
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=Config.GOOGLE_API_KEY)
+                _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
 
 
 def create_flashcard_prompt(extracted_text: str) -> str:
@@ -34,6 +95,8 @@ Back: text for back of the Flashcard
 Front: text for front of the Flashcard
 Back: text for back of the Flashcard
 
+{SECTION_INSTRUCTION}
+
 Create at least 5 flashcards on the topic in provided text: {extracted_text}"""
 
 
@@ -61,23 +124,264 @@ Back: text for back of the Flashcard
 Front: text for front of the Flashcard
 Back: text for back of the Flashcard
 
+{SECTION_INSTRUCTION}
+
 Create at least 5 flashcards on the topic in provided transcript: {transcript}"""
 
 
+def _is_rate_limited(error: Exception) -> bool:
+    """Whether a Gemini error asks the client to slow down (429 or 503)."""
+    return getattr(error, "code", None) in (429, 503) or type(error).__name__ in (
+        "ResourceExhausted", "TooManyRequests", "ServiceUnavailable"
+    )
+
+
+async def _back_off(limiter: AdaptiveRateLimiter, error: Exception, attempt: int) -> None:
+    """
+    Slow down after a failed Gemini request, or give up.
+
+    Raises:
+        RateLimitError: If the request was rate limited and no retries are left
+        Exception: The original error if it is not a rate limit
+    """
+    if not _is_rate_limited(error):
+        print(f"❌ AI generation failed: {error}")
+        raise error
+
+    limiter.penalize()
+    if attempt >= Config.LLM_MAX_RETRIES:
+        print(f"❌ AI generation failed: Gemini is still rate limited after {attempt + 1} attempts")
+        raise RateLimitError("Gemini") from error
+
+    upstream_retries.inc(upstream="gemini")
+    delay = Config.LLM_RETRY_BACKOFF * (2 ** attempt)
+    print(f"⚠️  Gemini rate limited, retrying in {delay:.1f}s")
+    await asyncio.sleep(delay)
+
+
 async def generate_flashcards(prompt: str) -> str:
     """
     Generate flashcards using Google Gemini AI model.
     
+    The request is made through the client's async API, so the event loop
+    keeps serving other sessions while the model is generating. Requests are
+    paced by the shared Gemini rate limiter and retried with backoff when
+    the quota is exceeded.
+    
     Args:
         prompt: Formatted prompt containing the learning content
         
     Returns:
         Generated flashcard content in the specified format
+        
+    Raises:
+        RateLimitError: If Gemini keeps rejecting the request for exceeding its quota
+    """
+    limiter = get_limiter("gemini")
+    for attempt in range(Config.LLM_MAX_RETRIES + 1):
+        await limiter.acquire()
+        try:
+            with span("llm_request", upstream="gemini"):
+                response = await get_model().generate_content_async(prompt)
+                text = response.text
+        except Exception as e:
+            await _back_off(limiter, e, attempt)
+            continue
+        limiter.reward()
+        return text
+
+
+async def stream_flashcards(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream flashcard text from Google Gemini as it is generated.
+    
+    A rate-limited request is retried like in generate_flashcards, as long
+    as no text has been yielded yet.
+    
+    Args:
+        prompt: Formatted prompt containing the learning content
+        
+    Yields:
+        Chunks of generated text in arrival order
+        
+    Raises:
+        RateLimitError: If Gemini keeps rejecting the request for exceeding its quota
+    """
+    limiter = get_limiter("gemini")
+    for attempt in range(Config.LLM_MAX_RETRIES + 1):
+        await limiter.acquire()
+        streamed = False
+        try:
+            with span("llm_stream", upstream="gemini"):
+                response = await get_model().generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    streamed = True
+                    yield chunk.text
+        except Exception as e:
+            if streamed:
+                print(f"❌ AI generation failed: {e}")
+                raise
+            await _back_off(limiter, e, attempt)
+            continue
+        limiter.reward()
+        return
+
+
+async def generate_flashcards_chunked(
+    chunks: List[str],
+    build_prompt: Callable[[str], str],
+    concurrency: Optional[int] = None,
+    force: bool = False,
+    deduplicator: Optional[CardDeduplicator] = None,
+) -> AsyncIterator[ChunkResult]:
     """
+    Generate flashcards for many text chunks concurrently (map-reduce).
+    
+    Chunks are generated with at most ``concurrency`` requests in flight and
+    yielded as each one finishes, so total latency follows the slowest chunk
+    rather than the length of the source. Cards whose front is a
+    near-duplicate of one already yielded are dropped. A chunk that fails is
+    logged and yielded with its error instead of failing the whole deck, so
+    the caller can tell a complete deck from one with missing chunks.
+    
+    Args:
+        chunks: Source text windows, e.g. from chunking.chunk_segments
+        build_prompt: Prompt builder such as create_youtube_flashcard_prompt
+        concurrency: Maximum chunks in flight (default: Config.LLM_MAX_CONCURRENCY)
+        force: Ignore cached generations and call the model for every chunk
+        deduplicator: Near-duplicate filter shared across chunks, e.g. to read
+            its removed count afterwards (default: a new CardDeduplicator)
+        
+    Yields:
+        Result of each completed chunk: its index, its new de-duplicated
+        cards with their section tags and, if it failed, the error
+
+    Raises:
+        RateLimitError: If Gemini keeps rejecting a chunk for exceeding its
+            quota; the chunks still in flight are cancelled
+    """
+    limit = asyncio.Semaphore(concurrency or Config.LLM_MAX_CONCURRENCY)
+
+    async def generate(index: int, chunk: str) -> ChunkResult:
+        async with limit:
+            try:
+                text = await generate_flashcards_cached(chunk, build_prompt, force=force)
+                tagged = parse_tagged_flashcards(text)
+                return ChunkResult(index, [(front, back) for front, back, _ in tagged], [tag for *_, tag in tagged])
+            except RateLimitError:
+                # Retrying the other chunks would hit the same quota; fail the deck visibly
+                raise
+            except Exception as e:
+                print(f"❌ AI generation failed for chunk {index + 1}/{len(chunks)}: {e}")
+                return ChunkResult(index, error=str(e) or type(e).__name__)
+
+    deduplicator = deduplicator or CardDeduplicator()
+    tasks = [asyncio.create_task(generate(index, chunk)) for index, chunk in enumerate(chunks)]
     try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"❌ AI generation failed: {e}")
-        raise
+        for completed in asyncio.as_completed(tasks):
+            result = await completed
+            kept = [(card, tag) for card, tag in zip(result.cards, result.sections) if deduplicator.add(*card)]
+            result.cards = [card for card, _ in kept]
+            result.sections = [tag for _, tag in kept]
+            yield result
+    finally:
+        # A rate limit, a cancelled job or a consumer that stops early must
+        # not leave the remaining chunks generating in the background
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def generation_key(build_prompt: Callable[[str], str], source_text: str) -> str:
+    """
+    Build the cache key of a generation.
+    
+    Args:
+        build_prompt: Prompt builder used for the generation
+        source_text: Notes or transcript the cards are generated from
+        
+    Returns:
+        Hash of the model name, prompt template version and normalized source text
+    """
+    normalized = " ".join(source_text.split())
+    return content_hash(MODEL_NAME, PROMPT_VERSION, build_prompt.__name__, normalized)
+
+
+async def generate_flashcards_cached(
+    source_text: str, build_prompt: Callable[[str], str], force: bool = False
+) -> str:
+    """
+    Generate flashcards for a source text, reusing earlier generations.
+    
+    Identical requests made while a generation is in flight share its result.
+    
+    Args:
+        source_text: Notes or transcript to generate cards from
+        build_prompt: Prompt builder such as create_flashcard_prompt
+        force: Skip the cache lookup and generate fresh cards
+        
+    Returns:
+        Generated flashcard content in the specified format
+    """
+    key = generation_key(build_prompt, source_text)
+    if not force:
+        cached = await generation_cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def generate() -> str:
+        text = await generate_flashcards(build_prompt(source_text))
+        await generation_cache.set(key, text)
+        return text
 
+    return await _inflight.do(key, generate)
+
+
+async def stream_flashcards_cached(
+    source_text: str, build_prompt: Callable[[str], str], force: bool = False
+) -> AsyncIterator[str]:
+    """
+    Stream flashcards for a source text, reusing earlier generations.
+    
+    A cached generation is yielded as a single chunk. If the same source is
+    already being generated, its final text is awaited instead of starting a
+    second request.
+    
+    Args:
+        source_text: Notes or transcript to generate cards from
+        build_prompt: Prompt builder such as create_flashcard_prompt
+        force: Skip the cache lookup and generate fresh cards
+        
+    Yields:
+        Chunks of generated text in arrival order
+    """
+    key = generation_key(build_prompt, source_text)
+    if not force:
+        cached = await generation_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        found, text = await _inflight.wait(key)
+        if found:
+            yield text
+            return
+
+    chunks = []
+    async with _inflight.lead(key) as publish:
+        async for text in stream_flashcards(build_prompt(source_text)):
+            chunks.append(text)
+            yield text
+        result = "".join(chunks)
+        await generation_cache.set(key, result)
+        publish(result)
+
+
+def generation_stats() -> dict:
+    """
+    Get generation cache metrics.
+    
+    Returns:
+        Cache hits, misses, hit rate and entries, plus the number of
+        requests coalesced into an in-flight generation
+    """
+    return {**generation_cache.stats(), "coalesced": _inflight.coalesced}
@@ -0,0 +1,368 @@
+"""
+Caching utilities shared by the OCR, AI and YouTube modules.
+
+Values are kept in a bounded in-memory LRU tier in front of an optional
+on-disk JSON store, so repeated work survives restarts while hot entries
+are served without touching the filesystem.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..config import Config
+from .metrics import cache_requests
+
+
+def content_hash(*parts: Any) -> str:
+    """
+    Build a stable SHA-256 key from bytes and/or strings.
+
+    Args:
+        parts: Values to hash; strings are UTF-8 encoded
+
+    Returns:
+        Hex digest identifying the combined content
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 0):
+        """
+        Args:
+            max_entries: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (0 disables expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if not expires or expires > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, expires: float = 0) -> None:
+        """
+        Store value under key, evicting the least recently used entries.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            expires: Time the entry expires, e.g. kept from a slower tier
+                (default: now plus this cache's TTL)
+        """
+        if not expires:
+            expires = time.time() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    JSON-file cache bounded by total size, with optional TTL.
+
+    A file's modification time is when it was written and its access time,
+    set on every read, is when it was last used. Pruning removes expired
+    files first and then the least recently used ones.
+    """
+
+    # Share of max_bytes a prune frees the directory down to, so a full
+    # cache is not rescanned on every write
+    PRUNE_TARGET = 0.9
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, ttl: float = 0):
+        """
+        Args:
+            directory: Directory that holds the cache files
+            max_bytes: Total size above which the least recently used files are removed
+            ttl: Seconds an entry stays valid (0 disables expiry)
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Bytes written since the directory was last measured; None until then
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get_entry(self, key: str) -> Optional[Tuple[float, Any]]:
+        """
+        Return the stored entry for key and mark it as used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            (expires, value), where expires is 0 if the entry never expires,
+            or None if the key is missing or expired
+        """
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+                written = os.fstat(f.fileno()).st_mtime
+        except (OSError, ValueError):
+            return None
+
+        expires = entry.get("expires") or 0
+        if expires and expires <= time.time():
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            # Record the use for pruning, whatever the filesystem's atime policy
+            os.utime(path, (time.time(), written))
+        except OSError:
+            pass
+        return expires, entry.get("value")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the stored value for key, or None if missing or expired."""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Persist value under key, pruning expired and unused files when over the size limit."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"expires": time.time() + self.ttl if self.ttl else 0, "value": value}
+
+        # Write atomically so concurrent readers never see a partial file
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(entry, f)
+            written = f.tell()
+        os.replace(tmp, path)
+
+        with self._lock:
+            measured = self._size is not None
+            self._size = (self._size or 0) + written
+            should_prune = not measured or self._size > self.max_bytes
+        if should_prune:
+            self.prune()
+
+    def prune(self) -> None:
+        """
+        Delete expired files, then the least recently used ones while over max_bytes.
+
+        Other processes may share the directory, so it is measured again on
+        every prune; between prunes the size is tracked from this process's writes.
+        """
+        now = time.time()
+        files = []
+        total = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if self.ttl and stat.st_mtime + self.ttl <= now:
+                path.unlink(missing_ok=True)
+                continue
+            files.append((stat.st_atime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_bytes:
+            files.sort()
+            for _, size, path in files:
+                if total <= self.max_bytes * self.PRUNE_TARGET:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+        with self._lock:
+            self._size = total
+
+
+class TieredCache:
+    """Memory LRU in front of an optional disk store, with hit/miss counters."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None, name: str = "cache"):
+        """
+        Args:
+            memory: Fast in-process tier
+            disk: Durable tier consulted on memory misses
+            name: Label of the cache in exported metrics
+        """
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look key up in memory, then on disk, promoting disk hits to memory."""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get_entry, key)
+            if entry is not None:
+                expires, value = entry
+                # The entry keeps its expiry instead of starting a fresh TTL in memory
+                self.memory.set(key, value, expires=expires)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        cache_requests.inc(cache=self.name, result="miss" if value is None else "hit")
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store value in every tier."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache effectiveness counters.
+
+        Returns:
+            Dictionary with hits, misses, memory_hits, hit_rate and entries
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory.hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+
+class SingleFlight:
+    """
+    Collapse concurrent identical calls into one in-flight call.
+
+    The first caller for a key becomes the leader and does the work; callers
+    arriving while it runs wait for the leader's result instead of repeating it.
+    If the leader is cancelled, its waiters look again and one of them leads.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def wait(self, key: str) -> Tuple[bool, Any]:
+        """
+        Wait for an in-flight call for key, if there is one.
+
+        Args:
+            key: Identity of the call
+
+        Returns:
+            (True, result) if a call was in flight, (False, None) otherwise,
+            including when the leader was cancelled and nobody has taken over
+        """
+        while (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                return True, await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled, not this waiter: retry the call
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        return False, None
+
+    @asynccontextmanager
+    async def lead(self, key: str) -> AsyncIterator[Callable[[Any], None]]:
+        """
+        Register the current caller as the leader for key.
+
+        Yields a publish function; the value passed to it is delivered to every
+        waiter. If the block raises without publishing, waiters receive the
+        error. If it is cancelled, or a streaming leader's consumer stops early,
+        waiters go back to wait() and one of them becomes the next leader.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            yield future.set_result
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if not future.done():
+                future.set_exception(RuntimeError(f"In-flight call for {key} was abandoned"))
+            # Mark the outcome as retrieved so unawaited failures are not logged
+            if not future.cancelled():
+                future.exception()
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call
+            factory: Coroutine function doing the actual work
+
+        Returns:
+            The leader's result
+        """
+        found, result = await self.wait(key)
+        if found:
+            return result
+        async with self.lead(key) as publish:
+            result = await factory()
+            publish(result)
+            return result
+
+
+def build_cache(namespace: str, max_entries: int, max_bytes: int, ttl: float) -> TieredCache:
+    """
+    Create a tiered cache stored under Config.CACHE_DIR/<namespace>.
+
+    Args:
+        namespace: Sub-directory name separating unrelated caches
+        max_entries: Capacity of the in-memory tier
+        max_bytes: Size limit of the disk tier (0 disables the disk tier)
+        ttl: Seconds entries stay valid in both tiers (0 disables expiry)
+
+    Returns:
+        Configured TieredCache
+    """
+    disk = None
+    if max_bytes > 0 and Config.CACHE_DIR:
+        disk = DiskCache(os.path.join(Config.CACHE_DIR, namespace), max_bytes=max_bytes, ttl=ttl)
+    return TieredCache(LRUCache(max_entries=max_entries, ttl=ttl), disk, name=namespace)
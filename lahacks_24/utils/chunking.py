@@ -0,0 +1,191 @@
+"""
+Chunking utilities for splitting long transcripts and texts into token-budgeted windows.
+
+Windows can be packed several to a prompt as numbered sections. The model
+tags each card with the section it came from, so a card's source stays as
+narrow as one window even when the prompt covers many of them.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text.
+
+    Uses the common approximation of four characters per token, which is
+    close enough for budgeting prompts without a tokenizer round trip.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class TranscriptChunk:
+    """A window of consecutive transcript segments."""
+
+    text: str
+    start: float
+    end: float
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def chunk_segments(
+    segments: List[dict], max_tokens: int, max_seconds: Optional[float] = None
+) -> List[TranscriptChunk]:
+    """
+    Group transcript segments into windows that fit a token budget.
+
+    Windows always end on a segment boundary, so no caption line is split
+    between two prompts. A single segment larger than the budget becomes a
+    window of its own.
+
+    Args:
+        segments: Transcript segments with "text", "start" and "duration" keys
+        max_tokens: Token budget for the text of each window
+        max_seconds: Also start a new window once a segment starts this long
+            after the window's first one
+
+    Returns:
+        Windows in playback order
+    """
+    chunks = []
+    texts: List[str] = []
+    tokens = 0
+    start = end = 0.0
+
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        cost = estimate_tokens(text) + 1
+
+        too_long = max_seconds is not None and segment["start"] - start >= max_seconds
+        if texts and (tokens + cost > max_tokens or too_long):
+            chunks.append(TranscriptChunk(" ".join(texts), start, end))
+            texts, tokens = [], 0
+
+        if not texts:
+            start = segment["start"]
+        texts.append(text)
+        tokens += cost
+        end = segment["start"] + segment.get("duration", 0.0)
+
+    if texts:
+        chunks.append(TranscriptChunk(" ".join(texts), start, end))
+    return chunks
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a text into windows that fit a token budget, on line boundaries.
+
+    Args:
+        text: Text with one line per recognized line or paragraph
+        max_tokens: Token budget of each window
+
+    Returns:
+        Windows in text order; a text within the budget is a single window
+    """
+    chunks = []
+    lines: List[str] = []
+    tokens = 0
+
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if lines and tokens + cost > max_tokens:
+            chunks.append("\n".join(lines))
+            lines, tokens = [], 0
+        lines.append(line)
+        tokens += cost
+
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+# Tokens of the "[Section n]" header and separator added to each section
+SECTION_HEADER_TOKENS = 4
+
+# A section's source: a (start, end) time span of a video in seconds, or the
+# page positions (first, last + 1) of an upload
+Source = Tuple[float, float]
+
+
+@dataclass
+class Section:
+    """A window of source text that cards can be traced back to."""
+
+    text: str
+    source: Optional[Source] = None
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text) + SECTION_HEADER_TOKENS
+
+
+def pack_sections(sections: List[Section], max_tokens: int) -> List[List[Section]]:
+    """
+    Group consecutive sections into prompts that fit a token budget.
+
+    Args:
+        sections: Sections in source order
+        max_tokens: Token budget of each prompt's source text
+
+    Returns:
+        Groups of sections in source order; a section larger than the budget is a group of its own
+    """
+    groups: List[List[Section]] = []
+    tokens = 0
+    for section in sections:
+        if groups and tokens + section.tokens <= max_tokens:
+            groups[-1].append(section)
+            tokens += section.tokens
+        else:
+            groups.append([section])
+            tokens = section.tokens
+    return groups
+
+
+def join_sections(sections: List[Section]) -> str:
+    """
+    Build the source text of one prompt from its sections.
+
+    Args:
+        sections: Sections of the prompt
+
+    Returns:
+        Text of each section under a "[Section n]" header, numbered from 1;
+        a single section is returned without a header
+    """
+    if len(sections) == 1:
+        return sections[0].text
+    return "\n\n".join(f"[Section {number}]\n{section.text}" for number, section in enumerate(sections, 1))
+
+
+def section_source(sections: List[Section], number: Optional[int]) -> Optional[Source]:
+    """
+    Find the source of a card from the section number the model tagged it with.
+
+    Args:
+        sections: Sections of the prompt the card was generated from
+        number: Section number of the card, from 1, or None if it has none
+
+    Returns:
+        Source of that section; for a missing or invalid number, the span
+        covering every section of the prompt. None if the sections have no source.
+    """
+    if number is not None and 1 <= number <= len(sections):
+        return sections[number - 1].source
+    if any(section.source is None for section in sections):
+        return None
+    return min(section.source[0] for section in sections), max(section.source[1] for section in sections)
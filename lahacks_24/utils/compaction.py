@@ -0,0 +1,161 @@
+"""
+Prompt compaction: removes text that costs tokens but carries no content.
+
+Auto-generated captions repeat the tail of each line at the start of the
+next one and are sprinkled with [Music]-style tags and filler words; OCR
+output contains stray punctuation and lines read twice. Compacting the
+source text before it goes into a prompt makes requests cheaper and faster
+without changing what the cards can be about.
+"""
+
+import html
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from .chunking import estimate_tokens
+from .metrics import registry
+
+prompt_tokens = registry.counter(
+    "soru_prompt_source_tokens_total", "Estimated source-text tokens before and after compaction"
+)
+
+# [Music], [Applause], (laughter), ♪ ... ♪ and similar non-speech annotations
+CAPTION_TAG = re.compile(r"\[[^\]]{0,40}\]|\((?:music|applause|laughter|laughs|inaudible|silence)\)|[♪♫]+", re.I)
+# Speaker change markers and HTML/formatting tags some caption tracks contain
+CAPTION_MARKUP = re.compile(r"^\s*>>+\s*|</?[a-z][^>]{0,40}>", re.I | re.M)
+FILLER_WORDS = re.compile(r"(?<![\w'])(?:um+|uh+|uhm+|erm+|hmm+)(?![\w'])[,.]?\s*", re.I)
+REPEATED_PUNCTUATION = re.compile(r"([^\w\s])\1{2,}")
+WHITESPACE = re.compile(r"\s+")
+
+# Longest run of words checked when removing rolling-caption overlap
+MAX_OVERLAP_WORDS = 30
+
+
+@dataclass
+class CompactionStats:
+    """Estimated token counts of a source text before and after compaction."""
+
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of the tokens removed."""
+        return self.saved / self.tokens_before if self.tokens_before else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.tokens_before:,} -> {self.tokens_after:,} tokens (-{self.reduction:.0%})"
+
+
+def clean_caption(text: str) -> str:
+    """
+    Strip non-speech annotations, markup and filler words from one caption.
+
+    Args:
+        text: Caption text as returned by the transcript API
+
+    Returns:
+        Caption text on a single line, possibly empty
+    """
+    text = html.unescape(text)
+    text = CAPTION_MARKUP.sub(" ", text)
+    text = CAPTION_TAG.sub(" ", text)
+    text = FILLER_WORDS.sub("", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def _overlap(previous: List[str], current: List[str]) -> int:
+    """Number of leading words of current that repeat the trailing words of previous."""
+    limit = min(len(previous), len(current), MAX_OVERLAP_WORDS)
+    for size in range(limit, 0, -1):
+        if previous[-size:] == current[:size]:
+            return size
+    return 0
+
+
+def compact_segments(segments: List[dict]) -> Tuple[List[dict], CompactionStats]:
+    """
+    Clean transcript segments and collapse overlapping captions.
+
+    Rolling auto-captions show each phrase in two consecutive segments; the
+    repeated words are removed from the later one, and a segment that adds
+    nothing new is merged into the previous one. A single-word overlap is
+    kept, since it is as likely to be real speech as a repeat.
+
+    Args:
+        segments: Transcript segments with "text", "start" and "duration" keys
+
+    Returns:
+        Compacted segments in playback order, and token counts before and after
+    """
+    stats = CompactionStats()
+    compacted: List[dict] = []
+    previous: List[str] = []
+
+    for segment in segments:
+        stats.tokens_before += estimate_tokens(segment["text"]) + 1
+        text = clean_caption(segment["text"])
+        words = text.split()
+        folded = [word.lower().strip(".,!?;:") for word in words]
+
+        overlap = _overlap(previous, folded)
+        if compacted and overlap == len(folded):
+            # Nothing new: the caption only extends how long the previous one is shown
+            last = compacted[-1]
+            last["duration"] = segment["start"] + segment.get("duration", 0.0) - last["start"]
+            continue
+        if overlap >= 2:
+            words = words[overlap:]
+            folded = folded[overlap:]
+        if not words:
+            continue
+
+        text = " ".join(words)
+        compacted.append({"text": text, "start": segment["start"], "duration": segment.get("duration", 0.0)})
+        stats.tokens_after += estimate_tokens(text) + 1
+        previous = (previous + folded)[-MAX_OVERLAP_WORDS:]
+
+    prompt_tokens.inc(stats.tokens_before, source="transcript", stage="raw")
+    prompt_tokens.inc(stats.tokens_after, source="transcript", stage="compacted")
+    return compacted, stats
+
+
+def _is_noise(line: str) -> bool:
+    """Whether an OCR line is mostly stray marks rather than text."""
+    visible = line.replace(" ", "")
+    letters = sum(char.isalnum() for char in visible)
+    return letters < 2 or letters < len(visible) * 0.4
+
+
+def compact_ocr_text(text: str) -> Tuple[str, CompactionStats]:
+    """
+    Remove OCR noise: stray-mark lines, repeated lines and runs of punctuation.
+
+    Args:
+        text: Recognized text with one line per text line of the page
+
+    Returns:
+        Compacted text with the same line structure, and token counts before and after
+    """
+    stats = CompactionStats(tokens_before=estimate_tokens(text))
+    lines: List[str] = []
+
+    for line in text.splitlines():
+        line = REPEATED_PUNCTUATION.sub(r"\1", WHITESPACE.sub(" ", line)).strip()
+        if not line or _is_noise(line):
+            continue
+        # The line segmenter can return a line twice when crops overlap
+        if lines and line.lower() == lines[-1].lower():
+            continue
+        lines.append(line)
+
+    compacted = "\n".join(lines)
+    stats.tokens_after = estimate_tokens(compacted)
+    prompt_tokens.inc(stats.tokens_before, source="ocr", stage="raw")
+    prompt_tokens.inc(stats.tokens_after, source="ocr", stage="compacted")
+    return compacted, stats
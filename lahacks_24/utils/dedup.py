@@ -0,0 +1,228 @@
+"""
+Near-duplicate detection for generated flashcards.
+
+Gemini often repeats the same question with slightly different wording when
+a deck is built from several pages or transcript chunks. Card fronts are
+compared by the Jaccard similarity of their character n-grams; MinHash
+signatures bucketed with locality-sensitive hashing (LSH) find candidate
+pairs, so each new card is checked against a handful of similar cards rather
+than the whole deck. Templated questions ("derivative of sin(x)" and "of
+cos(x)") have similar fronts but different answers, so a candidate is only a
+duplicate if the backs overlap as well.
+"""
+
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..config import Config
+
+# Largest Mersenne prime below 2**64, used for the universal hash family
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_card_text(text: str) -> str:
+    """
+    Normalize card text so trivially different wordings compare equal.
+
+    Args:
+        text: Front or back of a card
+
+    Returns:
+        Lowercased text without punctuation and with single spaces
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Split normalized text into overlapping character n-grams.
+
+    Args:
+        text: Normalized text
+        size: Characters per n-gram
+
+    Returns:
+        Set of n-grams; texts shorter than size give the text itself
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two n-gram sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def containment(a: Set[str], b: Set[str]) -> float:
+    """Share of the smaller n-gram set found in the other one."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+class CardDeduplicator:
+    """
+    Incremental near-duplicate filter for flashcards.
+
+    Cards are added one at a time, e.g. as they stream in from several
+    chunks, and a card is kept only if no earlier kept card has a front
+    with n-gram similarity of at least ``threshold`` and a back with
+    containment of at least ``back_threshold``. Backs are compared by
+    containment rather than Jaccard, so "Paris" matches "Paris, the
+    capital". LSH candidates are confirmed with the exact similarities, so
+    false positives from the MinHash estimate never drop a card. A card
+    added without a back is compared by its front only.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        back_threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        ngram: Optional[int] = None,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold: Front similarity at which a card counts as a duplicate (default: Config.DEDUP_THRESHOLD)
+            back_threshold: Back containment also required for a duplicate (default: Config.DEDUP_BACK_THRESHOLD)
+            num_perm: MinHash signature length (default: Config.DEDUP_NUM_PERM)
+            bands: LSH bands; must divide num_perm (default: Config.DEDUP_BANDS)
+            ngram: Characters per n-gram (default: Config.DEDUP_NGRAM)
+            seed: Seed of the hash permutations
+        """
+        self.threshold = Config.DEDUP_THRESHOLD if threshold is None else threshold
+        self.back_threshold = Config.DEDUP_BACK_THRESHOLD if back_threshold is None else back_threshold
+        self.num_perm = num_perm or Config.DEDUP_NUM_PERM
+        self.bands = bands or Config.DEDUP_BANDS
+        self.ngram = ngram or Config.DEDUP_NGRAM
+        if self.num_perm % self.bands:
+            raise ValueError(f"DEDUP_BANDS ({self.bands}) must divide DEDUP_NUM_PERM ({self.num_perm})")
+        self.rows = self.num_perm // self.bands
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), self.num_perm, dtype=np.uint64)
+
+        self._exact: Set[Tuple[str, str]] = set()
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._shingles: List[Set[str]] = []
+        self._back_shingles: List[Optional[Set[str]]] = []
+        self.kept = 0
+        self.removed = 0
+
+    def _signature(self, grams: Set[str]) -> np.ndarray:
+        """MinHash signature of an n-gram set."""
+        hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams))
+        # Overflow of the uint64 product wraps around, which keeps the hashes well mixed
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1)
+
+    def is_duplicate(self, front: str, back: Optional[str] = None) -> bool:
+        """
+        Check a card against the kept cards without adding it.
+
+        Args:
+            front: Front of the card
+            back: Back of the card; if omitted, only the fronts are compared
+
+        Returns:
+            True if a kept card has a similar front and an overlapping back
+        """
+        return self._check(front, back)[0]
+
+    def _check(
+        self, front: str, back: Optional[str]
+    ) -> Tuple[bool, str, Optional[Set[str]], Set[str], Optional[np.ndarray]]:
+        key = normalize_card_text(front)
+        back_key = normalize_card_text(back) if back is not None else ""
+        back_grams = shingles(back_key, self.ngram) if back_key else None
+        if not key:
+            # Nothing to compare, e.g. a front of only math symbols: never a duplicate
+            return False, key, back_grams, set(), None
+        if (key, back_key) in self._exact:
+            return True, key, back_grams, set(), None
+
+        grams = shingles(key, self.ngram)
+        signature = self._signature(grams)
+        candidates: Set[int] = set()
+        for band, buckets in enumerate(self._buckets):
+            candidates.update(buckets.get(self._band_key(signature, band), ()))
+        duplicate = any(
+            jaccard(grams, self._shingles[i]) >= self.threshold and self._backs_match(back_grams, i)
+            for i in candidates
+        )
+        return duplicate, key, back_grams, grams, signature
+
+    def _backs_match(self, back_grams: Optional[Set[str]], index: int) -> bool:
+        """Whether a back overlaps the back of kept card index; a missing back matches any."""
+        kept = self._back_shingles[index]
+        if back_grams is None or kept is None:
+            return True
+        return containment(back_grams, kept) >= self.back_threshold
+
+    def _band_key(self, signature: np.ndarray, band: int) -> bytes:
+        return signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, front: str, back: Optional[str] = None) -> bool:
+        """
+        Add a card, keeping it only if it is not a near-duplicate.
+
+        Args:
+            front: Front of the card
+            back: Back of the card; if omitted, only the fronts are compared
+
+        Returns:
+            True if the card was kept
+        """
+        duplicate, key, back_grams, grams, signature = self._check(front, back)
+        if duplicate:
+            self.removed += 1
+            return False
+        self.kept += 1
+        if not key:
+            return True
+
+        index = len(self._shingles)
+        self._exact.add((key, normalize_card_text(back) if back is not None else ""))
+        self._shingles.append(grams)
+        self._back_shingles.append(back_grams)
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(self._band_key(signature, band), []).append(index)
+        return True
+
+    def filter(self, cards: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Keep the cards that are not near-duplicates of earlier cards.
+
+        Args:
+            cards: (front, back) pairs in order
+
+        Returns:
+            The kept cards, in their original order
+        """
+        return [(front, back) for front, back in cards if self.add(front, back)]
+
+
+def dedup_cards(cards: Iterable[Tuple[str, str]], **options) -> Tuple[List[Tuple[str, str]], int]:
+    """
+    Remove near-duplicate cards from a deck.
+
+    Args:
+        cards: (front, back) pairs in order
+        **options: CardDeduplicator settings overriding the configuration
+
+    Returns:
+        The kept cards and the number of duplicates removed
+    """
+    deduplicator = CardDeduplicator(**options)
+    kept = deduplicator.filter(cards)
+    return kept, deduplicator.removed
@@ -0,0 +1,271 @@
+"""
+Image preprocessing utilities for OCR.
+
+Phone photos are normalized (oriented, grayscale, downsized, re-encoded)
+before they are sent anywhere. TrOCR recognizes a single line of text per
+image, so full-page photos are then split into line crops. Small color
+thumbnails are made for display, so pages never reach the browser at full size.
+"""
+
+import asyncio
+import io
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# HEIC/HEIF support is optional and only available with pillow-heif installed
+try:
+    from pillow_heif import register_heif_opener
+
+    register_heif_opener()
+except ImportError:
+    pass
+
+# Encoded image bytes, or a memory-mapped upload read without copying
+ImageBuffer = Union[bytes, mmap.mmap]
+
+
+def open_image(image_data: ImageBuffer) -> Image.Image:
+    """
+    Open encoded image data without copying memory-mapped buffers.
+
+    Args:
+        image_data: Encoded image bytes or a memory-mapped file
+
+    Returns:
+        Lazily decoded PIL image
+    """
+    if isinstance(image_data, mmap.mmap):
+        image_data.seek(0)
+        return Image.open(image_data)
+    return Image.open(io.BytesIO(image_data))
+
+
+def load_grayscale(image_data: ImageBuffer, max_side: int) -> np.ndarray:
+    """
+    Decode an image to a grayscale array, downsizing its longest side.
+
+    Args:
+        image_data: Binary image data
+        max_side: Maximum width or height in pixels
+
+    Returns:
+        2-D uint8 array of pixel intensities
+    """
+    with open_image(image_data) as image:
+        gray = image.convert("L")
+    gray.thumbnail((max_side, max_side))
+    return np.asarray(gray, dtype=np.uint8)
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """
+    Separate ink from paper with Otsu's global threshold.
+
+    Args:
+        gray: 2-D uint8 grayscale image
+
+    Returns:
+        Boolean array that is True where a pixel is ink
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist) / gray.size
+    mean = np.cumsum(hist * np.arange(256)) / gray.size
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between_var = (mean[-1] * weight - mean) ** 2 / (weight * (1.0 - weight))
+    threshold = int(np.nanargmax(between_var)) if np.isfinite(between_var).any() else 127
+
+    return gray <= threshold
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """Return (start, end) pairs of consecutive True values in a 1-D mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def find_text_lines(
+    ink: np.ndarray, min_height: int = 8, min_ink: float = 0.005
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Locate text lines with horizontal and vertical projection profiles.
+
+    Args:
+        ink: Boolean ink mask as returned by binarize
+        min_height: Lines shorter than this many pixels are discarded as noise
+        min_ink: Fraction of a row that must be ink for the row to count as text
+
+    Returns:
+        (top, bottom, left, right) boxes ordered top to bottom
+    """
+    height, width = ink.shape
+    rows = _runs(ink.sum(axis=1) > max(1, width * min_ink))
+    if not rows:
+        return []
+
+    # Join lines split by thin gaps, e.g. between the body and dots of letters
+    typical = float(np.median([end - start for start, end in rows]))
+    merged = [list(rows[0])]
+    for start, end in rows[1:]:
+        if start - merged[-1][1] < typical * 0.3:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    boxes = []
+    for start, end in merged:
+        if end - start < min_height:
+            continue
+        pad = max(2, (end - start) // 5)
+        top, bottom = max(0, start - pad), min(height, end + pad)
+        columns = np.flatnonzero(ink[top:bottom].any(axis=0))
+        left, right = max(0, int(columns[0]) - pad), min(width, int(columns[-1]) + 1 + pad)
+        boxes.append((top, bottom, left, right))
+    return boxes
+
+
+def segment_lines(image_data: ImageBuffer, max_side: int = 2000, min_height: int = 8) -> List[bytes]:
+    """
+    Split a page photo into PNG-encoded crops of its text lines.
+
+    Args:
+        image_data: Binary image data of a full page
+        max_side: Longest side the page is downsized to before segmentation
+        min_height: Minimum line height in pixels after downsizing
+
+    Returns:
+        Line crops in reading order (empty if no text lines were found)
+    """
+    gray = load_grayscale(image_data, max_side)
+    crops = []
+    for top, bottom, left, right in find_text_lines(binarize(gray), min_height=min_height):
+        buffer = io.BytesIO()
+        Image.fromarray(gray[top:bottom, left:right]).save(buffer, format="PNG")
+        crops.append(buffer.getvalue())
+    return crops
+
+
+def normalize_image(source: Union[bytes, str, Path], max_side: int, quality: int = 85) -> bytes:
+    """
+    Orient, grayscale, downsize and re-encode a photo for OCR.
+
+    Args:
+        source: Encoded image bytes or the path of a stored image
+        max_side: Longest side of the result in pixels
+        quality: JPEG quality of the re-encoded image
+
+    Returns:
+        Compact JPEG bytes
+    """
+    with (Image.open(source) if isinstance(source, (str, Path)) else open_image(source)) as image:
+        # Phone cameras store rotation in EXIF instead of rotating the pixels
+        gray = ImageOps.exif_transpose(image).convert("L")
+
+    gray.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    gray.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Get the process pool used for CPU-heavy image work."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def normalize_images(
+    paths: List[Path], max_side: int, quality: int = 85, workers: Optional[int] = None
+) -> List[Optional[bytes]]:
+    """
+    Normalize stored images in a process pool, keeping the event loop free.
+
+    Worker processes read the files themselves, so full-size photos are never
+    copied into this process. An image that cannot be decoded, e.g. a PDF or
+    a HEIC photo without pillow-heif, does not fail the others.
+
+    Args:
+        paths: Stored images, in page order
+        max_side: Longest side of each result in pixels
+        quality: JPEG quality of the re-encoded images
+        workers: Pool size used when the pool is first created (default: CPU count)
+
+    Returns:
+        Normalized JPEG bytes for every image, in the same order; None for
+        images that could not be decoded
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool(workers)
+
+    async def normalize(path: Path) -> Optional[bytes]:
+        try:
+            return await loop.run_in_executor(pool, normalize_image, str(path), max_side, quality)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            print(f"⚠️  Could not normalize {Path(path).name}: {e}")
+            return None
+
+    return list(await asyncio.gather(*(normalize(path) for path in paths)))
+
+
+def thumbnail_image(source: Union[str, Path], destination: Union[str, Path], max_side: int, quality: int = 80) -> str:
+    """
+    Write a small, correctly oriented color preview of a stored image.
+
+    Args:
+        source: Path of the stored image
+        destination: Path the JPEG thumbnail is written to
+        max_side: Longest side of the thumbnail in pixels
+        quality: JPEG quality of the thumbnail
+
+    Returns:
+        File name of the thumbnail
+    """
+    with Image.open(source) as image:
+        preview = ImageOps.exif_transpose(image).convert("RGB")
+
+    preview.thumbnail((max_side, max_side))
+    preview.save(destination, format="JPEG", quality=quality, optimize=True)
+    return Path(destination).name
+
+
+async def create_thumbnails(
+    paths: List[Path], max_side: int, quality: int = 80, workers: Optional[int] = None
+) -> List[str]:
+    """
+    Create thumbnails next to stored images in the shared process pool.
+
+    Each thumbnail is saved as ``thumb_<stem>.jpg`` in the image's directory.
+
+    Args:
+        paths: Stored images
+        max_side: Longest side of each thumbnail in pixels
+        quality: JPEG quality of the thumbnails
+        workers: Pool size used when the pool is first created (default: CPU count)
+
+    Returns:
+        Thumbnail file names, in the same order as paths
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool(workers)
+    return list(await asyncio.gather(*(
+        loop.run_in_executor(
+            pool, thumbnail_image, str(path), str(path.with_name(f"thumb_{path.stem}.jpg")), max_side, quality
+        )
+        for path in paths
+    )))
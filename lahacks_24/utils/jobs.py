@@ -0,0 +1,278 @@
+"""
+Background job queue for long-running flashcard generation.
+
+Event handlers submit a job and return immediately; a pool of worker tasks
+runs the jobs, publishing per-stage progress and cards that the UI follows.
+"""
+
+import asyncio
+import time
+import traceback
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import Config
+from .metrics import jobs_finished, set_trace_id, trace
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobLimitError(RuntimeError):
+    """Raised when a user already has the maximum number of active jobs."""
+
+
+@dataclass
+class Job:
+    """State of one generation job, shared between its worker and watchers."""
+
+    id: str
+    user_id: str
+    kind: str
+    status: str = QUEUED
+    stage: str = QUEUED
+    progress: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    cards: List[Tuple[str, str]] = field(default_factory=list)
+    # Source span of each card, aligned with cards: (start, end) seconds of a video,
+    # or the page positions (first, last + 1) of notes
+    spans: List[Optional[Tuple[float, float]]] = field(default_factory=list)
+    # Source chunks whose generation failed; the deck is incomplete and is not saved
+    failed_chunks: int = 0
+    # Shown to the user when the job finishes, e.g. when a requested range was widened
+    notice: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    version: int = 0
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def _notify(self) -> None:
+        """Wake every watcher waiting for a change."""
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def set_stage(self, stage: str, done: int = 0, total: int = 0) -> None:
+        """
+        Enter a new stage and reset its progress counters.
+
+        Args:
+            stage: Stage name, e.g. "upload", "ocr" or "generate"
+            done: Units of work already completed in this stage
+            total: Units of work in this stage (0 if unknown)
+        """
+        self.stage = stage
+        self.progress[stage] = (done, total)
+        self._notify()
+
+    def advance(self, stage: str, count: int = 1) -> None:
+        """Record count more completed units of work for a stage."""
+        done, total = self.progress.get(stage, (0, 0))
+        self.progress[stage] = (done + count, total)
+        self._notify()
+
+    def add_cards(
+        self, cards: List[Tuple[str, str]], spans: Optional[List[Optional[Tuple[float, float]]]] = None
+    ) -> None:
+        """
+        Publish newly generated (front, back) pairs.
+
+        Args:
+            cards: New cards in display order
+            spans: Source span of each card, or None if the cards have none
+        """
+        if cards:
+            self.cards.extend(cards)
+            self.spans.extend(spans if spans is not None else [None] * len(cards))
+            self._notify()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        """Mark the job as done, failed or cancelled."""
+        self.status = status
+        self.error = error
+        jobs_finished.inc(kind=self.kind, status=status)
+        trace("job", job_id=self.id, kind=self.kind, status=status, error=error,
+              seconds=round(time.time() - self.created_at, 6))
+        self._notify()
+
+    async def wait_for_change(self, version: int, timeout: Optional[float] = None) -> int:
+        """
+        Wait until the job changes after the given version.
+
+        Args:
+            version: Last version the caller has seen
+            timeout: Maximum seconds to wait
+
+        Returns:
+            The current version (unchanged if the wait timed out)
+        """
+        if self.version == version:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.version
+
+
+JobRunner = Callable[[Job], Awaitable[None]]
+
+
+class JobBackend(ABC):
+    """Interface of the queue that hands jobs to workers."""
+
+    @abstractmethod
+    async def put(self, job: Job, runner: JobRunner) -> None:
+        """Queue a job to be run by runner."""
+
+    @abstractmethod
+    async def get(self) -> Tuple[Job, JobRunner]:
+        """Wait for the next queued job and its runner."""
+
+
+class InProcessBackend(JobBackend):
+    """First-in, first-out queue held in the current process."""
+
+    def __init__(self):
+        self._queue: "asyncio.Queue[Tuple[Job, JobRunner]]" = asyncio.Queue()
+
+    async def put(self, job: Job, runner: JobRunner) -> None:
+        await self._queue.put((job, runner))
+
+    async def get(self) -> Tuple[Job, JobRunner]:
+        return await self._queue.get()
+
+
+class JobQueue:
+    """Runs submitted jobs on a fixed pool of worker tasks."""
+
+    def __init__(
+        self,
+        backend: Optional[JobBackend] = None,
+        workers: Optional[int] = None,
+        max_jobs_per_user: Optional[int] = None,
+    ):
+        """
+        Args:
+            backend: Queue implementation (default: InProcessBackend)
+            workers: Number of jobs run concurrently (default: Config.JOB_WORKERS)
+            max_jobs_per_user: Active jobs allowed per user (default: Config.JOB_MAX_PER_USER)
+        """
+        self.backend = backend
+        self.workers = workers or Config.JOB_WORKERS
+        self.max_jobs_per_user = max_jobs_per_user or Config.JOB_MAX_PER_USER
+        self._jobs: Dict[str, Job] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def _ensure_workers(self) -> None:
+        """Start the worker pool on the running loop if it is not alive."""
+        self._worker_tasks = [task for task in self._worker_tasks if not task.done()]
+        if self.backend is None:
+            self.backend = InProcessBackend()
+        loop = asyncio.get_running_loop()
+        while len(self._worker_tasks) < self.workers:
+            self._worker_tasks.append(loop.create_task(self._work()))
+
+    async def _work(self) -> None:
+        """Take jobs off the backend and run them one at a time."""
+        while True:
+            job, runner = await self.backend.get()
+            if job.finished:
+                continue
+
+            job.status = RUNNING
+            job._notify()
+            # The job's task inherits the trace ID, so its spans are logged under the job
+            set_trace_id(job.id)
+            job._task = asyncio.get_running_loop().create_task(runner(job))
+
+            # Wait without propagating the job's cancellation into the worker
+            await asyncio.wait({job._task})
+            if job._task.cancelled():
+                job.finish(CANCELLED)
+            elif job._task.exception() is not None:
+                error = job._task.exception()
+                print(f"❌ Job {job.id} failed: {error}")
+                traceback.print_exception(error)
+                trace("job_error", job_id=job.id, kind=job.kind, error=type(error).__name__,
+                      traceback="".join(traceback.format_exception(error)))
+                job.finish(FAILED, str(error) or type(error).__name__)
+            elif not job.finished:
+                job.finish(DONE)
+
+    def active_jobs(self, user_id: str) -> List[Job]:
+        """Return the user's queued and running jobs."""
+        return [job for job in self._jobs.values() if job.user_id == user_id and not job.finished]
+
+    async def submit(self, user_id: str, kind: str, runner: JobRunner) -> Job:
+        """
+        Queue a job for a user.
+
+        Args:
+            user_id: Owner of the job
+            kind: Short label of the job type, e.g. "notes" or "video"
+            runner: Coroutine function doing the work; it receives the Job
+
+        Returns:
+            The queued job
+
+        Raises:
+            JobLimitError: If the user already has max_jobs_per_user active jobs
+        """
+        if len(self.active_jobs(user_id)) >= self.max_jobs_per_user:
+            raise JobLimitError(f"At most {self.max_jobs_per_user} generation job(s) can run at once")
+
+        self._prune()
+        self._ensure_workers()
+        job = Job(id=uuid.uuid4().hex, user_id=user_id, kind=kind)
+        self._jobs[job.id] = job
+        await self.backend.put(job, runner)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by ID."""
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            True if the job was still active
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job._task is not None and not job._task.done():
+            job._task.cancel()
+        else:
+            job.finish(CANCELLED)
+        return True
+
+    def _prune(self, max_age: float = 3600) -> None:
+        """Forget finished jobs older than max_age seconds."""
+        cutoff = time.time() - max_age
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.created_at < cutoff:
+                del self._jobs[job_id]
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide job queue."""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
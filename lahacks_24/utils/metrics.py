@@ -0,0 +1,213 @@
+"""
+Lightweight in-process metrics and tracing.
+
+Counters and latency histograms are kept in memory and exported in the
+Prometheus text format. Recording a value is a lock and a dictionary update,
+so instrumentation can stay on the hot path. With ``Config.METRICS_TRACE``
+enabled, every finished span is also printed as one JSON line tagged with
+the current trace ID (the job ID for generation jobs).
+"""
+
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..config import Config
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonically increasing count, per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Add amount to the counter for the given labels."""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for the given labels."""
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {value:g}" for key, value in items]
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count in each bucket (last one is +Inf), total sum, observation count
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation for the given labels."""
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def snapshot(self, **labels) -> Tuple[List[int], float, int]:
+        """Bucket counts, sum and count for the given labels."""
+        counts, total, count = self._values.get(_label_key(labels)) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+        return list(counts), total, count
+
+    def series(self) -> List[Tuple[Dict[str, str], float, int]]:
+        """Labels, sum and count of every recorded label set."""
+        with self._lock:
+            return [(dict(key), total, count) for key, (_, total, count) in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    """Named collection of metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create a counter."""
+        return self._get_or_create(Counter, name, description)
+
+    def histogram(self, name: str, description: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._get_or_create(Histogram, name, description, buckets)
+
+    def render(self) -> str:
+        """
+        Export every metric in the Prometheus text exposition format.
+
+        Returns:
+            Metrics text ending with a newline
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            if metric.description:
+                lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram("soru_stage_seconds", "Latency of each pipeline stage")
+stage_errors = registry.counter("soru_stage_errors_total", "Pipeline stages that raised an error")
+upstream_retries = registry.counter("soru_upstream_retries_total", "Retried requests to upstream APIs")
+cache_requests = registry.counter("soru_cache_requests_total", "Cache lookups by cache and result")
+jobs_finished = registry.counter("soru_jobs_total", "Finished generation jobs by kind and status")
+
+
+def set_trace_id(trace_id: Optional[str]) -> None:
+    """
+    Tag spans recorded in the current task (and tasks it starts) with an ID.
+
+    Args:
+        trace_id: Request or job ID written to trace logs
+    """
+    _trace_id.set(trace_id)
+
+
+def trace(event: str, **fields) -> None:
+    """Print a structured trace record if tracing is enabled."""
+    if Config.METRICS_TRACE:
+        record = {"ts": round(time.time(), 6), "event": event, "trace_id": _trace_id.get(), **fields}
+        print(json.dumps(record, default=str))
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[None]:
+    """
+    Time a block of work as one pipeline stage.
+
+    The duration is recorded in ``soru_stage_seconds``; an exception leaving
+    the block also counts in ``soru_stage_errors_total``.
+
+    Args:
+        stage: Stage name, e.g. "ocr", "transcript", "generate" or "parse"
+        **labels: Extra labels, e.g. the OCR backend
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        stage_errors.inc(stage=stage, error=error, **labels)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        stage_seconds.observe(seconds, stage=stage, **labels)
+        trace("span", stage=stage, seconds=round(seconds, 6), error=error, **labels)
+
+
+def render_prometheus() -> str:
+    """Export every registered metric in the Prometheus text format."""
+    return registry.render()
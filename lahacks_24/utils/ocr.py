@@ -2,42 +2,504 @@
 OCR (Optical Character Recognition) utilities for processing handwritten notes.
 """
 
-import requests
-from typing import Optional
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+
 from ..config import Config
+from .cache import build_cache, content_hash
+from .imaging import ImageBuffer, open_image, segment_lines
+from .metrics import span, upstream_retries
+from .ratelimit import RateLimitError, get_limiter, retry_after_seconds
+
+# Shared pooled client and concurrency gate. Both are created lazily so they
+# attach to the event loop that is running when the first request is made.
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# Recognized text keyed by a hash of the image bytes
+ocr_cache = build_cache(
+    "ocr",
+    max_entries=Config.OCR_CACHE_MAX_ENTRIES,
+    max_bytes=Config.OCR_CACHE_MAX_BYTES,
+    ttl=Config.OCR_CACHE_TTL,
+)
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client used for OCR requests.
+
+    The client keeps connections to the inference endpoint alive between
+    calls, so concurrent sessions reuse a bounded pool instead of opening a
+    new TLS connection for every image.
+
+    Returns:
+        Shared httpx.AsyncClient instance
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=Config.get_headers(),
+            timeout=httpx.Timeout(Config.OCR_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=Config.OCR_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.OCR_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore capping in-flight OCR requests."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(Config.OCR_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_client() -> None:
+    """Close the shared OCR client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
-async def extract_text_from_image(image_data: bytes) -> Optional[str]:
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """
+    Compute how long to wait before retrying an OCR request.
+
+    Args:
+        response: Response that triggered the retry, if any
+        attempt: Zero-based index of the attempt that failed
+
+    Returns:
+        Delay in seconds
+    """
+    delay = Config.OCR_RETRY_BACKOFF * (2 ** attempt)
+
+    # Hugging Face reports how long a cold model needs to load
+    if response is not None:
+        try:
+            estimated = float(response.json().get("estimated_time", 0))
+        except (ValueError, AttributeError):
+            estimated = 0.0
+        delay = max(delay, min(estimated, Config.OCR_TIMEOUT))
+
+    return delay
+
+
+async def extract_text_from_image(
+    image_data: ImageBuffer, content_id: Optional[str] = None
+) -> Optional[str]:
     """
     Extract text from an image using Microsoft's TrOCR model.
-    
+
+    The image is recognized by the backend selected with ``Config.OCR_BACKEND``.
+    With ``Config.OCR_SEGMENT_LINES`` enabled, the page is first split into
+    text-line crops that are recognized as one batch and joined top to bottom.
+    Results are cached by a hash of the image bytes, so re-uploading the same
+    photo returns the previously recognized text without calling the backend.
+
+    Args:
+        image_data: Binary image data or a memory-mapped upload to process
+        content_id: Precomputed hash of the image bytes, e.g. from the upload
+            stream, so the image does not have to be hashed again
+
+    Returns:
+        Extracted text if successful, None otherwise
+
+    Raises:
+        httpx.HTTPError: If the API request fails
+    """
+    backend = get_backend()
+    key = content_hash(
+        backend.cache_id, str(Config.OCR_SEGMENT_LINES), content_id or content_hash(image_data)
+    )
+    cached = await ocr_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with span("ocr_page", backend=backend.name):
+        text = await _recognize_page(backend, image_data)
+    if text is not None:
+        await ocr_cache.set(key, text)
+    return text
+
+
+async def _recognize_page(backend: "OCRBackend", image_data: ImageBuffer) -> Optional[str]:
+    """
+    Recognize a full page, line by line when segmentation is enabled.
+
+    Args:
+        backend: Backend that recognizes the page or its line crops
+        image_data: Binary image data of the page
+
+    Returns:
+        Recognized lines joined with newlines, or None if nothing was recognized
+    """
+    if not Config.OCR_SEGMENT_LINES:
+        return await backend.recognize(image_data)
+
+    try:
+        with span("segment"):
+            lines = await asyncio.to_thread(
+                segment_lines, image_data, Config.OCR_PAGE_MAX_SIDE, Config.OCR_MIN_LINE_HEIGHT
+            )
+    except OSError as e:
+        print(f"❌ Could not decode image for line segmentation: {e}")
+        return None
+
+    # Pages without a detectable line layout are sent whole
+    if not lines:
+        return await backend.recognize(image_data)
+
+    texts = await backend.recognize_batch(lines)
+    text = "\n".join(line.strip() for line in texts if line and line.strip())
+    return text or None
+
+
+async def _recognize_remote(image_data: ImageBuffer) -> Optional[str]:
+    """
+    Recognize an image with the hosted TrOCR inference endpoint.
+
+    Requests go through a shared connection pool, are limited to
+    ``Config.OCR_MAX_CONCURRENCY`` in flight and paced by the shared
+    Hugging Face rate limiter, and are retried with exponential backoff
+    while the model is loading (HTTP 503) or the quota is exceeded (HTTP 429).
+
     Args:
         image_data: Binary image data to process
-        
+
     Returns:
         Extracted text if successful, None otherwise
-        
+
     Raises:
-        requests.RequestException: If the API request fails
+        httpx.HTTPError: If the API request fails
+        RateLimitError: If the endpoint still answers 429 after every retry
     """
+    client = get_client()
+    limiter = get_limiter("huggingface")
+
+    # The request body must be bytes; a memory map is copied only here
+    if not isinstance(image_data, bytes):
+        image_data = image_data[:]
+
     try:
-        response = requests.post(
-            Config.HUGGINGFACE_API_URL,
-            headers=Config.get_headers(),
-            data=image_data
-        )
+        async with _get_semaphore():
+            for attempt in range(Config.OCR_MAX_RETRIES + 1):
+                retryable = None
+                await limiter.acquire()
+                try:
+                    with span("ocr_request", upstream="huggingface"):
+                        response = await client.post(Config.HUGGINGFACE_API_URL, content=image_data)
+                    if response.status_code not in (429, 503):
+                        limiter.reward()
+                        break
+                    retryable = response
+                    limiter.penalize(retry_after_seconds(response.headers.get("Retry-After")))
+                except httpx.TimeoutException:
+                    if attempt == Config.OCR_MAX_RETRIES:
+                        raise
+
+                if attempt < Config.OCR_MAX_RETRIES:
+                    upstream_retries.inc(upstream="ocr")
+                    delay = _retry_delay(retryable, attempt)
+                    print(f"⚠️  OCR endpoint unavailable, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+        if response.status_code == 429:
+            raise RateLimitError("Hugging Face", retry_after_seconds(response.headers.get("Retry-After")))
         response.raise_for_status()
-        
+
         result = response.json()
         if isinstance(result, list) and len(result) > 0:
             return result[0].get("generated_text", "")
-        
+
         return None
-        
-    except requests.RequestException as e:
+
+    except httpx.HTTPError as e:
         print(f"❌ OCR request failed: {e}")
         raise
-    except (KeyError, IndexError) as e:
+    except (KeyError, IndexError, ValueError) as e:
         print(f"❌ Error processing OCR response: {e}")
         return None
 
+
+class OCRBackend(ABC):
+    """Interface implemented by every text recognition backend."""
+
+    name = "base"
+
+    @property
+    def cache_id(self) -> str:
+        """Identifier mixed into cache keys so backends never share results."""
+        return self.name
+
+    @abstractmethod
+    async def recognize(self, image_data: ImageBuffer) -> Optional[str]:
+        """
+        Recognize the text in a single image.
+
+        Args:
+            image_data: Binary image data to process
+
+        Returns:
+            Extracted text if successful, None otherwise
+        """
+
+    async def recognize_batch(self, images: List[bytes]) -> List[Optional[str]]:
+        """
+        Recognize several images, returning texts in input order.
+
+        Args:
+            images: Binary image data for each image
+
+        Returns:
+            Extracted text (or None) for every image
+        """
+        return list(await asyncio.gather(*(self.recognize(image) for image in images)))
+
+
+class RemoteOCRBackend(OCRBackend):
+    """TrOCR served by the Hugging Face inference API."""
+
+    name = "remote"
+
+    @property
+    def cache_id(self) -> str:
+        return Config.HUGGINGFACE_API_URL
+
+    async def recognize(self, image_data: ImageBuffer) -> Optional[str]:
+        return await _recognize_remote(image_data)
+
+
+class LocalOCRBackend(OCRBackend):
+    """
+    In-process TrOCR running on the CPU.
+
+    The model is loaded once, on first use. Concurrent requests are queued and
+    grouped into micro-batches of up to ``batch_size`` images, each executed as
+    a single forward pass on a worker thread so the event loop stays free.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 8,
+        batch_wait: float = 0.01,
+        workers: int = 1,
+    ):
+        """
+        Args:
+            model_name: Hugging Face model id or local path of the TrOCR checkpoint
+            batch_size: Maximum images per forward pass
+            batch_wait: Seconds to wait for more requests before running a partial batch
+            workers: Number of threads executing batches
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trocr")
+        self._load_lock = threading.Lock()
+        self._processor = None
+        self._model = None
+        self._queue: Optional["asyncio.Queue[Tuple[bytes, asyncio.Future]]"] = None
+        self._batcher: Optional[asyncio.Task] = None
+
+    @property
+    def cache_id(self) -> str:
+        return f"local:{self.model_name}"
+
+    def _load(self):
+        """Load the processor and model exactly once, from any worker thread."""
+        with self._load_lock:
+            if self._model is None:
+                from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+                print(f"📦 Loading OCR model {self.model_name}...")
+                self._processor = TrOCRProcessor.from_pretrained(self.model_name)
+                model = VisionEncoderDecoderModel.from_pretrained(self.model_name)
+                model.eval()
+                self._model = model
+        return self._processor, self._model
+
+    def _run_batch(self, images: List[ImageBuffer]) -> List[Optional[str]]:
+        """Decode and recognize a batch of images in one forward pass."""
+        import torch
+
+        processor, model = self._load()
+
+        decoded = []
+        for image_data in images:
+            try:
+                decoded.append(open_image(image_data).convert("RGB"))
+            except OSError as e:
+                print(f"❌ Could not decode image for OCR: {e}")
+                decoded.append(None)
+
+        valid = [image for image in decoded if image is not None]
+        texts = []
+        if valid:
+            pixel_values = processor(images=valid, return_tensors="pt").pixel_values
+            with torch.no_grad():
+                generated_ids = model.generate(pixel_values)
+            texts = processor.batch_decode(generated_ids, skip_special_tokens=True)
+
+        results = iter(texts)
+        return [next(results) if image is not None else None for image in decoded]
+
+    async def _batch_loop(self) -> None:
+        """Collect queued requests into micro-batches and execute them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            images = [image_data for image_data, _ in batch]
+            try:
+                texts = await loop.run_in_executor(self._executor, self._run_batch, images)
+            except Exception as e:
+                print(f"❌ Local OCR batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), text in zip(batch, texts):
+                if not future.done():
+                    future.set_result(text)
+
+    def _ensure_batcher(self) -> None:
+        """Start the batching task on the running loop if it is not alive."""
+        if self._batcher is None or self._batcher.done():
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    async def recognize(self, image_data: ImageBuffer) -> Optional[str]:
+        self._ensure_batcher()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image_data, future))
+        return await future
+
+
+_backend: Optional[OCRBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> OCRBackend:
+    """
+    Get the OCR backend selected by ``Config.OCR_BACKEND``.
+
+    Returns:
+        Shared backend instance ("remote" or "local")
+
+    Raises:
+        ValueError: If the configured backend name is unknown
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if Config.OCR_BACKEND == "remote":
+                    _backend = RemoteOCRBackend()
+                elif Config.OCR_BACKEND == "local":
+                    _backend = LocalOCRBackend(
+                        Config.OCR_LOCAL_MODEL,
+                        batch_size=Config.OCR_BATCH_SIZE,
+                        batch_wait=Config.OCR_BATCH_WAIT_MS / 1000,
+                        workers=Config.OCR_LOCAL_WORKERS,
+                    )
+                else:
+                    raise ValueError(f"Unknown OCR backend: {Config.OCR_BACKEND}")
+    return _backend
+
+
+@dataclass
+class PageResult:
+    """OCR outcome for a single page of a batch upload."""
+
+    index: int
+    text: Optional[str]
+    seconds: float
+
+
+async def extract_text_from_images(
+    images: List[Optional[ImageBuffer]],
+    concurrency: Optional[int] = None,
+    on_page: Optional[Callable[[PageResult], None]] = None,
+    content_ids: Optional[List[str]] = None,
+) -> List[PageResult]:
+    """
+    Extract text from several page images concurrently.
+
+    Pages are recognized by a bounded pool of workers; a page that fails,
+    including one still rate limited after every retry, is reported with
+    ``text=None`` instead of aborting the whole batch.
+
+    Args:
+        images: Binary image data or memory-mapped uploads for each page, in page
+            order; None for a page that could not be read, reported with ``text=None``
+        concurrency: Maximum pages in flight (default: Config.OCR_BATCH_CONCURRENCY)
+        on_page: Called with each PageResult as soon as that page is done
+        content_ids: Precomputed hash of each image, in the same order as images
+
+    Returns:
+        One PageResult per input image, in the original page order
+    """
+    limit = asyncio.Semaphore(concurrency or Config.OCR_BATCH_CONCURRENCY)
+
+    async def recognize(index: int, image_data: Optional[ImageBuffer]) -> PageResult:
+        if image_data is None:
+            result = PageResult(index, None, 0.0)
+        else:
+            async with limit:
+                started = time.perf_counter()
+                try:
+                    text = await extract_text_from_image(
+                        image_data, content_ids[index] if content_ids else None
+                    )
+                except httpx.HTTPError:
+                    # Already reported by the request
+                    text = None
+                except Exception as e:
+                    # A rate-limited endpoint or a failing local model loses this page only
+                    print(f"❌ OCR of page {index + 1} failed: {e}")
+                    text = None
+                result = PageResult(index, text, time.perf_counter() - started)
+        if on_page is not None:
+            on_page(result)
+        return result
+
+    return list(await asyncio.gather(*(recognize(i, data) for i, data in enumerate(images))))
+
+
+def join_pages(results: List[PageResult]) -> str:
+    """
+    Stitch per-page OCR results into a single text, preserving page order.
+
+    Args:
+        results: Page results as returned by extract_text_from_images
+
+    Returns:
+        Text of every recognized page separated by newlines
+    """
+    ordered = sorted(results, key=lambda result: result.index)
+    return "\n".join(result.text for result in ordered if result.text)
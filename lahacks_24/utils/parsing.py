@@ -0,0 +1,178 @@
+"""
+Parsing of generated flashcard text into (front, back) pairs.
+
+When the source text was split into numbered sections, the model follows
+each back with a "Section: n" line, and the tagged parser methods return
+that number with the card.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+# (front, back, section number or None), as returned by the tagged methods
+TaggedCard = Tuple[str, str, Optional[int]]
+
+# "Front:"/"Back:" labels, optionally wrapped in markdown emphasis and preceded
+# by a bullet, a list number or a heading marker ("- **Front:** ...", "2. Back: ...")
+LABEL_PATTERN = re.compile(
+    r"^(?:[-*+•]\s+|\d+[.)]\s*|#+\s*)?[*_\s]*(front|back|question|answer|section)[*_\s]*:[*_\s]*(.*)$",
+    re.IGNORECASE,
+)
+TRAILING_EMPHASIS = re.compile(r"[*_\s]+$")
+# Markdown code fence the model sometimes wraps its whole answer in
+CODE_FENCE = re.compile(r"^(?:```|~~~)")
+SECTION_NUMBER = re.compile(r"\d+")
+
+FRONT_LABELS = ("front", "question")
+
+# Parser states
+_EXPECT_FRONT = 0
+_IN_FRONT = 1
+_IN_BACK = 2
+
+
+class FlashcardParser:
+    """
+    Single-pass state machine pairing "Front:" and "Back:" sections.
+
+    Text can be fed in arbitrary chunks, e.g. as it streams from the model.
+    Unlabelled lines continue the current section, so multi-line backs are
+    kept; a front without a back, or a back without a front, is skipped and
+    counted in ``skipped`` instead of failing the whole generation. A
+    "Section: n" line after a back tags that card; elsewhere it is ignored.
+    """
+
+    def __init__(self):
+        self.skipped = 0
+        self._buffer = ""
+        self._state = _EXPECT_FRONT
+        self._front: List[str] = []
+        self._back: List[str] = []
+        self._section: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Consume a chunk of generated text.
+
+        A card is returned once it can no longer grow: when the next card
+        starts, a blank line follows its back, or the parser is closed.
+
+        Args:
+            text: Next chunk of model output
+
+        Returns:
+            Cards completed by this chunk, as (front, back) tuples
+        """
+        return [(front, back) for front, back, _ in self.feed_tagged(text)]
+
+    def close(self) -> List[Tuple[str, str]]:
+        """
+        Flush the final line and any card still being built.
+
+        Returns:
+            Cards completed by the remaining text
+        """
+        return [(front, back) for front, back, _ in self.close_tagged()]
+
+    def feed_tagged(self, text: str) -> List[TaggedCard]:
+        """Like feed, but with the section number of each card (None if it has none)."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        cards: List[TaggedCard] = []
+        for line in lines:
+            self._line(line, cards)
+        return cards
+
+    def close_tagged(self) -> List[TaggedCard]:
+        """Like close, but with the section number of each card (None if it has none)."""
+        cards: List[TaggedCard] = []
+        line, self._buffer = self._buffer, ""
+        self._line(line, cards)
+        self._finish(cards)
+        if self._state == _IN_FRONT:
+            self.skipped += 1
+        self._state = _EXPECT_FRONT
+        self._front, self._back, self._section = [], [], None
+        return cards
+
+    def _finish(self, cards: List[TaggedCard]) -> None:
+        """Emit the card being built if it has both sides."""
+        if self._state != _IN_BACK:
+            return
+        front, back = _clean(self._front), _clean(self._back)
+        if front and back:
+            cards.append((front, back, self._section))
+        else:
+            self.skipped += 1
+        self._state = _EXPECT_FRONT
+        self._front, self._back, self._section = [], [], None
+
+    def _line(self, line: str, cards: List[TaggedCard]) -> None:
+        line = line.strip()
+        if not line or CODE_FENCE.match(line):
+            self._finish(cards)
+            return
+
+        match = LABEL_PATTERN.match(line)
+        if match is None:
+            # Continuation of the current section; stray text between cards is ignored
+            if self._state == _IN_FRONT:
+                self._front.append(line)
+            elif self._state == _IN_BACK:
+                self._back.append(line)
+            return
+
+        label, value = match.group(1).lower(), match.group(2)
+        if label == "section":
+            number = SECTION_NUMBER.search(value)
+            if self._state == _IN_BACK and number is not None:
+                self._section = int(number.group())
+            return
+        if label in FRONT_LABELS:
+            self._finish(cards)
+            if self._state == _IN_FRONT:
+                self.skipped += 1
+            self._state = _IN_FRONT
+            self._front = [value]
+        elif self._state == _IN_FRONT:
+            self._state = _IN_BACK
+            self._back = [value]
+        else:
+            # A back without a front, or a second back for the same card
+            self._finish(cards)
+            self.skipped += 1
+
+
+def _clean(parts: List[str]) -> str:
+    """Join a section's lines and strip leftover markdown emphasis."""
+    return TRAILING_EMPHASIS.sub("", " ".join(part for part in parts if part)).strip()
+
+
+def parse_flashcards(text: str, parser: Optional[FlashcardParser] = None) -> List[Tuple[str, str]]:
+    """
+    Parse a complete model response into (front, back) pairs.
+
+    Args:
+        text: Generated flashcard text
+        parser: Parser to use, e.g. to read its skipped count afterwards
+
+    Returns:
+        Cards in the order they appear
+    """
+    parser = parser or FlashcardParser()
+    return parser.feed(text) + parser.close()
+
+
+def parse_tagged_flashcards(text: str, parser: Optional[FlashcardParser] = None) -> List[TaggedCard]:
+    """
+    Parse a complete model response into (front, back, section) triples.
+
+    Args:
+        text: Generated flashcard text
+        parser: Parser to use, e.g. to read its skipped count afterwards
+
+    Returns:
+        Cards in the order they appear, with their section number or None
+    """
+    parser = parser or FlashcardParser()
+    return parser.feed_tagged(text) + parser.close_tagged()
@@ -0,0 +1,239 @@
+"""
+Client-side rate limiting for upstream APIs.
+
+Each upstream (Hugging Face, Gemini, YouTube) gets one shared token bucket,
+so concurrent sessions spread their requests over the quota instead of
+bursting into it. The rate adapts: a 429 or 503 response halves it and
+pauses the bucket for the server's Retry-After, and successful requests
+raise it again step by step. Waiting requests are served by priority, so a
+user waiting on the page goes ahead of batch work and prefetching.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..config import Config
+from .metrics import registry
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+PREFETCH = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", PREFETCH: "prefetch"}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+rate_limited = registry.counter("soru_rate_limited_total", "Upstream responses asking the client to slow down")
+limiter_wait = registry.histogram("soru_rate_limit_wait_seconds", "Time requests waited for an upstream token")
+
+
+class RateLimitError(RuntimeError):
+    """Raised when an upstream keeps rejecting requests for exceeding its quota."""
+
+    def __init__(self, upstream: str, retry_after: Optional[float] = None):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        wait = f" in {retry_after:.0f}s" if retry_after else " in a minute"
+        super().__init__(f"The {upstream} API is over its rate limit, please try again{wait}")
+
+
+def current_priority() -> int:
+    """Priority of requests made by the current task."""
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """
+    Run a block with a request priority.
+
+    Tasks started inside the block inherit the priority.
+
+    Args:
+        level: INTERACTIVE, BATCH or PREFETCH
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given in seconds.
+
+    Args:
+        value: Header value, if any
+
+    Returns:
+        Seconds to wait, or None if the header is missing or not a number
+    """
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket with additive-increase/multiplicative-decrease rate control
+    and a priority queue of waiting requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        min_rate: Optional[float] = None,
+        increase: Optional[float] = None,
+    ):
+        """
+        Args:
+            name: Upstream name used in logs and metrics
+            rate: Highest rate in requests per second (the known quota)
+            burst: Bucket size, i.e. requests that may be sent back to back
+            min_rate: Lowest rate the limiter backs off to (default: rate / 16)
+            increase: Rate added per successful request (default: rate / 20)
+        """
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.min_rate = min_rate or rate / 16
+        self.increase = increase or rate / 20
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> float:
+        """Take a token if one is available; otherwise return seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self, level: Optional[int] = None) -> None:
+        """
+        Wait for permission to send one request.
+
+        Args:
+            level: Request priority (default: the priority of the current task)
+        """
+        level = current_priority() if level is None else level
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Waiters of a previous event loop can never be woken; start over
+            self._loop, self._waiters, self._dispatcher = loop, [], None
+
+        started = time.perf_counter()
+        if not self._waiters and self._try_take() == 0:
+            limiter_wait.observe(0.0, upstream=self.name, priority=PRIORITY_NAMES.get(level, level))
+            return
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (level, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        await future
+        limiter_wait.observe(
+            time.perf_counter() - started, upstream=self.name, priority=PRIORITY_NAMES.get(level, level)
+        )
+
+    async def _dispatch(self) -> None:
+        """Hand out tokens to waiters, highest priority first."""
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                # The waiting request was cancelled
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._try_take()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """
+        Slow down after the upstream rejected a request (429 or 503).
+
+        Args:
+            retry_after: Seconds the upstream asked the client to wait
+        """
+        rate_limited.inc(upstream=self.name)
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def reward(self) -> None:
+        """Speed back up towards the maximum rate after a successful request."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the limiter's current state.
+
+        Returns:
+            Current and maximum rate, and the number of waiting requests
+        """
+        return {"rate": self.rate, "max_rate": self.max_rate, "waiting": len(self._waiters)}
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(upstream: str) -> AdaptiveRateLimiter:
+    """
+    Get the shared limiter of an upstream API.
+
+    Args:
+        upstream: "huggingface", "gemini" or "youtube"
+
+    Returns:
+        Limiter configured by the matching ``*_RATE_LIMIT`` and ``*_RATE_BURST`` settings
+
+    Raises:
+        ValueError: If the upstream is unknown
+    """
+    settings = {
+        "huggingface": (Config.OCR_RATE_LIMIT, Config.OCR_RATE_BURST),
+        "gemini": (Config.LLM_RATE_LIMIT, Config.LLM_RATE_BURST),
+        "youtube": (Config.TRANSCRIPT_RATE_LIMIT, Config.TRANSCRIPT_RATE_BURST),
+    }
+    if upstream not in settings:
+        raise ValueError(f"Unknown upstream: {upstream}")
+
+    with _limiters_lock:
+        if upstream not in _limiters:
+            rate, burst = settings[upstream]
+            _limiters[upstream] = AdaptiveRateLimiter(upstream, rate, burst)
+        return _limiters[upstream]
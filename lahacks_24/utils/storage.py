@@ -0,0 +1,443 @@
+"""
+Persistent deck storage.
+
+Decks and their cards are stored in PostgreSQL through a pooled connection,
+or in SQLite for local development and tests. Decks are looked up by the
+hash of the source they were generated from, so reopening a deck is a single
+query instead of a new OCR/Gemini round trip. Notes decks also store the
+hash of every page, so a re-upload of the same notebook with a few pages
+added or changed can be matched to its previous deck.
+"""
+
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from ..config import Config
+
+# (deck_id, position, front, back, span_start, span_end)
+CardRow = Tuple[int, int, str, str, Optional[float], Optional[float]]
+
+
+@dataclass
+class Deck:
+    """A stored flashcard deck."""
+
+    id: int
+    user_id: str
+    source_hash: str
+    title: str
+    cards: List[Tuple[str, str]] = field(default_factory=list)
+    created_at: Optional[datetime] = None
+    # Source span of each card, aligned with cards: (start, end) seconds of a video,
+    # or the positions (first, last + 1) in pages of the note pages it came from
+    spans: List[Optional[Tuple[float, float]]] = field(default_factory=list)
+    # Content hashes of the note pages, in page order; loaded by find_deck_by_pages
+    pages: List[str] = field(default_factory=list)
+
+
+class DeckStore(ABC):
+    """
+    Shared query logic for deck storage backends.
+
+    Queries are written with ``%s`` placeholders; backends using another
+    parameter style override ``_sql``.
+    """
+
+    SCHEMA: List[str] = []
+
+    LOAD_DECK = """
+        SELECT d.id, d.user_id, d.source_hash, d.title, d.created_at, c.front, c.back, c.span_start, c.span_end
+        FROM decks d
+        LEFT JOIN cards c ON c.deck_id = d.id
+        WHERE d.id = ({deck_id})
+        ORDER BY c.position
+    """
+
+    LATEST_FOR_SOURCE = """
+        SELECT id FROM decks
+        WHERE source_hash = %s {user_filter}
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    """
+
+    BEST_PAGE_MATCH = """
+        SELECT p.deck_id, COUNT(DISTINCT p.page_hash)
+        FROM deck_pages p
+        JOIN decks d ON d.id = p.deck_id
+        WHERE p.page_hash IN ({placeholders}) {user_filter}
+        GROUP BY p.deck_id, d.created_at
+        ORDER BY COUNT(DISTINCT p.page_hash) DESC, d.created_at DESC, p.deck_id DESC
+        LIMIT 1
+    """
+
+    LOAD_PAGES = "SELECT page_hash FROM deck_pages WHERE deck_id = %s ORDER BY position"
+
+    LIST_FOR_USER = """
+        SELECT id, user_id, source_hash, title, created_at
+        FROM decks
+        WHERE user_id = %s
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """
+
+    def _sql(self, query: str) -> str:
+        return query
+
+    @abstractmethod
+    @contextmanager
+    def _connection(self) -> Iterator:
+        """Yield a connection, committing on success and rolling back on error."""
+
+    @abstractmethod
+    def _insert_deck(self, cursor, user_id: str, source_hash: str, title: str) -> int:
+        """Insert a deck row and return its ID."""
+
+    @abstractmethod
+    def _insert_cards(self, cursor, rows: List[CardRow]) -> None:
+        """Insert card rows in bulk."""
+
+    @abstractmethod
+    def _insert_pages(self, cursor, rows: List[Tuple[int, int, str]]) -> None:
+        """Insert (deck_id, position, page_hash) rows in bulk."""
+
+    def create_schema(self) -> None:
+        """Create the tables and indexes if they do not exist."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            for statement in self.SCHEMA:
+                cursor.execute(statement)
+
+    def save_deck(
+        self,
+        user_id: str,
+        source_hash: str,
+        title: str,
+        cards: List[Tuple[str, str]],
+        spans: Optional[List[Optional[Tuple[float, float]]]] = None,
+        pages: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Store a deck and all of its cards in one transaction.
+
+        Args:
+            user_id: Owner of the deck
+            source_hash: Hash identifying the notes or video the deck was generated from
+            title: Human-readable deck title
+            cards: (front, back) pairs in display order
+            spans: Video span (start, end) each card was generated from, if known
+            pages: Content hashes of the note pages the deck was generated from, in page order
+
+        Returns:
+            ID of the new deck
+        """
+        spans = spans or [None] * len(cards)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            deck_id = self._insert_deck(cursor, user_id, source_hash, title)
+            rows = [
+                (deck_id, position, front, back, *(span or (None, None)))
+                for position, ((front, back), span) in enumerate(zip(cards, spans))
+            ]
+            if rows:
+                self._insert_cards(cursor, rows)
+            if pages:
+                self._insert_pages(cursor, [(deck_id, position, page) for position, page in enumerate(pages)])
+        return deck_id
+
+    def load_deck(self, source_hash: str, user_id: Optional[str] = None) -> Optional[Deck]:
+        """
+        Load the most recent deck generated from a source, with a single query.
+
+        Args:
+            source_hash: Hash identifying the notes or video
+            user_id: Restrict the lookup to decks owned by this user
+
+        Returns:
+            The deck with its cards in order, or None if no deck exists
+        """
+        params: list = [source_hash]
+        user_filter = ""
+        if user_id is not None:
+            user_filter = "AND user_id = %s"
+            params.append(user_id)
+
+        query = self.LOAD_DECK.format(deck_id=self.LATEST_FOR_SOURCE.format(user_filter=user_filter))
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(query), params)
+            return self._deck_from_rows(cursor.fetchall())
+
+    def find_deck_by_pages(self, pages: List[str], user_id: Optional[str] = None) -> Optional[Deck]:
+        """
+        Find the deck generated from the most of these note pages.
+
+        Used when a notebook is uploaded again with pages added, changed or
+        removed: the best match is the previous version of its deck.
+
+        Args:
+            pages: Content hashes of the uploaded pages
+            user_id: Restrict the lookup to decks owned by this user
+
+        Returns:
+            The deck sharing the most pages (the newest one on a tie), with its
+            cards and page hashes, or None if no deck shares a page
+        """
+        if not pages:
+            return None
+        params: list = list(dict.fromkeys(pages))
+        user_filter = ""
+        if user_id is not None:
+            user_filter = "AND d.user_id = %s"
+            params.append(user_id)
+        placeholders = ", ".join(["%s"] * (len(params) - (user_id is not None)))
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                self._sql(self.BEST_PAGE_MATCH.format(placeholders=placeholders, user_filter=user_filter)), params
+            )
+            match = cursor.fetchone()
+            if match is None:
+                return None
+            cursor.execute(self._sql(self.LOAD_DECK.format(deck_id="%s")), (match[0],))
+            deck = self._deck_from_rows(cursor.fetchall())
+            cursor.execute(self._sql(self.LOAD_PAGES), (match[0],))
+            if deck is not None:
+                deck.pages = [row[0] for row in cursor.fetchall()]
+        return deck
+
+    @staticmethod
+    def _deck_from_rows(rows: list) -> Optional[Deck]:
+        """Build a deck from the rows of LOAD_DECK."""
+        if not rows:
+            return None
+
+        deck_id, owner, stored_hash, title, created_at = rows[0][:5]
+        cards, spans = [], []
+        for *_, front, back, span_start, span_end in rows:
+            if front is not None:
+                cards.append((front, back))
+                spans.append(None if span_start is None else (span_start, span_end))
+        return Deck(deck_id, owner, stored_hash, title, cards, created_at, spans)
+
+    def list_decks(self, user_id: str, limit: int = 50) -> List[Deck]:
+        """
+        List a user's most recent decks, without their cards.
+
+        Args:
+            user_id: Owner of the decks
+            limit: Maximum number of decks to return
+
+        Returns:
+            Decks ordered from newest to oldest
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(self.LIST_FOR_USER), (user_id, limit))
+            rows = cursor.fetchall()
+        return [Deck(row[0], row[1], row[2], row[3], [], row[4]) for row in rows]
+
+    def close(self) -> None:
+        """Release every connection held by the store."""
+
+
+class PostgresDeckStore(DeckStore):
+    """Deck storage in PostgreSQL through a thread-safe connection pool."""
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS decks (
+            id BIGSERIAL PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            source_hash TEXT NOT NULL,
+            title TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cards (
+            deck_id BIGINT NOT NULL REFERENCES decks (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            front TEXT NOT NULL,
+            back TEXT NOT NULL,
+            span_start DOUBLE PRECISION,
+            span_end DOUBLE PRECISION,
+            PRIMARY KEY (deck_id, position)
+        )
+        """,
+        # Databases created before cards recorded their source span
+        "ALTER TABLE cards ADD COLUMN IF NOT EXISTS span_start DOUBLE PRECISION",
+        "ALTER TABLE cards ADD COLUMN IF NOT EXISTS span_end DOUBLE PRECISION",
+        """
+        CREATE TABLE IF NOT EXISTS deck_pages (
+            deck_id BIGINT NOT NULL REFERENCES decks (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            page_hash TEXT NOT NULL,
+            PRIMARY KEY (deck_id, position)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS deck_pages_hash_idx ON deck_pages (page_hash)",
+        "CREATE INDEX IF NOT EXISTS decks_source_hash_idx ON decks (source_hash, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS decks_user_idx ON decks (user_id, created_at DESC)",
+    ]
+
+    def __init__(self, dsn: str, min_connections: int = 1, max_connections: int = 10):
+        """
+        Args:
+            dsn: PostgreSQL connection string
+            min_connections: Connections opened up front
+            max_connections: Upper bound on pooled connections
+        """
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self._pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+
+    @contextmanager
+    def _connection(self) -> Iterator:
+        conn = self._pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.putconn(conn)
+
+    def _insert_deck(self, cursor, user_id: str, source_hash: str, title: str) -> int:
+        cursor.execute(
+            "INSERT INTO decks (user_id, source_hash, title) VALUES (%s, %s, %s) RETURNING id",
+            (user_id, source_hash, title),
+        )
+        return cursor.fetchone()[0]
+
+    def _insert_cards(self, cursor, rows: List[CardRow]) -> None:
+        from psycopg2.extras import execute_values
+
+        execute_values(
+            cursor,
+            "INSERT INTO cards (deck_id, position, front, back, span_start, span_end) VALUES %s",
+            rows,
+            page_size=500,
+        )
+
+    def _insert_pages(self, cursor, rows: List[Tuple[int, int, str]]) -> None:
+        from psycopg2.extras import execute_values
+
+        execute_values(cursor, "INSERT INTO deck_pages (deck_id, position, page_hash) VALUES %s", rows)
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+class SQLiteDeckStore(DeckStore):
+    """Deck storage in a local SQLite file, for development and tests."""
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS decks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            source_hash TEXT NOT NULL,
+            title TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cards (
+            deck_id INTEGER NOT NULL REFERENCES decks (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            front TEXT NOT NULL,
+            back TEXT NOT NULL,
+            span_start REAL,
+            span_end REAL,
+            PRIMARY KEY (deck_id, position)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS deck_pages (
+            deck_id INTEGER NOT NULL REFERENCES decks (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            page_hash TEXT NOT NULL,
+            PRIMARY KEY (deck_id, position)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS deck_pages_hash_idx ON deck_pages (page_hash)",
+        "CREATE INDEX IF NOT EXISTS decks_source_hash_idx ON decks (source_hash, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS decks_user_idx ON decks (user_id, created_at DESC)",
+    ]
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Args:
+            path: Database file, or ":memory:" for a throwaway database
+        """
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._lock = threading.Lock()
+
+    def _sql(self, query: str) -> str:
+        return query.replace("%s", "?")
+
+    def create_schema(self) -> None:
+        super().create_schema()
+        # Databases created before cards recorded their source span; SQLite has no ADD COLUMN IF NOT EXISTS
+        with self._connection() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cards)")}
+            for column in ("span_start", "span_end"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE cards ADD COLUMN {column} REAL")
+
+    @contextmanager
+    def _connection(self) -> Iterator:
+        with self._lock:
+            with self._conn:
+                yield self._conn
+
+    def _insert_deck(self, cursor, user_id: str, source_hash: str, title: str) -> int:
+        cursor.execute(
+            "INSERT INTO decks (user_id, source_hash, title) VALUES (?, ?, ?)",
+            (user_id, source_hash, title),
+        )
+        return cursor.lastrowid
+
+    def _insert_cards(self, cursor, rows: List[CardRow]) -> None:
+        cursor.executemany(
+            "INSERT INTO cards (deck_id, position, front, back, span_start, span_end) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def _insert_pages(self, cursor, rows: List[Tuple[int, int, str]]) -> None:
+        cursor.executemany("INSERT INTO deck_pages (deck_id, position, page_hash) VALUES (?, ?, ?)", rows)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_store: Optional[DeckStore] = None
+_store_lock = threading.Lock()
+
+
+def get_deck_store() -> DeckStore:
+    """
+    Get the deck store configured by ``Config.DATABASE_URL``.
+
+    ``postgresql://`` URLs use PostgreSQL; ``sqlite:///path`` uses a SQLite file.
+
+    Returns:
+        Shared store with its schema created
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            url = Config.DATABASE_URL
+            if url.startswith(("postgres://", "postgresql://")):
+                store = PostgresDeckStore(url, Config.DB_POOL_MIN, Config.DB_POOL_MAX)
+            elif url.startswith("sqlite:///"):
+                store = SQLiteDeckStore(url[len("sqlite:///"):] or ":memory:")
+            else:
+                raise ValueError(f"Unsupported DATABASE_URL: {url}")
+            store.create_schema()
+            _store = store
+    return _store
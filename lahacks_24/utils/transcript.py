@@ -0,0 +1,153 @@
+"""
+Timestamp-indexed transcript model.
+
+A Transcript keeps the text of every caption segment in one string and the
+segment offsets, start times and durations in typed arrays, instead of a list
+of per-segment dicts. Time ranges are found by binary search over the start
+times, so cards can record the span of the video they came from and a single
+span can be regenerated without touching the rest of the transcript.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+from .chunking import TranscriptChunk, chunk_segments
+
+# Time span of a video in seconds, (start, end)
+Span = Tuple[float, float]
+
+
+class Transcript:
+    """Caption segments of a video, sorted by start time."""
+
+    __slots__ = ("_text", "_offsets", "starts", "durations", "_max_ends")
+
+    def __init__(self, text: str, offsets: array, starts: array, durations: array):
+        """
+        Args:
+            text: Text of every segment, concatenated
+            offsets: Start of each segment's text in text, plus the end of the last one
+            starts: Start of each segment in seconds ('d' array)
+            durations: Duration of each segment in seconds ('d' array)
+        """
+        self._text = text
+        self._offsets = offsets
+        self.starts = starts
+        self.durations = durations
+        # Latest end of the segments up to each index; non-decreasing, so it can be searched
+        # for the first segment still showing at a time even when long segments overlap later ones
+        self._max_ends = array("d")
+        latest = float("-inf")
+        for segment_start, duration in zip(starts, durations):
+            latest = max(latest, segment_start + duration)
+            self._max_ends.append(latest)
+
+    @classmethod
+    def from_segments(cls, segments: List[dict]) -> "Transcript":
+        """
+        Build a transcript from segments as returned by the transcript API.
+
+        Args:
+            segments: Segments with "text", "start" and optional "duration" keys
+
+        Returns:
+            Transcript with empty segments dropped, in start-time order
+        """
+        ordered = sorted(
+            (segment for segment in segments if segment["text"].strip()), key=lambda segment: segment["start"]
+        )
+        texts = [segment["text"].strip() for segment in ordered]
+        offsets = array("L", [0])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        return cls(
+            "".join(texts),
+            offsets,
+            array("d", (segment["start"] for segment in ordered)),
+            array("d", (segment.get("duration", 0.0) for segment in ordered)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def end(self) -> float:
+        """End of the segment that ends last, in seconds."""
+        return self._max_ends[-1] if self.starts else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the text and the index arrays."""
+        arrays = (self._offsets, self.starts, self.durations, self._max_ends)
+        return len(self._text.encode("utf-8")) + sum(len(values) * values.itemsize for values in arrays)
+
+    def text_at(self, index: int) -> str:
+        """Text of one segment."""
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+
+    def text(self, lo: int = 0, hi: Optional[int] = None) -> str:
+        """Text of segments lo to hi (exclusive), separated by spaces."""
+        hi = len(self) if hi is None else hi
+        return " ".join(self.text_at(index) for index in range(lo, hi))
+
+    def segments(self, lo: int = 0, hi: Optional[int] = None) -> Iterator[dict]:
+        """Segments lo to hi (exclusive) as dicts with "text", "start" and "duration" keys."""
+        hi = len(self) if hi is None else hi
+        for index in range(lo, hi):
+            yield {"text": self.text_at(index), "start": self.starts[index], "duration": self.durations[index]}
+
+    def index_range(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        Find the segments overlapping a time range.
+
+        Args:
+            start: Range start in seconds
+            end: Range end in seconds
+
+        Returns:
+            (lo, hi) such that segments lo to hi (exclusive) include every
+            segment overlapping the range, also one that started long before it
+        """
+        # Every segment before lo has ended by the start of the range
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_left(self.starts, end, lo)
+        return lo, max(lo, hi)
+
+    def slice(self, start: float, end: float) -> "Transcript":
+        """
+        Get the part of the transcript overlapping a time range.
+
+        Args:
+            start: Range start in seconds
+            end: Range end in seconds
+
+        Returns:
+            Transcript of the overlapping segments; empty if there are none
+        """
+        lo, hi = self.index_range(start, end)
+        base = self._offsets[lo]
+        return Transcript(
+            self._text[base:self._offsets[hi]],
+            array("L", (offset - base for offset in self._offsets[lo:hi + 1])),
+            self.starts[lo:hi],
+            self.durations[lo:hi],
+        )
+
+    def chunks(self, max_tokens: int, max_seconds: Optional[float] = None) -> List[TranscriptChunk]:
+        """
+        Split the transcript into token-budgeted windows.
+
+        Args:
+            max_tokens: Token budget for the text of each window
+            max_seconds: Longest stretch of video a window may cover
+
+        Returns:
+            Windows in playback order, each with the time span it covers
+        """
+        return chunk_segments(list(self.segments()), max_tokens, max_seconds)
+
+
+def overlaps(span: Optional[Span], start: float, end: float) -> bool:
+    """Whether a card's source span overlaps a time range; cards without a span never do."""
+    return span is not None and span[0] < end and span[1] > start
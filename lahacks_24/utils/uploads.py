@@ -0,0 +1,136 @@
+"""
+Upload handling utilities.
+
+Uploaded files are streamed to disk in fixed-size chunks while their content
+hash is computed, so an image is never held in memory as a whole. The stored
+file is later handed to OCR through a read-only memory map.
+
+Files are stored under their content hash rather than the client's file name:
+background jobs read them back later, and two sessions uploading "image.jpg"
+must not overwrite each other's photo in the meantime.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ..config import Config
+
+
+# File extensions kept on stored uploads; anything else is stored without one
+SAFE_SUFFIX = re.compile(r"\.[a-z0-9]{1,8}")
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds Config.MAX_UPLOAD_BYTES."""
+
+
+@dataclass
+class StoredUpload:
+    """An uploaded file saved to disk, identified by its content hash."""
+
+    path: Path
+    sha256: str
+    size: int
+    name: str = ""  # File name the client sent, for display only
+
+    def __post_init__(self):
+        self.name = self.name or self.path.name
+
+    @classmethod
+    def from_path(cls, path: Path, chunk_size: Optional[int] = None) -> "StoredUpload":
+        """
+        Describe a file that is already on disk, hashing it in chunks.
+
+        Args:
+            path: Location of the stored file
+            chunk_size: Bytes read per step (default: Config.UPLOAD_CHUNK_BYTES)
+
+        Returns:
+            StoredUpload for the file
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size or Config.UPLOAD_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        return cls(Path(path), digest.hexdigest(), size)
+
+    @contextmanager
+    def open_buffer(self) -> Iterator[mmap.mmap]:
+        """
+        Map the stored file read-only into memory.
+
+        The map supports the buffer protocol and file-style reads, so it can be
+        hashed and decoded without copying the file into a bytes object.
+        """
+        with open(self.path, "rb") as f:
+            if self.size == 0:
+                raise ValueError(f"Uploaded file {self.path.name} is empty")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield buffer
+
+
+async def save_upload(
+    file,
+    directory: Path,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Stream an uploaded file to disk, hashing it on the fly.
+
+    The file is written to a private temporary file and then renamed to
+    ``<sha256><ext>``, so concurrent uploads never share a path and an
+    identical upload simply replaces the file with the same bytes.
+
+    Args:
+        file: Uploaded file exposing an async read(size) method
+        directory: Directory the file is saved in
+        max_bytes: Largest accepted upload (default: Config.MAX_UPLOAD_BYTES)
+        chunk_size: Bytes read per step (default: Config.UPLOAD_CHUNK_BYTES)
+
+    Returns:
+        StoredUpload describing the saved file, with the client's file name as its name
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than max_bytes; the
+            partial file is removed
+    """
+    max_bytes = max_bytes or Config.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or Config.UPLOAD_CHUNK_BYTES
+
+    # Never trust client-supplied directories in the file name
+    name = Path(file.filename or "upload").name
+    suffix = Path(name).suffix.lower()
+    suffix = suffix if SAFE_SUFFIX.fullmatch(suffix) else ""
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, partial = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(
+                        f"{name} is larger than the {max_bytes / (1024 * 1024):g} MB upload limit"
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+        path = Path(directory) / f"{digest.hexdigest()}{suffix}"
+        os.replace(partial, path)
+    finally:
+        Path(partial).unlink(missing_ok=True)
+
+    return StoredUpload(path, digest.hexdigest(), size, name)
@@ -2,8 +2,32 @@
 YouTube utilities for extracting video transcripts.
 """
 
-from youtube_transcript_api import YouTubeTranscriptApi
-from typing import Optional
+import asyncio
+import re
+from typing import Dict, Iterable, List, Optional
+
+from ..config import Config
+from .cache import SingleFlight, build_cache, content_hash
+from .metrics import span
+from .ratelimit import PREFETCH, RateLimitError, get_limiter, priority
+
+# Transcript segments keyed by (video_id, languages)
+transcript_cache = build_cache(
+    "transcripts",
+    max_entries=Config.TRANSCRIPT_CACHE_MAX_ENTRIES,
+    max_bytes=Config.TRANSCRIPT_CACHE_MAX_BYTES,
+    ttl=Config.TRANSCRIPT_CACHE_TTL,
+)
+_inflight = SingleFlight()
+
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def _fetch_transcript(video_id: str, languages: list) -> List[dict]:
+    """Fetch transcript segments, importing the transcript client on first use."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    return YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
 
 
 def extract_video_id(url: str) -> Optional[str]:
@@ -23,6 +47,100 @@ def extract_video_id(url: str) -> Optional[str]:
     return None
 
 
+def normalize_video_id(value: str) -> Optional[str]:
+    """
+    Resolve a YouTube URL or bare video ID to the video ID.
+    
+    Args:
+        value: Video URL in any supported form, or an 11-character video ID
+        
+    Returns:
+        Video ID if recognized, None otherwise
+    """
+    value = value.strip()
+    video_id = extract_video_id(value)
+    if video_id:
+        return video_id
+    if VIDEO_ID_PATTERN.match(value):
+        return value
+    return None
+
+
+async def get_transcript_segments(video_id: str, languages: list = ['en', 'ru']) -> Optional[List[dict]]:
+    """
+    Get the timestamped transcript segments of a YouTube video.
+    
+    Transcripts are cached per (video, languages), so every URL form of the
+    same video shares one entry. The blocking fetch runs in a worker thread,
+    and concurrent requests for the same video share a single fetch.
+    
+    Args:
+        video_id: YouTube video ID (a video URL is also accepted)
+        languages: List of language codes to try (default: ['en', 'ru'])
+        
+    Returns:
+        Segments with "text", "start" and "duration" keys if successful, None otherwise
+
+    Raises:
+        RateLimitError: If YouTube rejects the request as too frequent
+    """
+    video_id = normalize_video_id(video_id) or video_id
+    key = content_hash(video_id, ",".join(languages))
+
+    cached = await transcript_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch() -> Optional[List[dict]]:
+        limiter = get_limiter("youtube")
+        await limiter.acquire()
+        try:
+            with span("transcript_fetch", upstream="youtube"):
+                segments = await asyncio.to_thread(_fetch_transcript, video_id, languages)
+        except Exception as e:
+            if type(e).__name__ == "TooManyRequests":
+                limiter.penalize()
+                print(f"⚠️  YouTube rate limited the transcript request for {video_id}")
+                raise RateLimitError("YouTube") from e
+            print(f"❌ Failed to get YouTube transcript: {e}")
+            return None
+        limiter.reward()
+        await transcript_cache.set(key, segments)
+        return segments
+
+    return await _inflight.do(key, fetch)
+
+
+async def prefetch_transcripts(
+    videos: Iterable[str], languages: list = ['en', 'ru'], concurrency: Optional[int] = None
+) -> Dict[str, bool]:
+    """
+    Warm the transcript cache for many videos in parallel, e.g. a course playlist.
+    
+    Args:
+        videos: Video URLs or IDs
+        languages: List of language codes to try (default: ['en', 'ru'])
+        concurrency: Maximum fetches in flight (default: Config.TRANSCRIPT_PREFETCH_CONCURRENCY)
+        
+    Returns:
+        Mapping of video ID to whether its transcript is now cached
+    """
+    video_ids = list(dict.fromkeys(filter(None, (normalize_video_id(video) for video in videos))))
+    limit = asyncio.Semaphore(concurrency or Config.TRANSCRIPT_PREFETCH_CONCURRENCY)
+
+    async def prefetch(video_id: str) -> bool:
+        async with limit:
+            try:
+                return await get_transcript_segments(video_id, languages) is not None
+            except RateLimitError:
+                return False
+
+    # Prefetching yields the YouTube quota to transcripts a user is waiting for
+    with priority(PREFETCH):
+        results = await asyncio.gather(*(prefetch(video_id) for video_id in video_ids))
+    return dict(zip(video_ids, results))
+
+
 async def get_video_transcript(video_id: str, languages: list = ['en', 'ru']) -> Optional[str]:
     """
     Get transcript from a YouTube video.
@@ -34,14 +152,9 @@ async def get_video_transcript(video_id: str, languages: list = ['en', 'ru']) ->
     Returns:
         Combined transcript text if successful, None otherwise
     """
-    try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
-        
-        # Combine all transcript segments
-        content = " ".join([line['text'] for line in transcript_list])
-        return content
-        
-    except Exception as e:
-        print(f"❌ Failed to get YouTube transcript: {e}")
+    transcript_list = await get_transcript_segments(video_id, languages)
+    if transcript_list is None:
         return None
-
+    
+    # Combine all transcript segments
+    return " ".join([line['text'] for line in transcript_list])
@@ -0,0 +1,69 @@
+"""
+Shared test setup.
+
+Settings that would reach outside the test run are overridden before the
+package is imported: no on-disk caches, an in-memory deck database and
+dummy API keys.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.update({
+    "CACHE_DIR": "",
+    "DATABASE_URL": "sqlite:///",
+    "METRICS_TRACE": "False",
+    "GOOGLE_API_KEY": "test",
+    "HUGGINGFACE_API_KEY": "test",
+})
+
+
+class FakeModel:
+    """Gemini GenerativeModel stand-in answering every prompt with reply(prompt)."""
+
+    def __init__(self, reply, delay: float = 0.0):
+        self.reply = reply
+        self.delay = delay
+        self.prompts = []
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        text = self.reply(prompt)
+        if isinstance(text, Exception):
+            raise text
+        if not stream:
+            return SimpleNamespace(text=text)
+
+        async def chunks():
+            for line in text.splitlines(keepends=True):
+                await asyncio.sleep(0)
+                yield SimpleNamespace(text=line)
+
+        return chunks()
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Install a FakeModel with an empty generation cache and no client-side quota."""
+    from lahacks_24.config import Config
+    from lahacks_24.utils import ai, ratelimit
+    from lahacks_24.utils.cache import LRUCache, SingleFlight, TieredCache
+
+    model = FakeModel(lambda prompt: "Front: What is a cell?\nBack: The unit of life.\n")
+    monkeypatch.setattr(ai, "_model", model)
+    monkeypatch.setattr(ai, "generation_cache", TieredCache(LRUCache(), name="llm"))
+    monkeypatch.setattr(ai, "_inflight", SingleFlight())
+    monkeypatch.setattr(Config, "LLM_RATE_LIMIT", 100000.0)
+    monkeypatch.setattr(Config, "LLM_RATE_BURST", 100000.0)
+    monkeypatch.setattr(Config, "LLM_RETRY_BACKOFF", 0.01)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    return model
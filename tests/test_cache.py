@@ -0,0 +1,225 @@
+"""Tests for the LRU and disk caches and single-flight call coalescing."""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from lahacks_24.utils.cache import DiskCache, LRUCache, SingleFlight, TieredCache, content_hash
+
+
+def test_content_hash_separates_parts():
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+    assert content_hash(b"page", "v1") == content_hash("page", "v1")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_lru_expires_entries(monkeypatch):
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disk_cache_round_trip(tmp_path):
+    key = content_hash("page")
+    DiskCache(str(tmp_path)).set(key, {"text": "mitochondria"})
+
+    # A new instance reads what an earlier process wrote
+    assert DiskCache(str(tmp_path)).get(key) == {"text": "mitochondria"}
+    assert DiskCache(str(tmp_path)).get(content_hash("other")) is None
+
+
+def test_disk_cache_expires_entries(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), ttl=10)
+    key = content_hash("page")
+    cache.set(key, "text")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+
+    assert cache.get(key) is None
+    assert not list(tmp_path.glob("*/*.json"))
+
+
+def age(cache: DiskCache, key: str, seconds: float) -> None:
+    """Make a cache file look written and last used the given seconds ago."""
+    then = time.time() - seconds
+    os.utime(cache._path(key), (then, then))
+
+
+def disk_usage(directory) -> int:
+    return sum(path.stat().st_size for path in directory.glob("*/*.json"))
+
+
+def test_disk_cache_prunes_least_recently_used_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    keys = [content_hash(str(index)) for index in range(5)]
+    for index, key in enumerate(keys):
+        cache.set(key, "x" * 60)
+        age(cache, key, 100 - index)
+    # The oldest file was read since, so it is kept over the next oldest
+    assert cache.get(keys[0]) == "x" * 60
+
+    cache.max_bytes = 200
+    cache.prune()
+
+    assert disk_usage(tmp_path) <= 200
+    assert cache.get(keys[0]) == "x" * 60
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[-1]) == "x" * 60
+
+
+def test_disk_cache_prunes_expired_files_first(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=50)
+    cache.set(content_hash("stale"), "x")
+    cache.set(content_hash("fresh"), "x")
+    age(cache, content_hash("stale"), 60)
+    age(cache, content_hash("fresh"), 40)
+    cache.prune()
+
+    assert [path.stem for path in tmp_path.glob("*/*.json")] == [content_hash("fresh")]
+
+
+def test_disk_cache_stays_within_its_size_on_every_write(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=500)
+    for index in range(20):
+        cache.set(content_hash(str(index)), "x" * 60)
+        assert disk_usage(tmp_path) <= 500
+    assert cache.get(content_hash("19")) == "x" * 60
+
+
+@pytest.mark.parametrize("value", ["text", {"cards": [["q", "a"]]}, [1, 2, 3]])
+def test_disk_cache_stores_json_values(tmp_path, value):
+    cache = DiskCache(str(tmp_path))
+    cache.set(content_hash("k"), value)
+    assert cache.get(content_hash("k")) == value
+
+
+def test_tiered_cache_promotes_disk_hits_to_memory(tmp_path):
+    disk = DiskCache(str(tmp_path))
+    disk.set(content_hash("page"), "text")
+    cache = TieredCache(LRUCache(), disk, name="test")
+
+    assert asyncio.run(cache.get(content_hash("page"))) == "text"
+    assert cache.memory.get(content_hash("page")) == "text"
+    assert asyncio.run(cache.get(content_hash("other"))) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_promoted_disk_hit_keeps_its_expiry(tmp_path, monkeypatch):
+    key = content_hash("page")
+    DiskCache(str(tmp_path), ttl=100).set(key, "text")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 60)
+    cache = TieredCache(LRUCache(ttl=100), DiskCache(str(tmp_path), ttl=100))
+    assert asyncio.run(cache.get(key)) == "text"
+
+    # Written 110 seconds ago: expired in memory too, not 100 seconds after the promotion
+    monkeypatch.setattr(time, "time", lambda: now + 110)
+    assert cache.memory.get(key) is None
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "cards"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["cards"] * 5
+    assert calls == 1
+    assert flight.coalesced == 4
+
+
+def test_single_flight_shares_the_leaders_error():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    # The failed call is not remembered; the next caller runs the work again
+    async def retry():
+        return await flight.do("key", lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(retry()) == "ok"
+
+
+def test_single_flight_waiter_takes_over_from_a_cancelled_leader():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return f"cards {calls}"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        # One waiter runs the work again and the other shares its result
+        return await asyncio.gather(*waiters), leader.cancelled()
+
+    assert asyncio.run(main()) == (["cards 2", "cards 2"], True)
+    assert calls == 2
+
+
+def test_single_flight_cancelled_waiter_does_not_cancel_the_leader():
+    flight = SingleFlight()
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", lambda: asyncio.sleep(0.05, result="cards")))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flight.do("key", lambda: asyncio.sleep(0.05, result="other")))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader, waiter.cancelled()
+
+    assert asyncio.run(main()) == ("cards", True)
+
+
+def test_single_flight_keys_are_independent():
+    flight = SingleFlight()
+
+    async def main():
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0.01, result=1)),
+            flight.do("b", lambda: asyncio.sleep(0.01, result=2)),
+        )
+
+    assert asyncio.run(main()) == [1, 2]
+    assert flight.coalesced == 0
@@ -0,0 +1,187 @@
+"""Tests for token-budgeted chunking, section packing and chunked generation."""
+
+import asyncio
+
+import pytest
+
+from lahacks_24.utils import ai
+from lahacks_24.utils.ratelimit import RateLimitError
+from lahacks_24.utils.chunking import (
+    SECTION_HEADER_TOKENS,
+    Section,
+    chunk_segments,
+    chunk_text,
+    estimate_tokens,
+    join_sections,
+    pack_sections,
+    section_source,
+)
+
+
+def segments(count: int, words: int = 5, seconds: float = 4.0):
+    return [{"text": " ".join(f"w{index}" for _ in range(words)), "start": index * seconds, "duration": seconds}
+            for index in range(count)]
+
+
+def test_estimate_tokens_rounds_up():
+    assert [estimate_tokens(text) for text in ("", "a", "abcd", "abcde")] == [0, 1, 1, 2]
+
+
+def test_chunks_fit_the_budget_and_keep_every_segment():
+    source = segments(100)
+    chunks = chunk_segments(source, max_tokens=50)
+
+    assert len(chunks) > 1
+    assert all(chunk.tokens <= 50 for chunk in chunks)
+    assert " ".join(chunk.text for chunk in chunks) == " ".join(segment["text"] for segment in source)
+    # Windows follow each other without gaps or overlap
+    assert chunks[0].start == 0.0 and chunks[-1].end == 400.0
+    assert all(previous.end == chunk.start for previous, chunk in zip(chunks, chunks[1:]))
+
+
+def test_oversized_segment_is_a_window_of_its_own():
+    source = segments(3)
+    source[1]["text"] = "x" * 400
+    chunks = chunk_segments(source, max_tokens=20)
+    assert [chunk.text for chunk in chunks] == [source[0]["text"], "x" * 400, source[2]["text"]]
+
+
+def test_empty_segments_are_skipped():
+    source = [{"text": "  ", "start": 0.0, "duration": 1.0}, {"text": "hello", "start": 1.0, "duration": 1.0}]
+    chunks = chunk_segments(source, max_tokens=100)
+    assert [(chunk.text, chunk.start, chunk.end) for chunk in chunks] == [("hello", 1.0, 2.0)]
+
+
+def test_max_seconds_starts_new_windows():
+    chunks = chunk_segments(segments(30, seconds=10.0), max_tokens=10_000, max_seconds=60)
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0.0, 60.0), (60.0, 120.0), (120.0, 180.0),
+                                                              (180.0, 240.0), (240.0, 300.0)]
+
+
+def test_chunk_text_splits_on_lines():
+    text = "\n".join(f"line number {index}" for index in range(20))
+    chunks = chunk_text(text, max_tokens=20)
+    assert "\n".join(chunks) == text
+    assert all(sum(estimate_tokens(line) + 1 for line in chunk.splitlines()) <= 20 for chunk in chunks)
+    assert chunk_text("short", max_tokens=20) == ["short"]
+
+
+def test_sections_are_packed_in_order_within_the_budget():
+    sections = [Section("x" * 40, (index * 10.0, index * 10.0 + 10)) for index in range(10)]
+    groups = pack_sections(sections, max_tokens=3 * (10 + SECTION_HEADER_TOKENS))
+
+    assert [len(group) for group in groups] == [3, 3, 3, 1]
+    assert [section for group in groups for section in group] == sections
+    assert pack_sections([Section("x" * 400)], max_tokens=10) == [[Section("x" * 400)]]
+
+
+def test_join_sections_numbers_each_section():
+    assert join_sections([Section("only")]) == "only"
+    assert join_sections([Section("a"), Section("b")]) == "[Section 1]\na\n\n[Section 2]\nb"
+
+
+@pytest.mark.parametrize("number, expected", [(1, (0.0, 10.0)), (2, (10.0, 20.0)), (None, (0.0, 20.0)),
+                                              (3, (0.0, 20.0)), (0, (0.0, 20.0))])
+def test_section_source(number, expected):
+    sections = [Section("a", (0.0, 10.0)), Section("b", (10.0, 20.0))]
+    assert section_source(sections, number) == expected
+
+
+def test_section_source_without_sources():
+    assert section_source([Section("a"), Section("b", (0.0, 1.0))], None) is None
+
+
+TOPICS = {
+    "a": ("Which organelle makes ATP?", "The mitochondrion."),
+    "b": ("Who proposed the heliocentric model?", "Nicolaus Copernicus."),
+    "c": ("What does a derivative measure?", "The instantaneous rate of change."),
+    "d": ("What is the capital of Peru?", "Lima."),
+    "shared": ("Which organelle makes ATP?", "The mitochondrion."),
+}
+
+
+def chunk_reply(prompt):
+    """One shared card plus one card of each chunk's topic; "broken" chunks fail."""
+    if "broken" in prompt:
+        return RuntimeError("Gemini failure")
+    front, back = TOPICS[prompt.rsplit("CHUNK ", 1)[1].split()[0]]
+    return f"Front: What is a cell?\nBack: The smallest unit of life.\nFront: {front}\nBack: {back}\n"
+
+
+async def collect(chunks):
+    return [result async for result in ai.generate_flashcards_chunked(
+        [f"CHUNK {chunk}" for chunk in chunks], ai.create_youtube_flashcard_prompt)]
+
+
+def test_chunked_generation_merges_and_deduplicates(gemini):
+    gemini.reply = chunk_reply
+    results = asyncio.run(collect(["a", "b", "shared"]))
+
+    assert sorted(result.index for result in results) == [0, 1, 2]
+    cards = [card for result in results for card in result.cards]
+    fronts = [front for front, _ in cards]
+    assert fronts.count("What is a cell?") == 1
+    assert fronts.count("Which organelle makes ATP?") == 1
+    assert len(cards) == 3
+    assert all(result.error is None for result in results)
+
+
+def test_failed_chunk_is_reported_with_its_error(gemini):
+    gemini.reply = chunk_reply
+    results = {result.index: result for result in asyncio.run(collect(["a", "broken", "b"]))}
+
+    assert results[1].cards == [] and "Gemini failure" in results[1].error
+    assert len(results[0].cards) + len(results[2].cards) == 3
+
+
+def test_chunks_are_generated_concurrently(gemini):
+    gemini.reply = chunk_reply
+    gemini.delay = 0.1
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await collect(["a", "b", "c", "d"])
+        return loop.time() - started
+
+    # Four chunks within LLM_MAX_CONCURRENCY run side by side
+    assert asyncio.run(main()) < 0.3
+
+
+@pytest.fixture
+def slow_chunks(monkeypatch):
+    """Chunks that take a second, except "limited" ones that are rate limited at once; returns the cancelled ones."""
+    cancelled = []
+
+    async def generate(chunk, build_prompt, force=False):
+        if "limited" in chunk:
+            raise RateLimitError("Gemini")
+        try:
+            await asyncio.sleep(0.05 if "fast" in chunk else 1.0)
+        except asyncio.CancelledError:
+            cancelled.append(chunk)
+            raise
+        return "Front: What is a cell?\nBack: The smallest unit of life.\n"
+
+    monkeypatch.setattr(ai, "generate_flashcards_cached", generate)
+    return cancelled
+
+
+def test_rate_limit_cancels_the_chunks_in_flight(slow_chunks):
+    async def main():
+        with pytest.raises(RateLimitError):
+            await collect(["slow-1", "limited", "slow-2"])
+        # Cancelled by the generator itself, not by asyncio.run shutting down
+        return sorted(slow_chunks)
+
+    assert asyncio.run(main()) == ["CHUNK slow-1", "CHUNK slow-2"]
+
+
+def test_consumer_stopping_early_cancels_the_remaining_chunks(slow_chunks):
+    async def main():
+        results = ai.generate_flashcards_chunked(["fast", "slow-1", "slow-2"], ai.create_youtube_flashcard_prompt)
+        first = await anext(results)
+        await results.aclose()
+        return first.index, sorted(slow_chunks)
+
+    assert asyncio.run(main()) == (0, ["slow-1", "slow-2"])
@@ -0,0 +1,105 @@
+"""Tests for headless batch generation and its checkpoint/resume."""
+
+import json
+import re
+
+import pytest
+
+from lahacks_24 import cli
+from lahacks_24.utils.ocr import PageResult
+
+VIDEOS = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+
+
+class Fetches(list):
+    """Fetched video IDs, with the set of videos that have no transcript."""
+
+    def __init__(self):
+        super().__init__()
+        self.unavailable = set()
+
+
+@pytest.fixture
+def transcripts(monkeypatch, gemini):
+    """Fake transcripts and a model making one card per video; returns the fetched video IDs."""
+    fetched = Fetches()
+
+    async def get_transcript_segments(video_id):
+        fetched.append(video_id)
+        if video_id in fetched.unavailable:
+            return None
+        return [{"text": f"lecture {video_id}", "start": 0.0, "duration": 60.0}]
+
+    def reply(prompt):
+        video_id = re.search(r"lecture (\w+)", prompt).group(1)
+        return f"Front: What is covered in {video_id}?\nBack: Lecture {video_id}\n"
+
+    monkeypatch.setattr(cli, "get_transcript_segments", get_transcript_segments)
+    gemini.reply = reply
+    return fetched
+
+
+def read_decks(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_interrupted_run_resumes_with_the_unfinished_items(tmp_path, transcripts):
+    output = tmp_path / "decks.jsonl"
+    argv = [arg for video in VIDEOS for arg in ("--video", video)] + ["--output", str(output)]
+    transcripts.unavailable.add("bbbbbbbbbbb")
+
+    assert cli.main(argv) == 1
+    assert [deck["video_id"] for deck in read_decks(output)] == ["aaaaaaaaaaa", "ccccccccccc"]
+    checkpoint = tmp_path / "decks.jsonl.checkpoint"
+    assert len(checkpoint.read_text().split()) == 2
+
+    # The next run only retries the failed video and appends its deck
+    transcripts.clear()
+    transcripts.unavailable.clear()
+    assert cli.main(argv) == 0
+    assert transcripts == ["bbbbbbbbbbb"]
+    decks = read_decks(output)
+    assert sorted(deck["video_id"] for deck in decks) == VIDEOS
+    assert decks[-1]["cards"] == [
+        {"front": "What is covered in bbbbbbbbbbb?", "back": "Lecture bbbbbbbbbbb", "span": [0.0, 60.0]}
+    ]
+
+    # Everything is done: nothing is fetched or written again
+    transcripts.clear()
+    assert cli.main(argv) == 0
+    assert transcripts == []
+    assert len(read_decks(output)) == 3
+
+
+def test_discover_videos_skips_duplicates_and_non_videos():
+    items = cli.discover_videos([VIDEOS[0], f"https://youtu.be/{VIDEOS[0]}", "not a video", VIDEOS[1]])
+    assert [item.video_id for item in items] == VIDEOS[:2]
+
+
+def test_note_folder_is_one_deck_unless_split_per_page(tmp_path):
+    folder = tmp_path / "week1"
+    folder.mkdir()
+    for name in ("2.jpg", "1.png", "notes.txt"):
+        (folder / name).write_bytes(name.encode())
+
+    [deck] = cli.discover_notes([str(folder)])
+    assert (deck.title, [page.name for page in deck.pages]) == ("week1", ["1.png", "2.jpg"])
+    assert [item.title for item in cli.discover_notes([str(folder)], page_per_deck=True)] == ["1.png", "2.jpg"]
+
+
+def test_notes_deck_records_the_pages_of_each_card(tmp_path, gemini, monkeypatch):
+    folder = tmp_path / "week1"
+    folder.mkdir()
+    (folder / "1.jpg").write_bytes(b"first")
+
+    async def recognize_pages(pages):
+        return [PageResult(index, "photosynthesis", 0.0) for index, _ in enumerate(pages)]
+
+    monkeypatch.setattr(cli, "recognize_pages", recognize_pages)
+    gemini.reply = lambda prompt: "Front: What is photosynthesis?\nBack: Making sugar from light\n"
+    output = tmp_path / "decks.jsonl"
+
+    assert cli.main(["--notes", str(folder), "--output", str(output)]) == 0
+    [deck] = read_decks(output)
+    assert (deck["kind"], deck["pages"]) == ("notes", ["1.jpg"])
+    assert deck["cards"][0]["span"] == [0, 1]
@@ -0,0 +1,61 @@
+"""Tests for prompt compaction of captions and OCR text."""
+
+import pytest
+
+from lahacks_24.utils.compaction import CompactionStats, clean_caption, compact_ocr_text, compact_segments
+
+
+@pytest.mark.parametrize("caption, expected", [
+    ("[Music]", ""),
+    ("so the cell [Applause] divides", "so the cell divides"),
+    ("um, the mitochondria uh makes energy", "the mitochondria makes energy"),
+    (">> SPEAKER: <i>welcome</i> back", "SPEAKER: welcome back"),
+    ("rock &amp; roll ♪♪", "rock & roll"),
+    ("an umbrella is not a filler word", "an umbrella is not a filler word"),
+])
+def test_clean_caption(caption, expected):
+    assert clean_caption(caption) == expected
+
+
+def segment(text, start, duration=2.0):
+    return {"text": text, "start": start, "duration": duration}
+
+
+def test_rolling_caption_overlap_is_removed():
+    compacted, stats = compact_segments([
+        segment("the cell membrane is made", 0.0),
+        segment("membrane is made of a lipid bilayer", 2.0),
+        segment("of a lipid bilayer", 4.0),
+        segment("with embedded proteins", 6.0),
+    ])
+
+    assert [item["text"] for item in compacted] == [
+        "the cell membrane is made", "of a lipid bilayer", "with embedded proteins",
+    ]
+    # The caption that only repeated earlier words extends the previous one
+    assert compacted[1]["start"] == 2.0 and compacted[1]["duration"] == 4.0
+    assert stats.tokens_after < stats.tokens_before
+
+
+def test_single_word_overlap_is_kept():
+    compacted, _ = compact_segments([segment("we said no", 0.0), segment("no means no", 2.0)])
+    assert [item["text"] for item in compacted] == ["we said no", "no means no"]
+
+
+def test_tag_only_segments_are_dropped():
+    compacted, _ = compact_segments([segment("[Music]", 0.0), segment("hello class", 2.0)])
+    assert compacted == [segment("hello class", 2.0)]
+
+
+def test_compact_ocr_text():
+    text = "Photosynthesis\nPhotosynthesis\n~ . ,\nlight ----- energy!!!\n\n  chlorophyll   absorbs  "
+    compacted, stats = compact_ocr_text(text)
+    assert compacted == "Photosynthesis\nlight - energy!\nchlorophyll absorbs"
+    assert stats.saved > 0
+
+
+def test_compaction_stats():
+    stats = CompactionStats(tokens_before=200, tokens_after=150)
+    assert (stats.saved, stats.reduction) == (50, 0.25)
+    assert str(stats) == "200 -> 150 tokens (-25%)"
+    assert CompactionStats().reduction == 0.0
@@ -0,0 +1,101 @@
+"""Tests for near-duplicate flashcard removal."""
+
+import random
+import string
+
+import pytest
+
+from lahacks_24.utils.dedup import CardDeduplicator, dedup_cards, normalize_card_text, shingles
+
+
+def test_normalize_card_text():
+    assert normalize_card_text("  What is  DNA?! ") == "what is dna"
+
+
+def test_shingles_of_short_text():
+    assert shingles("ab") == {"ab"}
+    assert shingles("") == set()
+    assert shingles("abcd") == {"abc", "bcd"}
+
+
+def test_exact_and_reworded_repeats_are_removed():
+    cards = [
+        ("What is the capital of France?", "Paris"),
+        ("what is the capital of France", "Paris"),
+        ("What's the capital of France?", "Paris, on the Seine"),
+        ("What is photosynthesis?", "Plants turning light into chemical energy"),
+    ]
+    kept, removed = dedup_cards(cards)
+    assert kept == [cards[0], cards[3]]
+    assert removed == 2
+
+
+def test_templated_questions_with_different_answers_are_kept():
+    cards = [
+        ("What is the derivative of sin(x)?", "cos(x)"),
+        ("What is the derivative of cos(x)?", "-sin(x)"),
+        ("What is the derivative of tan(x)?", "sec^2(x)"),
+    ]
+    kept, removed = dedup_cards(cards)
+    assert kept == cards
+    assert removed == 0
+
+
+def test_without_backs_only_fronts_are_compared():
+    deduplicator = CardDeduplicator()
+    assert deduplicator.add("What is the capital of France?", "Paris")
+    assert deduplicator.is_duplicate("What is the capital of France?")
+    assert not deduplicator.is_duplicate("What is the capital of France?", "Lyon")
+    assert not deduplicator.is_duplicate("Who wrote Hamlet?")
+
+
+def test_is_duplicate_does_not_add():
+    deduplicator = CardDeduplicator()
+    assert not deduplicator.is_duplicate("Who wrote Hamlet?", "Shakespeare")
+    assert deduplicator.add("Who wrote Hamlet?", "Shakespeare")
+    assert deduplicator.kept == 1
+
+
+def test_fronts_without_words_are_always_kept():
+    cards = [
+        ("∑ → ?", "Sum to a limit"), ("∫ ≈ ?", "Area under a curve"), ("?!", "Surprise"), ("Real question", "Real answer"),
+    ]
+    kept, removed = dedup_cards(cards)
+    # Symbols-only fronts normalize to nothing and cannot be told apart, so none is a duplicate
+    assert kept == cards
+    assert removed == 0
+
+
+def test_deduplicator_is_shared_across_batches():
+    deduplicator = CardDeduplicator()
+    first = deduplicator.filter([("What is an enzyme?", "A biological catalyst")])
+    second = deduplicator.filter([
+        ("What is an enzyme?", "A biological catalyst."),
+        ("What is a ribosome?", "Where proteins are made"),
+    ])
+    assert len(first) == 1
+    assert second == [("What is a ribosome?", "Where proteins are made")]
+    assert (deduplicator.kept, deduplicator.removed) == (2, 1)
+
+
+def test_threshold_controls_what_counts_as_similar():
+    cards = [("Define the term kinetic energy", "Energy of motion"), ("Define kinetic energy", "Energy of motion")]
+    assert dedup_cards(cards, threshold=0.5)[1] == 1
+    assert dedup_cards(cards, threshold=0.95)[1] == 0
+
+
+def test_bands_must_divide_signature_length():
+    with pytest.raises(ValueError):
+        CardDeduplicator(num_perm=64, bands=10)
+
+
+def test_large_deck_keeps_distinct_cards():
+    rng = random.Random(0)
+
+    def words(count):
+        return " ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(count))
+
+    cards = [(words(5) + "?", words(4)) for _ in range(500)]
+    kept, removed = dedup_cards(cards + cards[:50])
+    assert len(kept) == 500
+    assert removed == 50
@@ -0,0 +1,92 @@
+"""Tests for the flashcard generation cache."""
+
+import asyncio
+
+from lahacks_24.utils import ai
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_generation_key_ignores_whitespace_but_not_the_prompt():
+    key = ai.generation_key(ai.create_flashcard_prompt, "Cells  are\nthe unit of life")
+    assert key == ai.generation_key(ai.create_flashcard_prompt, " Cells are the unit of life ")
+    assert key != ai.generation_key(ai.create_youtube_flashcard_prompt, "Cells are the unit of life")
+    assert key != ai.generation_key(ai.create_flashcard_prompt, "Cells are the unit of energy")
+
+
+def test_repeated_generation_is_served_from_the_cache(gemini):
+    async def main():
+        first = await ai.generate_flashcards_cached("notes", ai.create_flashcard_prompt)
+        second = await ai.generate_flashcards_cached("notes", ai.create_flashcard_prompt)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert len(gemini.prompts) == 1
+    assert ai.generation_stats()["hits"] == 1
+
+
+def test_force_skips_the_cache(gemini):
+    async def main():
+        await ai.generate_flashcards_cached("notes", ai.create_flashcard_prompt)
+        await ai.generate_flashcards_cached("notes", ai.create_flashcard_prompt, force=True)
+
+    asyncio.run(main())
+    assert len(gemini.prompts) == 2
+
+
+def test_concurrent_identical_generations_share_one_request(gemini):
+    gemini.delay = 0.05
+
+    async def main():
+        return await asyncio.gather(*(ai.generate_flashcards_cached("notes", ai.create_flashcard_prompt)
+                                      for _ in range(4)))
+
+    assert len(set(asyncio.run(main()))) == 1
+    assert len(gemini.prompts) == 1
+    assert ai.generation_stats()["coalesced"] == 3
+
+
+def test_streamed_generation_is_cached_whole(gemini):
+    async def main():
+        streamed = await collect(ai.stream_flashcards_cached("notes", ai.create_flashcard_prompt))
+        cached = await collect(ai.stream_flashcards_cached("notes", ai.create_flashcard_prompt))
+        return streamed, cached
+
+    streamed, cached = asyncio.run(main())
+    assert len(streamed) == 2
+    assert cached == ["".join(streamed)]
+    assert len(gemini.prompts) == 1
+
+
+def test_waiter_receives_a_streaming_leaders_text(gemini):
+    gemini.delay = 0.05
+
+    async def main():
+        return await asyncio.gather(
+            collect(ai.stream_flashcards_cached("notes", ai.create_flashcard_prompt)),
+            collect(ai.stream_flashcards_cached("notes", ai.create_flashcard_prompt)),
+        )
+
+    leader, waiter = asyncio.run(main())
+    assert waiter == ["".join(leader)]
+    assert len(gemini.prompts) == 1
+
+
+def test_waiter_generates_itself_when_the_streaming_leader_stops(gemini):
+    gemini.delay = 0.05
+
+    async def main():
+        leader = asyncio.create_task(collect(ai.stream_flashcards_cached("notes", ai.create_flashcard_prompt)))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(collect(ai.stream_flashcards_cached("notes", ai.create_flashcard_prompt)))
+        await asyncio.sleep(0.01)
+        # E.g. the leader's job was cancelled from the UI
+        leader.cancel()
+        return await waiter
+
+    waiter = asyncio.run(main())
+    assert "".join(waiter).startswith("Front:")
+    assert len(gemini.prompts) == 2
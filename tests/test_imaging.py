@@ -0,0 +1,148 @@
+"""Tests for image preprocessing: binarization, line segmentation and normalization."""
+
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from lahacks_24.utils import imaging
+from lahacks_24.utils.imaging import binarize, find_text_lines, normalize_image, normalize_images, segment_lines
+
+LINE_TOPS = (40, 120, 200)
+LINE_HEIGHT = 30
+
+
+def page(width: int = 600, height: int = 280, seed: int = 0) -> np.ndarray:
+    """Noisy paper with three dark, text-like bands."""
+    rng = np.random.default_rng(seed)
+    pixels = np.full((height, width), 225, dtype=np.uint8) + rng.integers(0, 20, (height, width), dtype=np.uint8)
+    for top in LINE_TOPS:
+        ink = rng.random((LINE_HEIGHT, width - 100)) < 0.4
+        pixels[top:top + LINE_HEIGHT, 50:width - 50][ink] = 20
+    return pixels
+
+
+def encode(pixels: np.ndarray, format: str = "PNG") -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def test_binarize_separates_ink_from_paper():
+    pixels = page()
+    ink = binarize(pixels)
+    assert ink[pixels == 20].all()
+    assert not ink[pixels >= 225].any()
+
+
+def test_binarize_handles_a_blank_page():
+    assert binarize(np.full((50, 50), 255, dtype=np.uint8)).dtype == bool
+
+
+def test_find_text_lines_returns_one_box_per_line():
+    boxes = find_text_lines(binarize(page()))
+
+    assert len(boxes) == len(LINE_TOPS)
+    for (top, bottom, left, right), line_top in zip(boxes, LINE_TOPS):
+        # Each box covers its line with a little padding, ordered top to bottom
+        assert top <= line_top and bottom >= line_top + LINE_HEIGHT
+        assert bottom - top < LINE_HEIGHT * 2
+        assert left <= 50 and right >= 550
+
+
+def test_thin_marks_are_not_lines():
+    pixels = np.full((200, 400), 240, dtype=np.uint8)
+    pixels[100:103, 20:380] = 0  # A ruled line, 3 pixels high
+    assert find_text_lines(binarize(pixels), min_height=8) == []
+
+
+def test_segment_lines_returns_png_crops_in_reading_order():
+    crops = segment_lines(encode(page()), max_side=2000)
+
+    assert len(crops) == len(LINE_TOPS)
+    images = [Image.open(io.BytesIO(crop)) for crop in crops]
+    assert all(image.format == "PNG" and image.mode == "L" for image in images)
+    assert all(image.width > image.height for image in images)
+
+
+def test_segment_lines_downsizes_large_pages():
+    crops = segment_lines(encode(page(width=1200, height=560)), max_side=600, min_height=4)
+    assert all(Image.open(io.BytesIO(crop)).width <= 600 for crop in crops)
+
+
+def test_blank_page_has_no_lines():
+    assert segment_lines(encode(np.full((300, 300), 250, dtype=np.uint8))) == []
+
+
+def test_undecodable_data_raises_os_error():
+    with pytest.raises(OSError):
+        segment_lines(b"%PDF-1.7 not an image")
+
+
+def photo(width: int = 800, height: int = 600, orientation: int = 1) -> bytes:
+    """Color JPEG with an EXIF orientation tag, like a phone camera writes."""
+    image = Image.new("RGB", (width, height), (200, 180, 160))
+    image.paste((20, 20, 20), (0, 0, width // 4, height // 4))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def image_pool():
+    """Shut the worker processes down after the test."""
+    yield
+    if imaging._pool is not None:
+        imaging._pool.shutdown()
+        imaging._pool = None
+
+
+def test_normalize_image_outputs_small_grayscale_jpeg():
+    normalized = normalize_image(photo(), max_side=384)
+
+    with Image.open(io.BytesIO(normalized)) as image:
+        assert (image.format, image.mode) == ("JPEG", "L")
+        assert image.size == (384, 288)
+    assert len(normalized) < len(photo())
+
+
+def test_normalize_image_applies_exif_orientation():
+    # Orientation 6: the camera was turned 90 degrees, the pixels were not
+    with Image.open(io.BytesIO(normalize_image(photo(orientation=6), max_side=400))) as image:
+        assert image.size == (300, 400)
+        # The dark top-left corner is now in the top-right
+        assert image.getpixel((image.width - 10, 10)) < 60
+        assert image.getpixel((10, 10)) > 120
+
+
+def test_normalize_image_never_upscales():
+    with Image.open(io.BytesIO(normalize_image(photo(200, 100), max_side=384))) as image:
+        assert image.size == (200, 100)
+
+
+def test_normalize_images_reads_stored_files_in_worker_processes(tmp_path, image_pool):
+    paths = []
+    for index, size in enumerate([(800, 600), (600, 800), (1000, 200)]):
+        path = tmp_path / f"page{index}.jpg"
+        path.write_bytes(photo(*size))
+        paths.append(path)
+
+    normalized = asyncio.run(normalize_images(paths, max_side=100, workers=2))
+
+    sizes = [Image.open(io.BytesIO(data)).size for data in normalized]
+    assert sizes == [(100, 75), (75, 100), (100, 20)]
+
+
+def test_undecodable_upload_does_not_fail_the_other_pages(tmp_path, image_pool):
+    good, corrupt = tmp_path / "page.jpg", tmp_path / "scan.pdf"
+    good.write_bytes(photo())
+    corrupt.write_bytes(b"%PDF-1.7 not an image")
+
+    normalized = asyncio.run(normalize_images([corrupt, good], max_side=100, workers=1))
+
+    assert normalized[0] is None
+    assert Image.open(io.BytesIO(normalized[1])).size == (100, 75)
@@ -0,0 +1,182 @@
+"""Tests for the background job queue."""
+
+import asyncio
+
+import pytest
+
+from lahacks_24.utils.jobs import CANCELLED, DONE, FAILED, RUNNING, Job, JobBackend, JobLimitError, JobQueue
+
+
+async def until_finished(job: Job, timeout: float = 2.0) -> Job:
+    """Follow a job's changes, as the UI does, until it has finished."""
+    async def follow():
+        version = job.version
+        while not job.finished:
+            version = await job.wait_for_change(version)
+
+    await asyncio.wait_for(follow(), timeout)
+    return job
+
+
+def test_job_runs_and_publishes_progress_and_cards():
+    async def runner(job):
+        job.set_stage("generate", total=2)
+        job.advance("generate")
+        job.add_cards([("Q1", "A1")], [(0.0, 60.0)])
+        job.advance("generate")
+        job.add_cards([("Q2", "A2")])
+
+    async def main():
+        queue = JobQueue(workers=1, max_jobs_per_user=1)
+        return await until_finished(await queue.submit("alice", "video", runner))
+
+    job = asyncio.run(main())
+    assert job.status == DONE
+    assert job.progress["generate"] == (2, 2)
+    assert job.cards == [("Q1", "A1"), ("Q2", "A2")]
+    assert job.spans == [(0.0, 60.0), None]
+
+
+def test_submit_returns_before_the_job_runs():
+    started = asyncio.Event()
+
+    async def runner(job):
+        started.set()
+        await asyncio.sleep(0.05)
+
+    async def main():
+        queue = JobQueue(workers=1, max_jobs_per_user=1)
+        job = await queue.submit("alice", "notes", runner)
+        assert not started.is_set()
+        await until_finished(job)
+        return job
+
+    assert asyncio.run(main()).status == DONE
+
+
+def test_per_user_cap_rejects_extra_jobs():
+    async def main():
+        gate = asyncio.Event()
+
+        async def runner(job):
+            await gate.wait()
+
+        queue = JobQueue(workers=4, max_jobs_per_user=2)
+        first = await queue.submit("alice", "notes", runner)
+        await queue.submit("alice", "notes", runner)
+        with pytest.raises(JobLimitError):
+            await queue.submit("alice", "notes", runner)
+        # Other users have their own allowance
+        await queue.submit("bob", "notes", runner)
+
+        gate.set()
+        await until_finished(first)
+        await asyncio.sleep(0.01)
+        # A finished job frees a slot
+        return await queue.submit("alice", "notes", runner)
+
+    assert asyncio.run(main()).user_id == "alice"
+
+
+def test_running_job_can_be_cancelled():
+    async def main():
+        queue = JobQueue(workers=1, max_jobs_per_user=1)
+
+        async def runner(job):
+            await asyncio.sleep(10)
+
+        job = await queue.submit("alice", "notes", runner)
+        while job.status != RUNNING:
+            await job.wait_for_change(job.version, 1)
+        assert queue.cancel(job.id)
+        await until_finished(job)
+        assert not queue.cancel(job.id)
+        return job
+
+    assert asyncio.run(main()).status == CANCELLED
+
+
+def test_queued_job_is_cancelled_without_running():
+    ran = []
+
+    async def main():
+        queue = JobQueue(workers=1, max_jobs_per_user=2)
+        gate = asyncio.Event()
+
+        async def blocker(job):
+            await gate.wait()
+
+        async def runner(job):
+            ran.append(job.id)
+
+        first = await queue.submit("alice", "notes", blocker)
+        queued = await queue.submit("alice", "notes", runner)
+        assert queue.cancel(queued.id)
+        gate.set()
+        await until_finished(first)
+        await asyncio.sleep(0.01)
+        return queued
+
+    assert asyncio.run(main()).status == CANCELLED
+    assert ran == []
+
+
+def test_failed_job_records_the_error_and_logs_its_traceback(capsys):
+    async def recognize_pages(job):
+        raise ValueError("no text found")
+
+    async def main():
+        queue = JobQueue(workers=1, max_jobs_per_user=1)
+        return await until_finished(await queue.submit("alice", "notes", recognize_pages))
+
+    job = asyncio.run(main())
+    assert (job.status, job.error) == (FAILED, "no text found")
+    logged = capsys.readouterr().err
+    assert "Traceback" in logged and "in recognize_pages" in logged
+
+
+def test_wait_for_change_returns_the_new_version():
+    async def main():
+        job = Job(id="1", user_id="alice", kind="notes")
+        version = job.version
+
+        async def change():
+            await asyncio.sleep(0.01)
+            job.set_stage("ocr", total=3)
+
+        task = asyncio.create_task(change())
+        new_version = await job.wait_for_change(version, timeout=1)
+        await task
+        return version, new_version
+
+    version, new_version = asyncio.run(main())
+    assert new_version > version
+
+
+def test_wait_for_change_does_not_miss_an_earlier_change():
+    async def main():
+        job = Job(id="1", user_id="alice", kind="notes")
+        version = job.version
+        job.advance("ocr")
+        # Already changed since version: returns without waiting
+        return await job.wait_for_change(version, timeout=0.01), job.version
+
+    seen, current = asyncio.run(main())
+    assert seen == current
+
+
+def test_wait_for_change_times_out_unchanged():
+    async def main():
+        job = Job(id="1", user_id="alice", kind="notes")
+        return await job.wait_for_change(job.version, timeout=0.01)
+
+    assert asyncio.run(main()) == 0
+
+
+def test_backend_must_implement_put_and_get():
+    class Incomplete(JobBackend):
+        async def put(self, job, runner):
+            pass
+
+    with pytest.raises(TypeError, match="get"):
+        Incomplete()
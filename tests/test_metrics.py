@@ -0,0 +1,82 @@
+"""Tests for the in-process metrics and their Prometheus text export."""
+
+import json
+
+import pytest
+
+from lahacks_24.config import Config
+from lahacks_24.utils.metrics import Registry, set_trace_id, span
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter_renders_one_line_per_label_set(registry):
+    counter = registry.counter("soru_test_total", "Things counted")
+    counter.inc(stage="ocr")
+    counter.inc(2, stage="generate")
+    counter.inc(stage="ocr")
+
+    assert counter.value(stage="ocr") == 2
+    assert registry.render() == (
+        "# HELP soru_test_total Things counted\n"
+        "# TYPE soru_test_total counter\n"
+        'soru_test_total{stage="generate"} 2\n'
+        'soru_test_total{stage="ocr"} 2\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = registry.histogram("soru_test_seconds", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="ocr")
+
+    assert registry.render() == (
+        "# TYPE soru_test_seconds histogram\n"
+        'soru_test_seconds_bucket{stage="ocr",le="0.1"} 2\n'
+        'soru_test_seconds_bucket{stage="ocr",le="1"} 3\n'
+        'soru_test_seconds_bucket{stage="ocr",le="+Inf"} 4\n'
+        'soru_test_seconds_sum{stage="ocr"} 3.65\n'
+        'soru_test_seconds_count{stage="ocr"} 4\n'
+    )
+
+
+def test_label_values_are_escaped(registry):
+    registry.counter("soru_test_total").inc(error='Bad "quote"\\n')
+    assert 'soru_test_total{error="Bad \\"quote\\"\\\\n"} 1' in registry.render()
+
+
+def test_metrics_are_sorted_by_name_and_unlabelled_values_have_no_braces(registry):
+    registry.counter("soru_b_total").inc()
+    registry.counter("soru_a_total").inc(3)
+
+    lines = registry.render().splitlines()
+    assert lines == ["# TYPE soru_a_total counter", "soru_a_total 3", "# TYPE soru_b_total counter", "soru_b_total 1"]
+
+
+def test_a_name_keeps_its_metric_type(registry):
+    assert registry.counter("soru_test") is registry.counter("soru_test")
+    with pytest.raises(ValueError, match="already registered as a counter"):
+        registry.histogram("soru_test")
+
+
+def test_span_records_latency_errors_and_trace(monkeypatch, capsys):
+    from lahacks_24.utils.metrics import stage_errors, stage_seconds
+
+    monkeypatch.setattr(Config, "METRICS_TRACE", True)
+    _, _, before = stage_seconds.snapshot(stage="test_span")
+    set_trace_id("job-1")
+
+    with pytest.raises(KeyError):
+        with span("test_span"):
+            raise KeyError("missing")
+    set_trace_id(None)
+
+    assert stage_seconds.snapshot(stage="test_span")[2] == before + 1
+    assert stage_errors.value(stage="test_span", error="KeyError") >= 1
+    record = json.loads(capsys.readouterr().out)
+    assert (record["event"], record["stage"], record["error"], record["trace_id"]) == (
+        "span", "test_span", "KeyError", "job-1",
+    )
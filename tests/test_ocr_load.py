@@ -0,0 +1,123 @@
+"""Load tests of the OCR client against a stub TrOCR server on localhost."""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from fakes import StubOCRServer  # noqa: E402
+
+from lahacks_24.config import Config  # noqa: E402
+from lahacks_24.utils import ocr, ratelimit  # noqa: E402
+
+LATENCY = 0.2
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = StubOCRServer(LATENCY).start()
+    monkeypatch.setattr(Config, "HUGGINGFACE_API_URL", server.url)
+    monkeypatch.setattr(Config, "OCR_BACKEND", "remote")
+    monkeypatch.setattr(Config, "OCR_SEGMENT_LINES", False)
+    monkeypatch.setattr(Config, "OCR_MAX_CONCURRENCY", 8)
+    monkeypatch.setattr(Config, "OCR_RETRY_BACKOFF", 0.01)
+    monkeypatch.setattr(Config, "OCR_RATE_LIMIT", 100000.0)
+    monkeypatch.setattr(Config, "OCR_RATE_BURST", 100000.0)
+    # The client, gate and limiter attach to the event loop of the first request
+    monkeypatch.setattr(ocr, "_client", None)
+    monkeypatch.setattr(ocr, "_semaphore", None)
+    monkeypatch.setattr(ocr, "_backend", None)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    yield server
+    server.stop()
+
+
+def pages(session: int, count: int):
+    """Distinct page payloads, so nothing is served from the OCR cache."""
+    return [f"{time.time()}:{session}:{page}".encode().ljust(10_000, b"x") for page in range(count)]
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await ocr.close_client()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_sessions_do_not_serialize(stub):
+    sessions = [pages(session, 4) for session in range(4)]
+
+    async def main():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(ocr.extract_text_from_images(session) for session in sessions))
+        return results, time.perf_counter() - started
+
+    results, wall = run(main())
+
+    assert all(result.text for session in results for result in session)
+    assert stub.requests == 16
+    # 16 requests through 8 slots take two rounds, not 16 round trips in a row
+    assert stub.peak_in_flight == Config.OCR_MAX_CONCURRENCY
+    assert wall < 6 * LATENCY
+    # Requests share pooled keep-alive connections
+    assert stub.connections <= Config.OCR_MAX_CONCURRENCY
+
+
+def test_event_loop_keeps_running_during_requests(stub):
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await ocr.extract_text_from_images(pages(0, 2), concurrency=1)
+        ticker.cancel()
+        return ticks
+
+    # Two requests one after another leave the loop free for about 2 x LATENCY
+    assert run(main()) >= 10
+
+
+def test_model_loading_responses_are_retried(stub):
+    stub.fail_first = 2
+
+    results = run(ocr.extract_text_from_images(pages(0, 1)))
+
+    assert results[0].text == "page of 10000 bytes"
+    assert (stub.requests, stub.errors) == (3, 2)
+
+
+def test_failed_page_does_not_abort_the_batch(stub, monkeypatch):
+    monkeypatch.setattr(Config, "OCR_MAX_RETRIES", 0)
+    stub.fail_first = 1
+
+    results = run(ocr.extract_text_from_images(pages(0, 3), concurrency=1))
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert results[0].text is None
+    assert all(result.text for result in results[1:])
+
+
+def test_rate_limited_page_does_not_abort_the_batch(stub, monkeypatch):
+    monkeypatch.setattr(Config, "OCR_MAX_RETRIES", 1)
+    stub.fail_status = 429
+    stub.fail_first = 2
+    done = []
+
+    results = run(ocr.extract_text_from_images(pages(0, 3), concurrency=1, on_page=done.append))
+
+    # The first page got 429 on its request and its one retry; the others were recognized
+    assert [result.text for result in results] == [None, "page of 10000 bytes", "page of 10000 bytes"]
+    assert (stub.requests, stub.errors) == (4, 2)
+    assert len(done) == 3
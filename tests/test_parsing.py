@@ -0,0 +1,147 @@
+"""Tests for the flashcard parser, including a fuzz run over a corpus of model outputs."""
+
+import json
+import os
+import random
+from pathlib import Path
+
+import pytest
+
+from lahacks_24.utils.parsing import (
+    LABEL_PATTERN,
+    FlashcardParser,
+    parse_flashcards,
+    parse_tagged_flashcards,
+)
+
+CORPUS = Path(__file__).resolve().parent / "fuzz" / "parser_corpus"
+EXPECTED = json.loads((CORPUS / "expected.json").read_text(encoding="utf-8"))
+SAMPLES = sorted(EXPECTED)
+
+# Mutated variants checked per corpus file; raise for a longer local fuzz run
+FUZZ_ITERATIONS = int(os.getenv("PARSER_FUZZ_ITERATIONS", "200"))
+
+# Lines a model plausibly emits between or inside cards
+NOISE_LINES = [
+    "", "Front:", "Back:", "**Front:**", "Back: ", "Section: 9", "Section:", "1.", "-", "```", "```markdown",
+    "Here are your flashcards:", "---", "**", "Answer: 42", "QUESTION: why?", "Front: Back:", "Back: Front:",
+    "\t", "•", "# Front", "Section: [Section 2]", "ほかの言語", "Back:: double colon",
+]
+
+
+def read(name: str) -> str:
+    return (CORPUS / name).read_text(encoding="utf-8")
+
+
+def parse_streamed(text: str, splits):
+    """Parse text fed in pieces cut at the given offsets; returns the cards and skipped count."""
+    parser = FlashcardParser()
+    cards = []
+    previous = 0
+    for offset in sorted(splits) + [len(text)]:
+        cards += parser.feed_tagged(text[previous:offset])
+        previous = offset
+    cards += parser.close_tagged()
+    return cards, parser.skipped
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    """Apply a few random line- and character-level edits to a model output."""
+    lines = text.split("\n")
+    for _ in range(rng.randint(1, 4)):
+        operation = rng.randrange(8)
+        index = rng.randrange(len(lines)) if lines else 0
+        if operation == 0 and lines:
+            del lines[index]
+        elif operation == 1 and lines:
+            lines.insert(index, lines[index])
+        elif operation == 2:
+            lines.insert(index, rng.choice(NOISE_LINES))
+        elif operation == 3 and len(lines) > 1:
+            index = min(index, len(lines) - 2)
+            lines[index], lines[index + 1] = lines[index + 1], lines[index]
+        elif operation == 4 and len(lines) > 1:
+            index = min(index, len(lines) - 2)
+            lines[index:index + 2] = [lines[index] + " " + lines[index + 1]]
+        elif operation == 5 and lines:
+            lines[index] = rng.choice([str.upper, str.lower, str.swapcase])(lines[index])
+        elif operation == 6 and lines:
+            line = lines[index]
+            cut = rng.randint(0, len(line))
+            lines[index] = line[:cut] + rng.choice("*_:#-\r\t ") + line[cut:]
+        else:
+            joined = "\n".join(lines)
+            lines = joined[:rng.randint(0, len(joined))].split("\n")
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_corpus_sample_parses_as_expected(name):
+    parser = FlashcardParser()
+    cards = parse_tagged_flashcards(read(name), parser)
+
+    expected = EXPECTED[name]
+    assert [list(card) for card in cards] == expected["cards"]
+    assert parser.skipped == expected["skipped"]
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_corpus_sample_streams_like_a_whole_parse(name):
+    text = read(name)
+    whole = parse_tagged_flashcards(text)
+    # Every single-character chunk boundary, as in the slowest possible stream
+    assert parse_streamed(text, range(1, len(text)))[0] == whole
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_fuzzed_corpus_sample_keeps_parser_invariants(name):
+    rng = random.Random(name)
+    for _ in range(FUZZ_ITERATIONS):
+        text = mutate(read(name), rng)
+
+        parser = FlashcardParser()
+        cards = parse_tagged_flashcards(text, parser)
+
+        for front, back, section in cards:
+            assert front and back
+            assert front == front.strip() and back == back.strip()
+            assert "\n" not in front and "\n" not in back
+            assert section is None or section >= 0
+        fronts = sum(
+            1 for line in text.split("\n")
+            if (match := LABEL_PATTERN.match(line.strip())) and match.group(1).lower() in ("front", "question")
+        )
+        assert len(cards) <= fronts
+
+        splits = rng.sample(range(1, len(text)), min(5, max(0, len(text) - 1))) if len(text) > 1 else []
+        assert parse_streamed(text, splits) == (cards, parser.skipped), text
+        assert parse_flashcards(text) == [(front, back) for front, back, _ in cards]
+
+
+def test_odd_line_count_does_not_discard_the_generation():
+    text = "Front: A?\nBack: a\nFront: B?\nBack: b\nFront: C?"
+    parser = FlashcardParser()
+    assert parse_flashcards(text, parser) == [("A?", "a"), ("B?", "b")]
+    assert parser.skipped == 1
+
+
+def test_card_is_emitted_once_it_cannot_grow():
+    parser = FlashcardParser()
+    assert parser.feed("Front: A?\nBack: first line\n") == []
+    # A line is only read once its newline has arrived
+    assert parser.feed("second line\nFront: B?") == []
+    assert parser.feed("\nBack: b") == [("A?", "first line second line")]
+    assert parser.feed("\n\n") == [("B?", "b")]
+    assert parser.close() == []
+
+
+def test_section_tags_only_follow_a_back():
+    text = "Section: 4\nFront: A?\nSection: 5\nBack: a\nSection: 6\nSection: 7\n"
+    assert parse_tagged_flashcards(text) == [("A?", "a", 7)]
+
+
+def test_parser_is_reusable_after_close():
+    parser = FlashcardParser()
+    assert parser.feed("Front: A?\nBack: a") == []
+    assert parser.close() == [("A?", "a")]
+    assert parse_flashcards("Front: B?\nBack: b", parser) == [("B?", "b")]
@@ -0,0 +1,163 @@
+"""Tests for incremental deck updates of re-uploaded note pages."""
+
+import asyncio
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from lahacks_24 import pipeline
+from lahacks_24.config import Config
+from lahacks_24.pipeline import (
+    _diff_pages,
+    _find_previous_deck,
+    notes_source_hash,
+    page_sections,
+    recognize_pages,
+    run_notes_job,
+)
+from lahacks_24.utils import imaging, ocr, storage
+from lahacks_24.utils.cache import LRUCache, TieredCache
+from lahacks_24.utils.jobs import Job
+from lahacks_24.utils.ocr import OCRBackend, PageResult
+from lahacks_24.utils.storage import Deck, SQLiteDeckStore
+from lahacks_24.utils.uploads import StoredUpload
+
+
+def upload(*hashes: str):
+    return [StoredUpload(Path(f"{page_hash}.jpg"), page_hash, 100) for page_hash in hashes]
+
+
+def deck(cards, spans, pages, user_id="alice"):
+    return Deck(1, user_id, "source", "Notebook", [(front, f"{front} answer") for front in cards], spans=spans,
+                pages=list(pages))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = SQLiteDeckStore()
+    store.create_schema()
+    monkeypatch.setattr(storage, "_store", store)
+    return store
+
+
+def test_unchanged_pages_keep_every_card():
+    previous = deck(["A", "B"], [(0, 1), (1, 2)], ["p1", "p2"])
+    kept, redo = _diff_pages(previous, upload("p1", "p2"))
+
+    assert kept == [(("A", "A answer"), (0, 1)), (("B", "B answer"), (1, 2))]
+    assert redo == []
+
+
+def test_added_pages_are_generated_and_moved_cards_follow_their_page():
+    previous = deck(["A", "B"], [(0, 1), (1, 2)], ["p1", "p2"])
+    kept, redo = _diff_pages(previous, upload("p0", "p2", "p1"))
+
+    assert kept == [(("A", "A answer"), (2, 3)), (("B", "B answer"), (1, 2))]
+    assert redo == [0]
+
+
+def test_changed_page_drops_its_cards():
+    previous = deck(["A", "B"], [(0, 1), (1, 2)], ["p1", "p2"])
+    kept, redo = _diff_pages(previous, upload("p1", "p2-edited"))
+
+    assert kept == [(("A", "A answer"), (0, 1))]
+    assert redo == [1]
+
+
+def test_card_spanning_a_removed_page_regenerates_its_remaining_page():
+    previous = deck(["A", "AB"], [(0, 1), (0, 2)], ["p1", "p2"])
+    kept, redo = _diff_pages(previous, upload("p1"))
+
+    assert kept == [(("A", "A answer"), (0, 1))]
+    # p1 is generated again so the part of "AB" it held is not lost
+    assert redo == [0]
+
+
+def test_page_sections_are_sourced_at_upload_positions(monkeypatch):
+    monkeypatch.setattr(Config, "PROMPT_COMPACTION", False)
+    results = [PageResult(1, "second page", 0.1), PageResult(0, "first page", 0.1), PageResult(2, None, 0.1)]
+    sections, _ = page_sections(results, [3, 5, 7])
+
+    assert [(section.text, section.source) for section in sections] == [
+        ("first page", (3, 4)),
+        ("second page", (5, 6)),
+    ]
+
+
+def test_previous_deck_must_share_most_pages_and_belong_to_the_user(store):
+    store.save_deck("alice", "v1", "Notebook", [("A", "a"), ("B", "b")], [(0, 1), (1, 2)], ["p1", "p2"])
+
+    def find(hashes, user_id="alice"):
+        return asyncio.run(_find_previous_deck(upload(*hashes), user_id))
+
+    assert find(["p1", "p2", "p3"]).source_hash == "v1"
+    assert find(["p1", "p2"], user_id="bob") is None
+    # One shared cover page does not make another notebook
+    assert find(["p1", "q2", "q3", "q4"]) is None
+
+
+def test_previous_deck_without_page_provenance_is_not_updated(store):
+    store.save_deck("alice", "v1", "Notebook", [("A", "a")], None, ["p1", "p2"])
+    assert asyncio.run(_find_previous_deck(upload("p1", "p2"), "alice")) is None
+
+
+def test_reupload_recognizes_and_generates_only_new_pages(store, gemini, monkeypatch):
+    texts = {"p1": "cell biology", "p2": "genetics", "p3": "evolution"}
+    recognized = []
+
+    async def recognize(pages, on_page=None):
+        recognized.extend(page.sha256 for page in pages)
+        return [PageResult(index, texts[page.sha256], 0.0) for index, page in enumerate(pages)]
+
+    monkeypatch.setattr(pipeline, "recognize_pages", recognize)
+    gemini.reply = lambda prompt: "Front: What drives evolution?\nBack: Natural selection\n"
+    store.save_deck("alice", "v1", "Notebook", [("What is a cell?", "The unit of life"), ("What is a gene?", "DNA")],
+                    [(0, 1), (1, 2)], ["p1", "p2"])
+
+    pages = upload("p1", "p2", "p3")
+    job = Job("job", "alice", "notes")
+    asyncio.run(run_notes_job(job, pages, "Notebook"))
+
+    assert recognized == ["p3"]
+    assert len(gemini.prompts) == 1
+    assert job.cards == [("What is a cell?", "The unit of life"), ("What is a gene?", "DNA"),
+                         ("What drives evolution?", "Natural selection")]
+    assert job.spans == [(0, 1), (1, 2), (2, 3)]
+    # The updated deck is saved under the new upload and reopened as is
+    assert store.load_deck(notes_source_hash(pages)).cards == job.cards
+
+
+class SizeBackend(OCRBackend):
+    """OCR backend that "recognizes" the size of the image it was sent."""
+
+    name = "size"
+
+    async def recognize(self, image_data):
+        with Image.open(io.BytesIO(image_data)) as image:
+            return f"{image.width}x{image.height}"
+
+
+def test_undecodable_page_is_reported_without_text(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "_backend", SizeBackend())
+    monkeypatch.setattr(ocr, "ocr_cache", TieredCache(LRUCache(), name="ocr"))
+    monkeypatch.setattr(Config, "OCR_NORMALIZE", True)
+    monkeypatch.setattr(Config, "OCR_SEGMENT_LINES", False)
+    monkeypatch.setattr(Config, "OCR_MODEL_INPUT_SIDE", 100)
+    monkeypatch.setattr(Config, "IMAGE_WORKERS", 1)
+
+    good, corrupt = tmp_path / "page.png", tmp_path / "page.heic"
+    Image.new("RGB", (400, 200), "white").save(good)
+    corrupt.write_bytes(b"ftypheic not decodable here")
+    pages = [StoredUpload.from_path(corrupt), StoredUpload.from_path(good)]
+    done = []
+
+    try:
+        results = asyncio.run(recognize_pages(pages, done.append))
+    finally:
+        imaging._pool.shutdown()
+        monkeypatch.setattr(imaging, "_pool", None)
+
+    assert [(result.index, result.text) for result in results] == [(0, None), (1, "100x50")]
+    assert sorted(result.index for result in done) == [0, 1]
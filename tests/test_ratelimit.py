@@ -0,0 +1,127 @@
+"""Tests for the adaptive token-bucket rate limiter."""
+
+import asyncio
+import time
+
+import pytest
+
+from lahacks_24.utils.ratelimit import (
+    BATCH,
+    INTERACTIVE,
+    PREFETCH,
+    AdaptiveRateLimiter,
+    get_limiter,
+    priority,
+    retry_after_seconds,
+)
+
+
+def test_burst_is_served_without_waiting():
+    limiter = AdaptiveRateLimiter("test", rate=1, burst=5)
+
+    async def main():
+        started = time.perf_counter()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.perf_counter() - started
+
+    assert asyncio.run(main()) < 0.05
+
+
+def test_requests_beyond_the_burst_are_paced():
+    limiter = AdaptiveRateLimiter("test", rate=20, burst=1)
+
+    async def main():
+        started = time.perf_counter()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.perf_counter() - started
+
+    # Four requests wait for a token each at 20 per second
+    assert 0.15 < asyncio.run(main()) < 0.6
+
+
+def test_penalize_halves_the_rate_and_reward_restores_it():
+    limiter = AdaptiveRateLimiter("test", rate=8, burst=1, increase=1)
+    limiter.penalize()
+    assert limiter.rate == 4
+    limiter.penalize()
+    limiter.penalize()
+    limiter.penalize()
+    limiter.penalize()
+    assert limiter.rate == limiter.min_rate == 0.5
+
+    for _ in range(20):
+        limiter.reward()
+    assert limiter.rate == limiter.max_rate == 8
+
+
+def test_retry_after_pauses_the_bucket():
+    limiter = AdaptiveRateLimiter("test", rate=1000, burst=10)
+    limiter.penalize(retry_after=0.2)
+
+    async def main():
+        started = time.perf_counter()
+        await limiter.acquire()
+        return time.perf_counter() - started
+
+    assert asyncio.run(main()) >= 0.18
+
+
+def test_waiters_are_served_by_priority():
+    limiter = AdaptiveRateLimiter("test", rate=50, burst=1)
+    order = []
+
+    async def request(name, level):
+        await limiter.acquire(level)
+        order.append(name)
+
+    async def main():
+        await limiter.acquire()  # Empty the bucket so every request below has to queue
+        tasks = [
+            asyncio.create_task(request("prefetch", PREFETCH)),
+            asyncio.create_task(request("batch", BATCH)),
+            asyncio.create_task(request("interactive", INTERACTIVE)),
+        ]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["interactive", "batch", "prefetch"]
+
+
+def test_priority_context_sets_the_default_level():
+    limiter = AdaptiveRateLimiter("test", rate=50, burst=1)
+    order = []
+
+    async def request(name):
+        await limiter.acquire()
+        order.append(name)
+
+    async def main():
+        await limiter.acquire()
+        with priority(PREFETCH):
+            background = asyncio.create_task(request("prefetch"))
+        foreground = asyncio.create_task(request("interactive"))
+        await asyncio.gather(background, foreground)
+
+    asyncio.run(main())
+    assert order == ["interactive", "prefetch"]
+
+
+def test_limiter_survives_a_new_event_loop():
+    limiter = AdaptiveRateLimiter("test", rate=100, burst=1)
+    for _ in range(2):
+        asyncio.run(asyncio.wait_for(limiter.acquire(), timeout=1))
+        asyncio.run(asyncio.wait_for(limiter.acquire(), timeout=1))
+
+
+@pytest.mark.parametrize("value, seconds", [(None, None), ("", None), ("3", 3.0), ("-1", 0.0), ("soon", None)])
+def test_retry_after_seconds(value, seconds):
+    assert retry_after_seconds(value) == seconds
+
+
+def test_get_limiter_shares_one_limiter_per_upstream():
+    assert get_limiter("gemini") is get_limiter("gemini")
+    assert get_limiter("gemini") is not get_limiter("youtube")
+    with pytest.raises(ValueError):
+        get_limiter("openai")
@@ -0,0 +1,115 @@
+"""Tests for the SQLite deck store."""
+
+import sqlite3
+
+import pytest
+
+from lahacks_24.utils.storage import DeckStore, SQLiteDeckStore
+
+
+@pytest.fixture
+def store():
+    store = SQLiteDeckStore()
+    store.create_schema()
+    return store
+
+
+CARDS = [("What is DNA?", "Genetic material"), ("What is RNA?", "A nucleic acid")]
+
+
+def test_saved_deck_is_reopened_by_source_hash(store):
+    deck_id = store.save_deck("alice", "source-1", "Biology", CARDS)
+    deck = store.load_deck("source-1")
+
+    assert deck.id == deck_id
+    assert (deck.user_id, deck.title) == ("alice", "Biology")
+    assert deck.cards == CARDS
+    assert deck.spans == [None, None]
+    assert store.load_deck("source-2") is None
+
+
+def test_latest_deck_of_a_source_wins(store):
+    store.save_deck("alice", "source-1", "First", CARDS[:1])
+    newest = store.save_deck("alice", "source-1", "Second", CARDS)
+    assert store.load_deck("source-1").id == newest
+
+
+def test_load_deck_can_be_scoped_to_a_user(store):
+    store.save_deck("alice", "source-1", "Alice's", CARDS)
+    assert store.load_deck("source-1", user_id="bob") is None
+    assert store.load_deck("source-1", user_id="alice").title == "Alice's"
+
+
+def test_card_order_and_spans_are_kept(store):
+    cards = [(f"Question {index}", f"Answer {index}") for index in range(50)]
+    spans = [(index * 10.0, index * 10.0 + 10) for index in range(50)]
+    store.save_deck("alice", "video", "Lecture", cards, spans)
+
+    deck = store.load_deck("video")
+    assert deck.cards == cards
+    assert deck.spans == spans
+
+
+def test_deck_without_cards(store):
+    store.save_deck("alice", "empty", "Empty", [])
+    deck = store.load_deck("empty")
+    assert deck.cards == []
+
+
+def test_find_deck_by_pages_prefers_the_most_shared_pages(store):
+    store.save_deck("alice", "a", "Notebook v1", CARDS, [(0, 1), (1, 2)], ["p1", "p2"])
+    best = store.save_deck("alice", "b", "Notebook v2", CARDS, [(0, 1), (2, 3)], ["p1", "p2", "p3"])
+    store.save_deck("alice", "c", "Other", CARDS, None, ["q1"])
+
+    deck = store.find_deck_by_pages(["p1", "p2", "p3", "p4"])
+    assert deck.id == best
+    assert deck.pages == ["p1", "p2", "p3"]
+    assert deck.spans == [(0, 1), (2, 3)]
+    assert store.find_deck_by_pages(["z"]) is None
+    assert store.find_deck_by_pages([]) is None
+
+
+def test_find_deck_by_pages_can_be_scoped_to_a_user(store):
+    store.save_deck("alice", "a", "Alice's notes", CARDS, None, ["p1", "p2"])
+    assert store.find_deck_by_pages(["p1", "p2"], user_id="bob") is None
+    assert store.find_deck_by_pages(["p1", "p2"], user_id="alice").title == "Alice's notes"
+
+
+def test_list_decks_is_newest_first_and_without_cards(store):
+    for index in range(3):
+        store.save_deck("alice", f"source-{index}", f"Deck {index}", CARDS)
+    store.save_deck("bob", "other", "Bob's", CARDS)
+
+    decks = store.list_decks("alice", limit=2)
+    assert [deck.title for deck in decks] == ["Deck 2", "Deck 1"]
+    assert all(deck.cards == [] for deck in decks)
+
+
+def test_schema_upgrade_adds_span_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE decks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, source_hash TEXT NOT NULL,
+            title TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, deck_id INTEGER NOT NULL REFERENCES decks(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL, front TEXT NOT NULL, back TEXT NOT NULL
+        );
+    """)
+    conn.close()
+
+    store = SQLiteDeckStore(path)
+    store.create_schema()
+    store.save_deck("alice", "video", "Lecture", CARDS, [(0, 60), None])
+    assert store.load_deck("video").spans == [(0, 60), None]
+
+
+def test_store_backends_must_implement_the_connection_and_inserts():
+    class Incomplete(DeckStore):
+        def _insert_deck(self, cursor, user_id, source_hash, title):
+            return 1
+
+    with pytest.raises(TypeError, match="_connection"):
+        Incomplete()
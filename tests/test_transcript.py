@@ -0,0 +1,87 @@
+"""Tests for the time-indexed transcript model."""
+
+import pytest
+
+from lahacks_24.utils.transcript import Transcript, overlaps
+
+
+@pytest.fixture
+def transcript():
+    # Ten 4-second segments starting every 5 seconds: 0-4, 5-9, ..., 45-49
+    return Transcript.from_segments([
+        {"text": f"segment {index}", "start": index * 5.0, "duration": 4.0} for index in range(10)
+    ])
+
+
+def test_from_segments_sorts_and_drops_empty_segments():
+    transcript = Transcript.from_segments([
+        {"text": "second", "start": 5.0, "duration": 2.0},
+        {"text": "   ", "start": 3.0, "duration": 1.0},
+        {"text": " first ", "start": 0.0},
+    ])
+    assert len(transcript) == 2
+    assert transcript.text() == "first second"
+    assert transcript.end == 7.0
+    assert list(transcript.segments())[0] == {"text": "first", "start": 0.0, "duration": 0.0}
+
+
+def test_index_range_finds_overlapping_segments(transcript):
+    assert transcript.index_range(10, 20) == (2, 4)
+    # A segment that started before the range but is still showing is included
+    assert transcript.index_range(12, 20) == (2, 4)
+    # A segment that ended before the range is not
+    assert transcript.index_range(14.5, 20) == (3, 4)
+    assert transcript.index_range(0, 1000) == (0, 10)
+
+
+def test_index_range_includes_a_long_segment_that_started_earlier():
+    # A 60-second caption overlapped by short ones, as auto-generated music or
+    # speaker captions are
+    transcript = Transcript.from_segments(
+        [{"text": "[music]", "start": 0.0, "duration": 60.0}]
+        + [{"text": f"line {index}", "start": 5.0 + index * 5, "duration": 4.0} for index in range(10)]
+    )
+
+    assert transcript.index_range(40, 50) == (0, 10)
+    assert transcript.slice(40, 50).text().startswith("[music]")
+    assert transcript.index_range(60, 70) == (11, 11)
+    assert transcript.end == 60.0
+
+
+def test_index_range_outside_the_video(transcript):
+    assert transcript.index_range(100, 200) == (10, 10)
+    assert transcript.index_range(-10, -5) == (0, 0)
+
+
+def test_slice_returns_a_standalone_transcript(transcript):
+    part = transcript.slice(10, 20)
+    assert len(part) == 2
+    assert part.text() == "segment 2 segment 3"
+    assert list(part.starts) == [10.0, 15.0]
+    assert part.text_at(1) == "segment 3"
+    assert part.index_range(15, 16) == (1, 2)
+
+
+def test_empty_slice(transcript):
+    part = transcript.slice(100, 200)
+    assert len(part) == 0
+    assert part.text() == ""
+    assert part.end == 0.0
+
+
+def test_chunks_respect_token_and_time_budgets(transcript):
+    assert len(transcript.chunks(10_000)) == 1
+    windows = transcript.chunks(10_000, max_seconds=20)
+    assert [(window.start, window.end) for window in windows] == [(0.0, 19.0), (20.0, 39.0), (40.0, 49.0)]
+    assert all(window.tokens <= 6 for window in transcript.chunks(6))
+
+
+def test_nbytes_is_smaller_than_segment_dicts(transcript):
+    assert transcript.nbytes < 10 * 100
+
+
+@pytest.mark.parametrize("span, expected", [
+    ((0, 11), True), ((19, 30), True), ((20, 30), False), ((5, 10), False), (None, False),
+])
+def test_overlaps(span, expected):
+    assert overlaps(span, 10, 20) is expected
@@ -0,0 +1,104 @@
+"""Tests for streaming uploads to disk."""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from lahacks_24.utils.uploads import StoredUpload, UploadTooLargeError, save_upload
+
+
+class FakeUpload:
+    """Stand-in for rx.UploadFile, returning its data in read(size) pieces."""
+
+    def __init__(self, filename, data):
+        self.filename = filename
+        self._data = data
+        self.reads = 0
+
+    async def read(self, size):
+        self.reads += 1
+        chunk, self._data = self._data[:size], self._data[size:]
+        return chunk
+
+
+def save(file, directory, **options):
+    return asyncio.run(save_upload(file, directory, **options))
+
+
+def test_upload_is_stored_under_its_content_hash(tmp_path):
+    data = b"photo" * 1000
+    file = FakeUpload("Lecture 1.JPG", data)
+    stored = save(file, tmp_path, chunk_size=512)
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert stored.path == tmp_path / f"{digest}.jpg"
+    assert stored.sha256 == digest
+    assert stored.size == len(data)
+    assert stored.name == "Lecture 1.JPG"
+    assert stored.path.read_bytes() == data
+    # Streamed in chunks, not read at once
+    assert file.reads > len(data) // 512
+
+
+def test_same_named_uploads_do_not_overwrite_each_other(tmp_path):
+    first = save(FakeUpload("image.jpg", b"first photo"), tmp_path)
+    second = save(FakeUpload("image.jpg", b"second photo"), tmp_path)
+
+    assert first.path != second.path
+    assert first.path.read_bytes() == b"first photo"
+    assert second.path.read_bytes() == b"second photo"
+
+
+def test_concurrent_uploads_with_the_same_name(tmp_path):
+    async def main():
+        return await asyncio.gather(*(
+            save_upload(FakeUpload("image.jpg", bytes([index]) * 4096), tmp_path, chunk_size=256)
+            for index in range(8)
+        ))
+
+    stored = asyncio.run(main())
+    assert len({upload.path for upload in stored}) == 8
+    assert all(upload.path.read_bytes() == bytes([index]) * 4096 for index, upload in enumerate(stored))
+
+
+def test_client_directories_and_odd_suffixes_are_ignored(tmp_path):
+    stored = save(FakeUpload("../../etc/passwd", b"data"), tmp_path)
+    assert stored.path.parent == tmp_path
+    assert stored.path.suffix == ""
+    assert stored.name == "passwd"
+
+    stored = save(FakeUpload("notes.j p;g", b"other"), tmp_path)
+    assert stored.path.name == stored.sha256
+
+
+def test_upload_over_the_size_limit_is_rejected(tmp_path):
+    with pytest.raises(UploadTooLargeError, match="huge.png"):
+        save(FakeUpload("huge.png", b"x" * 1000), tmp_path, max_bytes=999, chunk_size=100)
+    # Nothing is left behind, not even the partial file
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_at_the_size_limit_is_accepted(tmp_path):
+    stored = save(FakeUpload("page.png", b"x" * 1000), tmp_path, max_bytes=1000, chunk_size=100)
+    assert stored.size == 1000
+
+
+def test_from_path_matches_the_upload(tmp_path):
+    stored = save(FakeUpload("page.png", b"page bytes"), tmp_path)
+    described = StoredUpload.from_path(stored.path, chunk_size=3)
+    assert (described.sha256, described.size) == (stored.sha256, stored.size)
+
+
+def test_open_buffer_maps_the_file(tmp_path):
+    stored = save(FakeUpload("page.png", b"page bytes"), tmp_path)
+    with stored.open_buffer() as buffer:
+        assert hashlib.sha256(buffer).hexdigest() == stored.sha256
+        assert buffer[:4] == b"page"
+
+
+def test_empty_upload_cannot_be_mapped(tmp_path):
+    stored = save(FakeUpload("empty.png", b""), tmp_path)
+    with pytest.raises(ValueError, match="empty"):
+        with stored.open_buffer():
+            pass
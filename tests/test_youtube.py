@@ -0,0 +1,102 @@
+"""Tests for transcript caching and prefetching."""
+
+import asyncio
+import time
+
+import pytest
+
+from lahacks_24.config import Config
+from lahacks_24.utils import ratelimit, youtube
+from lahacks_24.utils.cache import LRUCache, SingleFlight, TieredCache
+from lahacks_24.utils.ratelimit import RateLimitError
+
+VIDEO = "dQw4w9WgXcQ"
+
+
+class TooManyRequests(Exception):
+    """Named like the transcript client's rate limit error."""
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Replace the blocking transcript fetch; returns the list of fetched video IDs."""
+    fetched = []
+
+    def fetch(video_id, languages):
+        fetched.append(video_id)
+        time.sleep(0.05)
+        if video_id.startswith("missing"):
+            raise RuntimeError("No transcript")
+        if video_id.startswith("limited"):
+            raise TooManyRequests()
+        return [{"text": f"caption of {video_id}", "start": 0.0, "duration": 2.0}]
+
+    monkeypatch.setattr(youtube, "_fetch_transcript", fetch)
+    monkeypatch.setattr(youtube, "transcript_cache", TieredCache(LRUCache(), name="transcripts"))
+    monkeypatch.setattr(youtube, "_inflight", SingleFlight())
+    monkeypatch.setattr(Config, "TRANSCRIPT_RATE_LIMIT", 100000.0)
+    monkeypatch.setattr(Config, "TRANSCRIPT_RATE_BURST", 100000.0)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    return fetched
+
+
+@pytest.mark.parametrize("value", [
+    VIDEO, f"https://www.youtube.com/watch?v={VIDEO}&t=42", f"https://youtu.be/{VIDEO}?si=x", f"  {VIDEO} ",
+])
+def test_video_urls_resolve_to_the_id(value):
+    assert youtube.normalize_video_id(value) == VIDEO
+
+
+def test_unknown_video_reference_is_rejected():
+    assert youtube.normalize_video_id("not a video") is None
+
+
+def test_every_url_form_shares_one_cached_transcript(fetches):
+    async def main():
+        await youtube.get_transcript_segments(VIDEO)
+        await youtube.get_transcript_segments(f"https://youtu.be/{VIDEO}")
+        return await youtube.get_video_transcript(f"https://www.youtube.com/watch?v={VIDEO}")
+
+    assert asyncio.run(main()) == f"caption of {VIDEO}"
+    assert fetches == [VIDEO]
+
+
+def test_concurrent_requests_share_one_fetch(fetches):
+    async def main():
+        return await asyncio.gather(*(youtube.get_transcript_segments(VIDEO) for _ in range(5)))
+
+    assert len(asyncio.run(main())) == 5
+    assert fetches == [VIDEO]
+
+
+def test_failed_fetch_is_not_cached(fetches):
+    async def main():
+        first = await youtube.get_transcript_segments("missing0001")
+        second = await youtube.get_transcript_segments("missing0001")
+        return first, second
+
+    assert asyncio.run(main()) == (None, None)
+    assert fetches == ["missing0001", "missing0001"]
+
+
+def test_rate_limited_fetch_raises(fetches):
+    with pytest.raises(RateLimitError):
+        asyncio.run(youtube.get_transcript_segments("limited0001"))
+
+
+def test_prefetch_warms_the_cache_in_parallel(fetches):
+    videos = [f"video{index:06d}" for index in range(8)]
+
+    async def main():
+        started = time.perf_counter()
+        result = await youtube.prefetch_transcripts(videos + ["missing0001", "limited0001", videos[0]],
+                                                    concurrency=10)
+        elapsed = time.perf_counter() - started
+        await youtube.get_transcript_segments(videos[3])
+        return result, elapsed
+
+    result, elapsed = asyncio.run(main())
+    assert result == {**{video: True for video in videos}, "missing0001": False, "limited0001": False}
+    # Ten 50 ms fetches in parallel, not one after another
+    assert elapsed < 0.4
+    assert len(fetches) == 10